@@ -0,0 +1,198 @@
+"""
+Décodage unique des fichiers d'entrée.
+
+Un fichier audio/vidéo est sondé (probe.py, résultat en cache) et décodé (ffmpeg) une seule fois
+en un tampon numpy partagé, accompagné de ses métadonnées. Les étapes suivantes
+(détection vidéo, préparation du WAV 48 kHz, spectrogrammes, export) consomment
+ce tampon ; les versions rééchantillonnées sont calculées à la demande puis
+gardées en cache.
+"""
+import logging
+import os
+import subprocess
+import threading
+
+import numpy as np
+from pydub import AudioSegment
+
+import metrics
+import resampler
+from probe import probe_media
+from wavio import open_wav, read_wav, read_wav_data_range, read_wav_info, write_wav
+
+logger = logging.getLogger(__name__)
+
+
+def resample(samples, source_rate, target_rate, quality=resampler.DEFAULT_QUALITY):
+    """Rééchantillonnage polyphase le long de l'axe 0, par blocs (voir resampler.resample)."""
+    if source_rate == target_rate:
+        return samples
+    with metrics.span('resample', source_rate=source_rate, target_rate=target_rate, quality=quality):
+        resampled = resampler.resample(samples, source_rate, target_rate, quality)
+    metrics.count('resampled_seconds', len(samples) / float(source_rate))
+    return resampled
+
+
+class DecodedAudio:
+    """
+    Échantillons décodés (float32, forme (n, canaux)) et métadonnées d'un fichier.
+    Les vues rééchantillonnées/mono sont créées paresseusement et mises en cache.
+    """
+
+    def __init__(self, samples, sample_rate, sample_width=2, source_path=None, video=None, codec=None):
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples = samples[:, None] if samples.ndim == 1 else samples
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.source_path = source_path
+        self.video = video
+        self.codec = codec
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sample_rate)
+
+    @property
+    def has_video(self):
+        return self.video is not None and self.video['size'][0] is not None and self.video['fps'] is not None
+
+    def metadata(self):
+        """(canaux, largeur d'échantillon, fréquence, durée), comme get_audio_metadata."""
+        return self.channels, self.sample_width, self.sample_rate, self.duration
+
+    def view(self, sample_rate=None, mono=False):
+        """
+        Échantillons à la fréquence demandée, éventuellement mixés en mono
+        (forme (n,) en mono, (n, canaux) sinon). Résultat mis en cache.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        key = (sample_rate, mono)
+        with self._lock:
+            if key not in self._views:
+                if mono:
+                    samples = self.samples[:, 0] if self.channels == 1 else self.samples.mean(axis=1)
+                else:
+                    samples = self.samples
+                self._views[key] = resample(samples, self.sample_rate, sample_rate)
+            return self._views[key]
+
+    def to_wav(self, path, sample_rate=None, mono=False):
+        write_wav(path, self.view(sample_rate, mono), sample_rate or self.sample_rate)
+        return path
+
+    def to_audio_segment(self):
+        """AudioSegment pydub construit directement depuis le tampon (pas de nouveau décodage)."""
+        data = (np.clip(self.samples, -1.0, 1.0) * 32767.0).round().astype('<i2')
+        return AudioSegment(data=data.tobytes(), sample_width=2,
+                            frame_rate=self.sample_rate, channels=self.channels)
+
+    @classmethod
+    def from_wav(cls, path, mapped=False):
+        """
+        Lecture directe d'un WAV (sans ffprobe ni ffmpeg).
+        `mapped` : fichier projeté en mémoire plutôt que chargé (voir MappedAudio).
+        """
+        if mapped:
+            return MappedAudio(open_wav(path))
+        channels, _, frames = read_wav_info(path)
+        _, size = read_wav_data_range(path)
+        samples, sample_rate = read_wav(path)
+        sample_width = size // (frames * channels) if frames else 2
+        return cls(samples, sample_rate, sample_width, source_path=path, codec='pcm')
+
+
+class MappedAudio(DecodedAudio):
+    """
+    DecodedAudio adossé à un WAV projeté en mémoire (wavio.MappedWav), typiquement
+    un fichier intermédiaire de temp_dir ou output_dir. Les vues à la fréquence
+    d'origine sont des SampleView paresseuses (spectrogrammes, copies par blocs) ;
+    le tampon complet `samples` n'est converti qu'au premier accès (rééchantillonnage,
+    export pydub). `close` libère la projection.
+    """
+
+    def __init__(self, wav):
+        self.wav = wav
+        self.sample_rate = wav.sample_rate
+        self.sample_width = wav.sample_width
+        self.source_path = wav.path
+        self.video = None
+        self.codec = 'pcm'
+        self._samples = None
+        self._views = {}
+        # Réentrant : view() tient le verrou pendant la conversion de `samples`
+        self._lock = threading.RLock()
+
+    @property
+    def samples(self):
+        with self._lock:
+            if self._samples is None:
+                samples = self.wav.read()
+                self._samples = samples[:, None] if samples.ndim == 1 else samples
+            return self._samples
+
+    @property
+    def channels(self):
+        return self.wav.channels
+
+    @property
+    def duration(self):
+        return self.wav.duration
+
+    def view(self, sample_rate=None, mono=False):
+        if (sample_rate or self.sample_rate) == self.sample_rate:
+            return self.wav.view(mono)
+        return super().view(sample_rate, mono)
+
+    def close(self):
+        with self._lock:
+            self._samples = None
+            self._views.clear()
+        self.wav.close()
+
+
+def probe_file(file_path):
+    """Informations de flux (audio, vidéo), sans décoder les échantillons (voir probe.probe_media)."""
+    info = probe_media(file_path)
+    return info['audio'], info['video']
+
+
+def decode_file(file_path):
+    """
+    Sonde puis décode un fichier audio/vidéo en une seule passe ffmpeg.
+    Retourne un DecodedAudio à la fréquence et au nombre de canaux d'origine.
+    """
+    extension = os.path.splitext(file_path)[1].lower().lstrip('.')
+    with metrics.span('decode', format=extension) as span:
+        if extension == 'wav':
+            try:
+                decoded = DecodedAudio.from_wav(file_path)
+                metrics.count('decoded_seconds', decoded.duration, format=extension)
+                return decoded
+            except (ValueError, KeyError):
+                pass  # Variante WAV non gérée par wavio : passage par ffmpeg
+
+        audio, video = probe_file(file_path)
+        if audio is None:
+            raise Exception(f"Aucune piste audio dans {file_path}")
+        span.set(codec=audio['codec'])
+
+        command = [
+            AudioSegment.converter, "-v", "error", "-nostdin", "-i", file_path, "-vn",
+            "-ac", str(audio['channels']), "-ar", str(audio['sample_rate']), "-f", "f32le", "-"
+        ]
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise Exception(f"Échec du décodage de {file_path}: {result.stderr.decode(errors='replace').strip()}")
+
+        samples = np.frombuffer(result.stdout, dtype='<f4').reshape(-1, audio['channels'])
+    logger.debug("Décodage unique: %s (%s canaux, %s Hz, %.1fs, vidéo: %s)", file_path, audio['channels'],
+                 audio['sample_rate'], len(samples) / audio['sample_rate'], video is not None)
+    metrics.count('decoded_seconds', len(samples) / float(audio['sample_rate']), format=extension)
+    return DecodedAudio(samples, audio['sample_rate'], audio['sample_width'],
+                        source_path=file_path, video=video, codec=audio['codec'])
@@ -0,0 +1,405 @@
+"""
+Traitement par lot sans interface graphique.
+
+Nettoie des fichiers audio/vidéo (fichiers, dossiers ou motifs glob) en
+répartissant le travail sur un pool de processus :
+convert_to_wav -> process_audio -> convert_audio_format / export_targets / reconstruct_video_from_audio_and_video
+
+Exemple :
+    python batch.py "enregistrements/**/*.mp3" videos/ -o nettoyes -j 4 --summary resume.json
+"""
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from cache import DEFAULT_CACHE_DIR, ResultCache, make_key
+from deepfilter_interface import DEFAULT_OPTIONS, format_progress, process_audio, resolve_backend
+from export import export_targets, parse_targets, target_paths
+from probe import probe_media
+from streaming import stream_denoise, stream_video
+from utils import convert_to_wav, convert_audio_format, reconstruct_video_from_audio_and_video
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.ogg', '.m4a'}
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov'}
+
+
+def glob_root(pattern):
+    """Partie fixe d'un motif glob : le dossier qui précède le premier joker."""
+    parts = os.path.normpath(pattern).split(os.sep)
+    fixed = next((index for index, part in enumerate(parts) if glob.has_magic(part)), len(parts) - 1)
+    return os.sep.join(parts[:fixed]) or (os.sep if os.path.isabs(pattern) else '.')
+
+
+def collect_inputs(patterns):
+    """
+    Résout une liste de fichiers, dossiers ou motifs glob.
+    Retourne une liste de tuples (chemin, chemin relatif pour la sortie) : relatif au
+    dossier donné ou à la partie fixe du motif, ce qui garde l'arborescence d'origine.
+    """
+    supported = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
+    inputs = []
+    seen = set()
+
+    def add(path, relative):
+        path = os.path.abspath(path)
+        if path not in seen and os.path.splitext(path)[1].lower() in supported:
+            seen.add(path)
+            inputs.append((path, relative))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    add(path, os.path.relpath(path, pattern))
+        elif os.path.isfile(pattern):
+            add(pattern, os.path.basename(pattern))
+        else:
+            root = glob_root(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    add(path, os.path.relpath(path, root))
+    return inputs
+
+
+def build_output_path(relative, output_dir, output_format=None, audio_only=False, suffix='_clean'):
+    """Calcule le chemin du fichier de sortie pour une entrée donnée."""
+    stem, ext = os.path.splitext(relative)
+    ext = ext.lower()
+    if output_format:
+        ext = '.' + output_format.lstrip('.').lower()
+    elif audio_only and ext in VIDEO_EXTENSIONS:
+        ext = '.wav'
+    return os.path.join(output_dir, f"{stem}{suffix}{ext}")
+
+
+def find_collisions(planned):
+    """Sorties visées par plusieurs entrées : {sortie: [entrées]} pour une liste (entrée, sortie)."""
+    targets = {}
+    for input_path, output_path in planned:
+        key = os.path.normcase(os.path.abspath(output_path))
+        targets.setdefault(key, (output_path, []))[1].append(input_path)
+    return {output_path: paths for output_path, paths in targets.values() if len(paths) > 1}
+
+
+def wav_duration(wav_path):
+    """Durée (en secondes) d'un fichier WAV, lue depuis l'en-tête uniquement."""
+    with wave.open(wav_path, 'rb') as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+
+def _init_worker(verbose, metrics_jsonl):
+    """Initialisation d'un processus du pool : journalisation et instrumentation."""
+    metrics.setup_logging(logging.DEBUG if verbose else logging.WARNING)
+    # Les sorties du parent ne sont pas à nous (copies héritées) ; l'agrégat reste actif
+    # pour renvoyer les mesures de chaque fichier au processus principal
+    metrics.disable(close=False)
+    metrics.registry.reset()
+    metrics.enable(*([metrics.JsonLinesSink(metrics_jsonl)] if metrics_jsonl else []))
+
+
+def process_file(input_path, output_path, options, verbose=False, stream=False, chunk_seconds=10.0,
+                 cache_dir=None, keep_channels=False, channel_workers=None, formats=None):
+    """
+    Traite un fichier complet. Exécuté dans un processus du pool.
+    En mode `stream`, le débruitage se fait par blocs à mémoire bornée (voir streaming.py).
+    Avec `cache_dir`, les résultats sont lus/écrits dans le cache de résultats (hors mode `stream`).
+    Avec `keep_channels`, les canaux d'origine sont conservés et débruités en parallèle
+    par au plus `channel_workers` processus `deep-filter` (voir process_channels).
+    Avec `formats` (voir export.parse_targets), le résultat est livré dans chacun de ces
+    formats audio, à côté de output_path, par des encodeurs lancés en parallèle.
+    Ne lève jamais d'exception : le statut est renvoyé dans le résultat, avec les
+    mesures par étape du fichier ('metrics', si l'instrumentation est active).
+    """
+    result = {
+        'input': input_path,
+        'output': output_path,
+        'status': 'ok',
+        'error': None,
+        'audio_duration': None,
+        'processing_time': None,
+        'rtf': None,
+        'cached': False,
+        'video_mode': None,
+        'silence': None,
+        'outputs': None,
+        'metrics': None,
+    }
+    collected = metrics.Registry()
+    metrics.attach(collected)
+    start_time = time.time()
+    output_ext = os.path.splitext(output_path)[1].lower()
+    is_video = False
+    # Fichier partiel pour ne jamais laisser une sortie incomplète (reprise)
+    partial_path = os.path.join(os.path.dirname(output_path),
+                                f".{os.path.splitext(os.path.basename(output_path))[0]}.partial{output_ext}")
+
+    out = sys.stdout if verbose else open(os.devnull, 'w')
+    name = os.path.basename(input_path)
+    progress = (lambda report: print(f"[PROGRESS] {name}: {format_progress(report)}", flush=True)) if verbose else None
+    try:
+        with contextlib.redirect_stdout(out), tempfile.TemporaryDirectory(prefix='deepfilterbatch_') as work_dir:
+            temp_dir = os.path.join(work_dir, 'temp')
+            clean_dir = os.path.join(work_dir, 'output')
+            os.makedirs(clean_dir)
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            # Sonde d'en-têtes (en cache) : un conteneur vidéo sans piste vidéo est traité comme de l'audio
+            is_video = (os.path.splitext(input_path)[1].lower() in VIDEO_EXTENSIONS
+                        and output_ext in VIDEO_EXTENSIONS
+                        and probe_media(input_path)['video'] is not None)
+
+            if stream:
+                if is_video:
+                    # Extraction, débruitage et multiplexage en une passe, sans WAV intermédiaire
+                    video = stream_video(input_path, partial_path, options, chunk_seconds,
+                                         format=output_ext[1:], progress=progress)
+                    result['audio_duration'], result['video_mode'] = video['audio_duration'], video['mode']
+                else:
+                    result['audio_duration'] = stream_denoise(input_path, partial_path, options, chunk_seconds,
+                                                             progress=progress)
+                os.replace(partial_path, output_path)
+                return result
+
+            wav_file = convert_to_wav(input_path, temp_dir, keep_channels=keep_channels)
+            result['audio_duration'] = wav_duration(wav_file)
+
+            cache = ResultCache(cache_dir) if cache_dir else None
+            cache_key = make_key(wav_file, options, resolve_backend('auto', options)) if cache else None
+            cleaned = cache.get(cache_key) if cache else None
+            if cleaned:
+                result['cached'] = True
+            else:
+                result['silence'] = process_audio(wav_file, clean_dir, options, progress=progress,
+                                                  channel_workers=channel_workers)
+                cleaned = os.path.join(clean_dir, os.path.basename(wav_file))
+                if not os.path.exists(cleaned):
+                    raise Exception(f"Le fichier de sortie n'a pas été créé. Contenu du dossier: {os.listdir(clean_dir)}")
+                if cache:
+                    cache.put(cache_key, cleaned)
+
+            if formats:
+                # Chaque cible est écrite sous un nom temporaire puis renommée (voir export.py)
+                exported = export_targets(cleaned, target_paths(output_path, formats))
+                result['outputs'] = [item['path'] for item in exported if item['status'] == 'ok']
+                failed = [f"{item['format']}: {item['error']}" for item in exported if item['status'] != 'ok']
+                if failed:
+                    raise Exception("Échec de l'export (" + "; ".join(failed) + ")")
+                return result
+            if is_video:
+                result['video_mode'] = reconstruct_video_from_audio_and_video(
+                    input_path, cleaned, partial_path, format=output_ext[1:])['mode']
+            else:
+                convert_audio_format(cleaned, partial_path, format=output_ext[1:])
+            os.replace(partial_path, output_path)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        result['processing_time'] = time.time() - start_time
+        if result['audio_duration']:
+            result['rtf'] = result['processing_time'] / result['audio_duration']
+        metrics.detach(collected)
+        if metrics.is_enabled():
+            result['metrics'] = collected.snapshot()
+    return result
+
+
+def format_status(result):
+    """Ligne de statut lisible pour un fichier."""
+    name = os.path.basename(result['input'])
+    if result['status'] == 'skipped':
+        return f"[SKIP] {name} (sortie existante: {result['output']})"
+    if result['status'] == 'error':
+        return f"[ERROR] {name}: {result['error']}"
+    cached = " [cache]" if result.get('cached') else ""
+    video = f", vidéo: {result['video_mode']}" if result.get('video_mode') else ""
+    silence = result.get('silence')
+    skipped = (f", silences ignorés {100 * silence['skipped_fraction']:.0f} %"
+               if silence and silence['applied'] else "")
+    return (f"[OK]{cached} {name} -> {result['output']} "
+            f"(durée {result['audio_duration']:.1f}s, traitement {result['processing_time']:.1f}s, "
+            f"RTF {result['rtf']:.3f}{video}{skipped})")
+
+
+def run_batch(inputs, output_dir, options=None, jobs=None, output_format=None,
+              audio_only=False, suffix='_clean', resume=True, verbose=False, stream=False,
+              chunk_seconds=10.0, cache_dir=None, report=print, metrics_jsonl=None, keep_channels=False,
+              formats=None):
+    """
+    Traite une liste (chemin, chemin relatif) sur un pool de `jobs` processus.
+    `keep_channels` : conserver les canaux d'origine ; les cœurs laissés libres par
+    le pool servent à débruiter les canaux d'un même fichier en parallèle.
+    `metrics_jsonl` : fichier où chaque processus ajoute ses évènements d'instrumentation.
+    `formats` : cibles d'export (voir export.parse_targets) ; chaque fichier est alors livré
+    en audio dans tous ces formats, et n'est repris que si l'un d'eux manque.
+    Retourne le résumé (dictionnaire sérialisable en JSON), avec les durées cumulées par étape.
+    """
+    options = dict(DEFAULT_OPTIONS if options is None else options)
+    jobs = jobs or os.cpu_count() or 1
+    results = []
+    pending = []
+
+    planned = [(input_path, build_output_path(relative, output_dir, formats[0]['format'] if formats else output_format,
+                                              bool(formats) or audio_only, suffix))
+               for input_path, relative in inputs]
+    collisions = find_collisions(planned)
+    if collisions:
+        # Deux entrées vers la même sortie s'écraseraient l'une l'autre dans le pool
+        raise ValueError("Plusieurs entrées produiraient la même sortie: " + "; ".join(
+            f"{output_path} <- {', '.join(paths)}" for output_path, paths in collisions.items()))
+
+    for input_path, output_path in planned:
+        if formats:
+            done = all(os.path.exists(target['path']) for target in target_paths(output_path, formats))
+        else:
+            done = os.path.exists(output_path)
+        if resume and done:
+            result = {'input': input_path, 'output': output_path, 'status': 'skipped', 'error': None,
+                      'audio_duration': None, 'processing_time': None, 'rtf': None, 'cached': False,
+                      'video_mode': None, 'metrics': None}
+            results.append(result)
+            report(format_status(result))
+        else:
+            pending.append((input_path, output_path))
+
+    totals = metrics.Registry()
+    start_time = time.time()
+    if pending:
+        workers = min(jobs, len(pending))
+        channel_workers = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(verbose, metrics_jsonl)) as executor:
+            futures = [executor.submit(process_file, input_path, output_path, options, verbose,
+                                       stream, chunk_seconds, cache_dir, keep_channels, channel_workers, formats)
+                       for input_path, output_path in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                if result['metrics']:
+                    totals.merge(result['metrics'])
+                    metrics.merge(result['metrics'])
+                report(f"({done}/{len(pending)}) {format_status(result)}")
+    wall_time = time.time() - start_time
+
+    processed = [r for r in results if r['status'] == 'ok']
+    audio_total = sum(r['audio_duration'] for r in processed)
+    return {
+        'options': options,
+        'jobs': jobs,
+        'total': len(results),
+        'ok': len(processed),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'errors': sum(1 for r in results if r['status'] == 'error'),
+        'audio_duration': audio_total,
+        'wall_time': wall_time,
+        'rtf': wall_time / audio_total if audio_total else None,
+        'cache': ResultCache(cache_dir).stats() if cache_dir else None,
+        'metrics': totals.snapshot(),
+        'files': results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nettoyage par lot de fichiers audio/vidéo avec DeepFilterNet")
+    parser.add_argument('inputs', nargs='+', help="Fichiers, dossiers ou motifs glob (ex: 'dossier/**/*.mp3')")
+    parser.add_argument('-o', '--output-dir', required=True, help="Dossier de sortie")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument('-f', '--format', dest='output_format', help="Format de sortie (défaut: format d'origine)")
+    parser.add_argument('--audio-only', action='store_true', help="Pour les vidéos, n'exporter que l'audio nettoyé")
+    parser.add_argument('--formats', help="Livrer chaque résultat en audio dans plusieurs formats, encodés en "
+                                          "parallèle (ex: 'wav,flac,mp3:320k,m4a')")
+    parser.add_argument('--suffix', default='_clean', help="Suffixe ajouté au nom des fichiers de sortie")
+    parser.add_argument('--no-resume', action='store_true', help="Retraiter même si la sortie existe déjà")
+    parser.add_argument('--summary', help="Écrire le résumé JSON dans ce fichier ('-' pour la sortie standard)")
+    parser.add_argument('--no-postfilter', action='store_true', help="Désactiver le post-filtre")
+    parser.add_argument('--pf-beta', type=float, default=DEFAULT_OPTIONS['pf_beta'])
+    parser.add_argument('--atten-lim-db', type=float, default=DEFAULT_OPTIONS['atten_lim_db'])
+    parser.add_argument('--keep-channels', action='store_true',
+                        help="Conserver les canaux d'origine (stéréo...) au lieu de mixer en mono ; "
+                             "les canaux sont débruités en parallèle")
+    parser.add_argument('--skip-silence', action='store_true',
+                        help="Ne débruiter que les passages actifs ; silences et bruit de fond sont seulement atténués")
+    parser.add_argument('--stream', action='store_true',
+                        help="Débruitage en flux par blocs (mémoire bornée, pour les fichiers très longs)")
+    parser.add_argument('--chunk-seconds', type=float, default=10.0, help="Taille des blocs en mode --stream (s)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Dossier du cache de résultats")
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache de résultats")
+    parser.add_argument('--metrics-jsonl', default=os.environ.get('DEEPFILTER_METRICS_JSONL'),
+                        help="Ajouter les évènements d'instrumentation (une ligne JSON chacun) à ce fichier")
+    parser.add_argument('--metrics-prom', default=os.environ.get('DEEPFILTER_METRICS_PROM'),
+                        help="Écrire les durées par étape au format texte Prometheus dans ce fichier")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Afficher les messages de débogage des workers")
+    args = parser.parse_args(argv)
+    if args.keep_channels and args.stream:
+        parser.error("--keep-channels n'est pas compatible avec --stream (débruitage en flux mono)")
+    if args.formats:
+        if args.stream or args.output_format:
+            parser.error("--formats n'est pas compatible avec --stream ni -f")
+        try:
+            args.formats = parse_targets(args.formats)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.skip_silence and args.stream:
+        parser.error("--skip-silence n'est pas compatible avec --stream (la détection porte sur le fichier entier)")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.setup_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    # Le fichier JSON lines est alimenté directement par les processus du pool
+    metrics.configure(prometheus=args.metrics_prom)
+    # Ne jamais reprendre en entrée les fichiers déjà produits dans le dossier de sortie
+    output_root = os.path.join(os.path.abspath(args.output_dir), '')
+    inputs = [(path, relative) for path, relative in collect_inputs(args.inputs)
+              if not path.startswith(output_root)]
+    if not inputs:
+        print("[ERROR] Aucun fichier audio/vidéo trouvé", file=sys.stderr)
+        return 2
+
+    options = {
+        'postfilter': not args.no_postfilter,
+        'pf_beta': args.pf_beta,
+        'atten_lim_db': args.atten_lim_db
+    }
+    if args.skip_silence:
+        options['skip_silence'] = True
+    # Le statut par fichier part sur stderr si le résumé est écrit sur stdout
+    report = (lambda line: print(line, file=sys.stderr)) if args.summary == '-' else print
+    try:
+        summary = run_batch(inputs, args.output_dir, options, jobs=args.jobs, output_format=args.output_format,
+                            audio_only=args.audio_only, suffix=args.suffix, resume=not args.no_resume,
+                            verbose=args.verbose, stream=args.stream, chunk_seconds=args.chunk_seconds,
+                            cache_dir=None if args.no_cache else args.cache_dir, report=report,
+                            metrics_jsonl=args.metrics_jsonl, keep_channels=args.keep_channels,
+                            formats=args.formats)
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 2
+
+    report(f"Terminé: {summary['ok']} traités, {summary['skipped']} ignorés, {summary['errors']} erreurs "
+           f"en {summary['wall_time']:.1f}s")
+    if args.summary == '-':
+        json.dump(summary, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Compare la latence par fichier des moteurs de débruitage
+(modèle en processus vs exécutable `deep-filter`).
+
+Exemple :
+    python benchmarks/bench_backends.py --durations 1 5 30 --repeat 5 --json resultats.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import synthetic_speech  # noqa: E402
+from deepfilter_interface import BACKENDS, SAMPLE_RATE, get_backend  # noqa: E402
+from wavio import write_wav  # noqa: E402
+
+
+def bench_backend(name, wav_files, repeat):
+    """Mesure la latence de chaque fichier. Le premier appel (chargement) est mesuré à part."""
+    start = time.perf_counter()
+    engine = get_backend(name)
+    init_time = time.perf_counter() - start
+
+    results = {'backend': name, 'init_time': init_time, 'files': []}
+    with tempfile.TemporaryDirectory(prefix='bench_out_') as output_dir:
+        for duration, wav_file in wav_files:
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                engine.process_file(wav_file, output_dir)
+                latencies.append(time.perf_counter() - start)
+            results['files'].append({
+                'duration': duration,
+                'latency_mean': statistics.mean(latencies),
+                'latency_median': statistics.median(latencies),
+                'latency_min': min(latencies),
+                'rtf': statistics.median(latencies) / duration,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[1, 5, 30], help="Durées des clips (s)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix='bench_in_') as input_dir:
+        wav_files = []
+        for duration in args.durations:
+            path = os.path.join(input_dir, f"clip_{duration:g}s.wav")
+            write_wav(path, synthetic_speech(duration, SAMPLE_RATE), SAMPLE_RATE)
+            wav_files.append((duration, path))
+
+        for name in args.backends:
+            if not BACKENDS[name].is_available():
+                print(f"{name}: indisponible, ignoré")
+                report.append({'backend': name, 'skipped': True})
+                continue
+            result = bench_backend(name, wav_files, args.repeat)
+            report.append(result)
+            print(f"{name}: initialisation {result['init_time']:.2f}s")
+            for f in result['files']:
+                print(f"  {f['duration']:>6g}s  médiane {f['latency_median'] * 1000:8.1f} ms  RTF {f['rtf']:.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
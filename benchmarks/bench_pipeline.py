@@ -0,0 +1,242 @@
+"""
+Benchmark étape par étape de la chaîne de traitement sur un corpus synthétique.
+
+Chaque étape s'exécute dans un processus neuf afin de mesurer son propre pic
+de mémoire (RSS). Le rapport JSON (temps, pic RSS, facteur temps réel par
+étape) est comparable d'un commit à l'autre avec --compare.
+
+Exemple :
+    python benchmarks/bench_pipeline.py --duration 60 --channels 2 --sample-rate 44100 --json run.json
+    python benchmarks/bench_pipeline.py --duration 60 --compare run.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import write_corpus  # noqa: E402
+from deepfilter_interface import BACKENDS, SAMPLE_RATE, DenoiseBackend  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class StubBackend(DenoiseBackend):
+    """
+    Moteur de substitution sans modèle : atténue les trames de faible énergie.
+    Permet de mesurer la chaîne complète là où DeepFilterNet n'est pas installé.
+    """
+    name = 'stub'
+    frame_size = 480
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def denoise(self, samples, sample_rate=SAMPLE_RATE):
+        samples = np.asarray(samples, dtype=np.float32)
+        n = len(samples) - len(samples) % self.frame_size
+        frames = samples[:n].reshape(-1, self.frame_size, *samples.shape[1:])
+        energy = np.sqrt(np.mean(frames ** 2, axis=1, keepdims=True))
+        gain = np.clip(energy / (2 * np.median(energy) + 1e-9), 0.1, 1.0)
+        cleaned = samples.copy()
+        cleaned[:n] = (frames * gain).reshape(cleaned[:n].shape)
+        return cleaned
+
+
+BACKENDS[StubBackend.name] = StubBackend
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus courant (Mo), None si indisponible."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux : kilo-octets ; macOS : octets
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+# Étapes : chacune reçoit le contexte (chemins) et lit les sorties des précédentes
+
+def stage_probe(ctx):
+    from probe import probe_media
+    # Sonde réelle : le cache la rendrait instantanée d'une exécution à l'autre
+    probe_media(ctx['input'], use_cache=False)
+
+
+def stage_decode(ctx):
+    from audio_buffer import decode_file
+    decode_file(ctx['input'])
+
+
+def stage_convert_to_wav(ctx):
+    from utils import convert_to_wav
+    convert_to_wav(ctx['input'], ctx['temp_dir'])
+
+
+def stage_process_audio(ctx):
+    from deepfilter_interface import process_audio
+    process_audio(ctx['wav'], ctx['output_dir'], backend=ctx['backend'])
+    if not os.path.exists(ctx['cleaned']):
+        raise Exception("process_audio n'a produit aucun fichier")
+
+
+def stage_spectrogram(ctx):
+    from audio_buffer import DecodedAudio
+    from spectrogram import build_pyramid
+    audio = DecodedAudio.from_wav(ctx['wav'], mapped=True)
+    with tempfile.TemporaryDirectory(prefix='bench_spectro_') as cache_dir:
+        build_pyramid(audio.view(mono=True), audio.sample_rate, cache_dir=cache_dir)
+
+
+def stage_convert_audio_format(ctx):
+    from utils import convert_audio_format
+    convert_audio_format(ctx['cleaned'], os.path.join(ctx['work_dir'], 'export.mp3'), format='mp3')
+
+
+def stage_reconstruct_video_remux(ctx):
+    from utils import reconstruct_video_from_audio_and_video
+    reconstruct_video_from_audio_and_video(ctx['video'], ctx['cleaned'],
+                                           os.path.join(ctx['work_dir'], 'remux.mp4'), 'mp4', mode='remux')
+
+
+def stage_reconstruct_video_reencode(ctx):
+    from utils import reconstruct_video_from_audio_and_video
+    reconstruct_video_from_audio_and_video(ctx['video'], ctx['cleaned'],
+                                           os.path.join(ctx['work_dir'], 'reencode.mp4'), 'mp4', mode='reencode')
+
+
+STAGES = {
+    'probe': stage_probe,
+    'decode': stage_decode,
+    'convert_to_wav': stage_convert_to_wav,
+    'process_audio': stage_process_audio,
+    'spectrogram': stage_spectrogram,
+    'convert_audio_format': stage_convert_audio_format,
+    'reconstruct_video_remux': stage_reconstruct_video_remux,
+    'reconstruct_video_reencode': stage_reconstruct_video_reencode,
+}
+VIDEO_STAGES = {'reconstruct_video_remux', 'reconstruct_video_reencode'}
+
+
+def run_stage(name, ctx):
+    """Exécuté dans un processus dédié : mesure le temps et le pic RSS d'une étape."""
+    baseline = peak_rss_mb()
+    # Les messages de débogage des modules ne doivent pas polluer le rapport
+    sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    error = None
+    try:
+        STAGES[name](ctx)
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - start
+    return {'stage': name, 'wall_time': wall, 'baseline_rss_mb': baseline,
+            'peak_rss_mb': peak_rss_mb(), 'error': error}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(duration, sample_rate, channels, backend, stages, work_dir):
+    corpus = write_corpus(os.path.join(work_dir, 'corpus'), duration, sample_rate, channels,
+                          video=bool(VIDEO_STAGES & set(stages)))
+    use_video = corpus['video'] is not None
+    temp_dir = os.path.join(work_dir, 'temp')
+    output_dir = os.path.join(work_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    input_path = corpus['video'] if use_video else corpus['wav']
+    wav_name = os.path.splitext(os.path.basename(input_path))[0] + '.wav'
+    ctx = {
+        'input': input_path,
+        'video': corpus['video'],
+        'work_dir': work_dir,
+        'temp_dir': temp_dir,
+        'output_dir': output_dir,
+        'wav': os.path.join(temp_dir, wav_name),
+        'cleaned': os.path.join(output_dir, wav_name),
+        'backend': backend,
+    }
+
+    results = []
+    for name in stages:
+        if name in VIDEO_STAGES and not use_video:
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(run_stage, name, ctx).result()
+        result['rtf'] = result['wall_time'] / duration
+        results.append(result)
+    return results
+
+
+def print_report(results, previous=None):
+    before = {r['stage']: r for r in (previous or {}).get('stages', [])}
+    print(f"{'étape':<28}{'temps (s)':>11}{'pic RSS (Mo)':>14}{'RTF':>9}{'vs réf.':>10}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+        ref = before.get(r['stage'])
+        ratio = f"x{r['wall_time'] / ref['wall_time']:.2f}" if ref and ref['wall_time'] else ''
+        line = f"{r['stage']:<28}{r['wall_time']:>11.3f}{rss:>14}{r['rtf']:>9.4f}{ratio:>10}"
+        if r['error']:
+            line += f"  ERREUR: {r['error'][:60]}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark par étape de la chaîne de traitement")
+    parser.add_argument('--duration', type=float, default=30.0, help="Durée du signal synthétique (s)")
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--backend', default='stub', help="Moteur pour process_audio (stub, auto, inprocess, subprocess)")
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--json', help="Écrire le rapport dans ce fichier JSON")
+    parser.add_argument('--compare', help="Rapport JSON de référence à comparer")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as work_dir:
+        results = run_benchmark(args.duration, args.sample_rate, args.channels, args.backend,
+                                args.stages, work_dir)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'duration': args.duration,
+            'sample_rate': args.sample_rate,
+            'channels': args.channels,
+            'backend': args.backend,
+        },
+        'stages': results,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(results, previous)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
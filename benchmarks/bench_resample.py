@@ -0,0 +1,143 @@
+"""
+Compare le rééchantillonneur polyphase (resampler.py) à pydub (`set_frame_rate`)
+et à scipy (`resample_poly`, s'il est installé) : vitesse et précision.
+
+Précision, sur des sinusoïdes dont le signal idéal de sortie est connu :
+    snr_db    rapport signal/erreur dans la bande passante commune (plus haut = mieux)
+    alias_db  niveau d'une sinusoïde au-delà de la nouvelle fréquence de Nyquist (sous-échantillonnage)
+    image_db  énergie créée au-delà de l'ancienne fréquence de Nyquist (suréchantillonnage)
+
+Exemple :
+    python benchmarks/bench_resample.py --rates 44100:48000 22050:48000 96000:48000 --duration 60 --json resample.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resampler import QUALITIES, design_filter, resample  # noqa: E402
+
+# Fractions de la plus basse fréquence de Nyquist utilisées comme sinusoïdes de test
+TONES = (0.01, 0.1, 0.4, 0.8)
+# Bords ignorés dans les mesures (transitoires des filtres)
+EDGE_SECONDS = 0.1
+
+
+def tones(frequencies, duration, sample_rate, channels):
+    t = np.arange(int(duration * sample_rate)) / float(sample_rate)
+    signal = sum(np.sin(2 * np.pi * frequency * t + index) for index, frequency in enumerate(frequencies))
+    signal = 0.8 * signal / len(frequencies)
+    return np.repeat(signal[:, None], channels, axis=1) if channels > 1 else signal
+
+
+def pydub_resample(samples, source_rate, target_rate):
+    """Chemin historique : AudioSegment 16 bits puis set_frame_rate."""
+    channels = samples.shape[1] if samples.ndim == 2 else 1
+    data = (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype('<i2')
+    segment = AudioSegment(data=data.tobytes(), sample_width=2, frame_rate=source_rate, channels=channels)
+    start = time.perf_counter()
+    converted = segment.set_frame_rate(target_rate)
+    elapsed = time.perf_counter() - start
+    output = np.frombuffer(converted.raw_data, dtype='<i2').astype(np.float32) / 32768.0
+    return (output.reshape(-1, channels) if channels > 1 else output), elapsed
+
+
+def scipy_resample(samples, source_rate, target_rate):
+    from math import gcd
+
+    from scipy.signal import resample_poly
+    factor = gcd(source_rate, target_rate)
+    start = time.perf_counter()
+    output = resample_poly(samples, target_rate // factor, source_rate // factor, axis=0).astype(np.float32)
+    return output, time.perf_counter() - start
+
+
+def numpy_resample(quality, workers):
+    def run(samples, source_rate, target_rate):
+        start = time.perf_counter()
+        output = resample(samples, source_rate, target_rate, quality, workers=workers)
+        return output, time.perf_counter() - start
+    return run
+
+
+def level_db(values):
+    return float(10 * np.log10(np.mean(np.square(values, dtype=np.float64)) + 1e-20))
+
+
+def measure(method, source_rate, target_rate, duration, channels):
+    nyquist = min(source_rate, target_rate) / 2.0
+    frequencies = [fraction * nyquist for fraction in TONES]
+    edge = int(EDGE_SECONDS * target_rate)
+    inside = slice(edge, -edge)
+
+    output, elapsed = method(tones(frequencies, duration, source_rate, channels), source_rate, target_rate)
+    ideal = tones(frequencies, duration, target_rate, channels)
+    length = min(len(output), len(ideal))
+    error = output[:length][inside] - ideal[:length][inside]
+    result = {
+        'elapsed': elapsed,
+        'realtime_factor': duration / elapsed if elapsed else None,
+        'snr_db': level_db(ideal[:length][inside]) - level_db(error),
+        'length_error': len(output) - -(-int(duration * source_rate) * target_rate // source_rate),
+    }
+    if target_rate < source_rate and 1.2 * target_rate / 2.0 < source_rate / 2.0:
+        # Sinusoïde à 1,2 x la nouvelle fréquence de Nyquist : doit disparaître
+        stop = tones([0.6 * target_rate], min(duration, 5.0), source_rate, 1)
+        aliased, _ = method(stop, source_rate, target_rate)
+        result['alias_db'] = level_db(aliased[inside]) - level_db(stop)
+    if target_rate > source_rate:
+        mono = output[:, 0] if output.ndim == 2 else output
+        spectrum = np.abs(np.fft.rfft(mono[inside])) ** 2
+        frequency = np.fft.rfftfreq(len(mono[inside]), 1.0 / target_rate)
+        result['image_db'] = float(10 * np.log10(spectrum[frequency > 1.02 * source_rate / 2.0].sum()
+                                                 / spectrum.sum() + 1e-20))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', nargs='+', default=['44100:48000', '22050:48000', '96000:48000', '48000:16000'],
+                        help="Couples source:cible")
+    parser.add_argument('--duration', type=float, default=30.0, help="Durée du signal de test (s)")
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--workers', type=int, help="Fils du rééchantillonneur polyphase (défaut: nombre de cœurs)")
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    methods = {'pydub': pydub_resample}
+    try:
+        import scipy.signal  # noqa: F401
+        methods['scipy'] = scipy_resample
+    except ImportError:
+        print("scipy absent : resample_poly non mesuré")
+    for quality in QUALITIES:
+        methods[f'polyphase-{quality}'] = numpy_resample(quality, args.workers)
+
+    report = []
+    for pair in args.rates:
+        source_rate, target_rate = (int(rate) for rate in pair.split(':'))
+        start = time.perf_counter()
+        for quality in QUALITIES:
+            design_filter(source_rate, target_rate, quality)
+        print(f"{source_rate} -> {target_rate} Hz (conception des filtres: {(time.perf_counter() - start) * 1000:.1f} ms)")
+        for name, method in methods.items():
+            result = dict(measure(method, source_rate, target_rate, args.duration, args.channels),
+                          method=name, source_rate=source_rate, target_rate=target_rate)
+            report.append(result)
+            extra = ''.join(f"  {key} {result[key]:7.1f} dB" for key in ('alias_db', 'image_db') if key in result)
+            print(f"  {name:<18} {result['elapsed'] * 1000:8.1f} ms  x{result['realtime_factor']:7.0f} temps réel  "
+                  f"SNR {result['snr_db']:6.1f} dB{extra}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Corpus synthétique pour les benchmarks : signaux de type parole bruités,
+durée, nombre de canaux et fréquence d'échantillonnage configurables.
+"""
+import os
+import subprocess
+
+import numpy as np
+from pydub import AudioSegment
+
+
+def synthetic_speech(duration, sample_rate=48000, channels=1, snr_db=10.0, seed=0):
+    """
+    Harmoniques à fréquence fondamentale variable, modulées en syllabes
+    (~4 Hz) avec des pauses, plus un bruit blanc au rapport signal/bruit donné.
+    Retourne un tableau float32 (n,) en mono ou (n, canaux).
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sample_rate)
+    t = np.arange(n) / sample_rate
+    output = np.empty((n, channels), dtype=np.float32)
+    for channel in range(channels):
+        f0 = 120 + 40 * channel + 30 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voice = sum(np.sin(k * phase) / k for k in range(1, 10))
+        syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, 2 * np.pi)), 0, None)
+        pauses = (np.sin(2 * np.pi * 0.2 * t + rng.uniform(0, 2 * np.pi)) > -0.5).astype(np.float32)
+        speech = voice * syllables * pauses
+        speech *= 0.3 / max(1e-9, np.abs(speech).max())
+        noise = rng.standard_normal(n)
+        noise *= np.sqrt(np.mean(speech ** 2) / 10 ** (snr_db / 10) / np.mean(noise ** 2))
+        output[:, channel] = speech + noise
+    return output[:, 0] if channels == 1 else output
+
+
+def write_video(path, audio_path, duration, size=(640, 360), fps=25):
+    """Vidéo de test (mire ffmpeg, H.264) portant la piste audio donnée."""
+    command = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"testsrc=duration={duration}:size={size[0]}x{size[1]}:rate={fps}",
+        "-i", audio_path, "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    return path
+
+
+def write_corpus(directory, duration, sample_rate=48000, channels=1, snr_db=10.0, video=True):
+    """Écrit les fichiers de test dans `directory`. Retourne {'wav': chemin, 'video': chemin ou None}."""
+    from wavio import write_wav
+
+    os.makedirs(directory, exist_ok=True)
+    wav_path = os.path.join(directory, f"speech_{duration:g}s_{channels}ch_{sample_rate}.wav")
+    write_wav(wav_path, synthetic_speech(duration, sample_rate, channels, snr_db), sample_rate)
+    video_path = None
+    if video:
+        video_path = write_video(os.path.splitext(wav_path)[0] + '.mp4', wav_path, duration)
+    return {'wav': wav_path, 'video': video_path}
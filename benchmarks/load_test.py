@@ -0,0 +1,152 @@
+"""
+Test de charge du service de débruitage (server.py) sur localhost.
+
+Des clips de parole synthétique sont envoyés par plusieurs clients simultanés.
+Le rapport donne le débit, les centiles de latence vus des clients, la taille
+moyenne des lots formés par le service, et ses propres mesures (/latency, /queue).
+
+Exemple :
+    python benchmarks/load_test.py --spawn --backend subprocess --requests 200 --concurrency 16
+    python benchmarks/load_test.py --url http://127.0.0.1:8765 --durations 1 3 --json charge.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import synthetic_speech  # noqa: E402
+from deepfilter_interface import SAMPLE_RATE  # noqa: E402
+from wavio import write_wav  # noqa: E402
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+def wait_ready(url, process=None, timeout=120.0):
+    """Attend que /health réponde (chargement du moteur compris)."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Le service s'est arrêté (code {process.returncode})")
+        try:
+            return get_json(f"{url}/health")
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Service injoignable: {url}")
+
+
+def make_clips(durations, work_dir):
+    """Corps WAV (octets) des clips, un par durée."""
+    clips = []
+    for index, duration in enumerate(durations):
+        path = os.path.join(work_dir, f"clip{index}.wav")
+        write_wav(path, synthetic_speech(duration, SAMPLE_RATE, seed=index), SAMPLE_RATE)
+        with open(path, 'rb') as f:
+            clips.append((duration, f.read()))
+    return clips
+
+
+def send(url, body):
+    """Une requête /denoise ; retourne (latence, taille du lot, erreur)."""
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'audio/wav'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            batch_size = int(response.headers.get('X-Batch-Size') or 1)
+    except (urllib.error.URLError, ConnectionError) as e:
+        return time.perf_counter() - start, None, str(e)
+    return time.perf_counter() - start, batch_size, None
+
+
+def run_load(url, clips, requests, concurrency, params=''):
+    """Envoie `requests` requêtes (clips en rotation) depuis `concurrency` clients."""
+    endpoint = f"{url}/denoise" + (f"?{params}" if params else '')
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(send, endpoint, clips[index % len(clips)][1]) for index in range(requests)]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _, error in outcomes if error is None])
+    batch_sizes = [size for _, size, error in outcomes if error is None]
+    audio_seconds = sum(clips[index % len(clips)][0] for index, (_, _, error) in enumerate(outcomes) if error is None)
+    report = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(error is not None for _, _, error in outcomes),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'audio_seconds_per_second': audio_seconds / elapsed,
+        'mean_batch_size': float(np.mean(batch_sizes)) if batch_sizes else None,
+    }
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        report.update(latency_p50=float(p50), latency_p90=float(p90), latency_p99=float(p99),
+                      latency_max=float(latencies.max()))
+    errors = [error for _, _, error in outcomes if error is not None]
+    if errors:
+        report['first_error'] = errors[0]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help="Adresse du service")
+    parser.add_argument('--spawn', action='store_true', help="Lancer le service (server.py) pour la durée du test")
+    parser.add_argument('--backend', default='auto', help="Moteur du service lancé avec --spawn")
+    parser.add_argument('--server-args', default='', help="Arguments supplémentaires de server.py (avec --spawn)")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help="Clients simultanés (une passe par valeur)")
+    parser.add_argument('--durations', type=float, nargs='+', default=[2.0], help="Durées des clips (s)")
+    parser.add_argument('--params', default='', help="Réglages en paramètres d'URL, ex. 'atten_lim_db=24'")
+    parser.add_argument('--json', help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url.rstrip('/')
+    if args.spawn:
+        port = url.rsplit(':', 1)[-1]
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py'), '--port', port,
+                                    '--backend', args.backend] + args.server_args.split())
+    try:
+        health = wait_ready(url, process)
+        print(f"Service: moteur {health['backend']}")
+        report = {'service': health, 'runs': []}
+        with tempfile.TemporaryDirectory(prefix='load_test_') as work_dir:
+            clips = make_clips(args.durations, work_dir)
+            send(f"{url}/denoise", clips[0][1])  # Échauffement
+            for concurrency in args.concurrency:
+                run = run_load(url, clips, args.requests, concurrency, args.params)
+                run['server'] = get_json(f"{url}/latency")
+                report['runs'].append(run)
+                print(f"{concurrency:>4} clients  {run['throughput']:7.2f} req/s  "
+                      f"{run['audio_seconds_per_second']:7.1f} s audio/s  "
+                      f"p50 {run.get('latency_p50', 0) * 1000:8.1f} ms  p99 {run.get('latency_p99', 0) * 1000:8.1f} ms  "
+                      f"lot moyen {run['mean_batch_size'] or 0:.2f}  erreurs {run['errors']}")
+        report['queue'] = get_json(f"{url}/queue")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Cache persistant des résultats de débruitage.
+
+La clé est un hash du PCM décodé (le WAV 48 kHz produit par convert_to_wav),
+des options passées à process_audio et du moteur qui les applique : un même
+contenu traité avec les mêmes réglages par le même moteur n'est calculé qu'une
+fois, quel que soit le nom du fichier d'origine.
+Le cache est borné en taille (éviction LRU), vérifie l'intégrité des entrées
+et tient des compteurs de hits/misses partagés entre les processus.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+import metrics
+from wavio import read_wav_data_range
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter si le format des résultats change, pour invalider les anciennes entrées
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.environ.get(
+    'DEEPFILTER_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'deepfiltergui')
+)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _file_digest(path, offset=0, size=None):
+    """sha256 d'une portion de fichier, lue par blocs."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = size
+        while remaining is None or remaining > 0:
+            block = f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def make_key(wav_path, options, backend):
+    """
+    Clé de cache : hash des échantillons du WAV (en-tête exclu), des options et du nom
+    du moteur résolu (voir deepfilter_interface.resolve_backend) ; les moteurs `inprocess`
+    et `subprocess` ne donnent pas exactement le même résultat.
+    """
+    offset, size = read_wav_data_range(wav_path)
+    options_json = json.dumps(options, sort_keys=True)
+    return hashlib.sha256(
+        f"{CACHE_VERSION}:{_file_digest(wav_path, offset, size)}:{options_json}:{backend}".encode()
+    ).hexdigest()
+
+
+def link_or_copy(source, destination):
+    """Lien physique si possible (instantané), copie sinon."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ResultCache:
+    """
+    Entrées stockées sous `<dossier>/entries/<clé>.wav`, index et compteurs
+    dans une base SQLite (sûre en accès concurrent depuis plusieurs processus).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.max_bytes = max_bytes
+        os.makedirs(self.entries_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, size INTEGER, digest TEXT,
+                created REAL, last_access REAL)""")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Connexion à l'index, validée en fin de bloc puis fermée."""
+        db = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite'), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, f"{key}.wav")
+
+    @staticmethod
+    def _count(db, name, amount=1):
+        metrics.count('result_cache_events', amount, event=name)
+        db.execute("INSERT INTO stats (name, value) VALUES (?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def get(self, key):
+        """Retourne le chemin du résultat en cache, ou None. Une entrée corrompue est supprimée."""
+        path = self._entry_path(key)
+        with self._connect() as db:
+            row = db.execute("SELECT size, digest FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                self._count(db, 'misses')
+                return None
+
+            size, digest = row
+            if os.path.getsize(path) != size or _file_digest(path) != digest:
+                logger.warning("Entrée de cache corrompue supprimée: %s", key)
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                os.unlink(path)
+                self._count(db, 'corrupted')
+                self._count(db, 'misses')
+                return None
+
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._count(db, 'hits')
+        return path
+
+    def put(self, key, source_path):
+        """Ajoute un résultat au cache puis applique le budget de taille. Retourne le chemin de l'entrée."""
+        path = self._entry_path(key)
+        partial = f"{path}.{os.getpid()}.partial"
+        shutil.copyfile(source_path, partial)
+        size = os.path.getsize(partial)
+        digest = _file_digest(partial)
+        os.replace(partial, path)
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO entries (key, size, digest, created, last_access) "
+                       "VALUES (?, ?, ?, ?, ?)", (key, size, digest, now, now))
+            self._count(db, 'stores')
+        self.evict()
+        return path
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à respecter max_bytes."""
+        with self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                try:
+                    os.unlink(self._entry_path(key))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._count(db, 'evictions')
+
+    def clear(self):
+        with self._connect() as db:
+            for (key,) in db.execute("SELECT key FROM entries").fetchall():
+                try:
+                    os.unlink(self._entry_path(key))
+                except FileNotFoundError:
+                    pass
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM stats")
+
+    def stats(self):
+        """Compteurs cumulés (hits, misses, stores, evictions, corrupted) et occupation."""
+        with self._connect() as db:
+            stats = {name: 0 for name in ('hits', 'misses', 'stores', 'evictions', 'corrupted')}
+            stats.update(dict(db.execute("SELECT name, value FROM stats").fetchall()))
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': stats['hits'] / lookups if lookups else None,
+        })
+        return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Statistiques et maintenance du cache de résultats")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--clear', action='store_true', help="Vider le cache")
+    args = parser.parse_args()
+    cache = ResultCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
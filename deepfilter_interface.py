@@ -1,16 +1,127 @@
+import collections
+import contextlib
+import inspect
+import logging
+import os
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def process_audio(input_wav, output_dir, options={}):
+import numpy as np
+
+import metrics
+import vad
+from wavio import BLOCK_FRAMES, create_wav, open_wav, read_wav, read_wav_info, write_wav
+
+logger = logging.getLogger(__name__)
+
+# Fréquence d'échantillonnage attendue par DeepFilterNet
+SAMPLE_RATE = 48000
+
+DEFAULT_OPTIONS = {
+    'postfilter': True,
+    'pf_beta': 0.02,
+    'atten_lim_db': 100
+}
+
+# Découpage des fichiers par process_file, avec ou sans suivi de progression :
+# le résultat ne dépend pas de la présence d'un suivi (ni du cache qui le conserve)
+FILE_CHUNK_SECONDS = 5.0
+FILE_OVERLAP_SECONDS = 0.5
+
+# Fondu enchaîné entre régions débruitées et régions ignorées (voir process_active)
+FADE_SECONDS = 0.05
+# Audio d'origine placé devant chaque région dans le WAV compact, sortie ignorée : l'état
+# récurrent et les normalisations du modèle (constante de temps de 1 s) oublient la région
+# précédente et reprennent sur le même fond sonore que lors d'un débruitage du fichier entier
+REGION_CONTEXT_SECONDS = 2.0
+# Trames d'historique revues par les convolutions à chaque pas du débruitage en flux :
+# leur champ réceptif temporel (moins de 8 trames pour DeepFilterNet3), avec une marge ;
+# les GRU ne voient que les trames nouvelles et gardent leur état (voir DeepFilterStream)
+STREAM_CONTEXT_FRAMES = 16
+
+
+class Cancelled(Exception):
+    """Traitement interrompu via l'évènement `cancel`."""
+
+
+class UnsupportedOptions(ValueError):
+    """Options que le moteur ne sait pas appliquer fidèlement (le moteur `subprocess` les applique)."""
+
+
+class ProgressReporter:
     """
-    Appelle DeepFilterNet pour traiter un fichier audio avec les options spécifiées.
+    Convertit des secondes audio traitées en rapports de progression transmis à `callback` :
+    {'fraction', 'processed_seconds', 'total_seconds', 'elapsed', 'rtf', 'eta'}.
+    """
+
+    def __init__(self, total_seconds, callback):
+        self.total_seconds = total_seconds
+        self.callback = callback
+        self.start_time = time.perf_counter()
+
+    def update(self, processed_seconds):
+        elapsed = time.perf_counter() - self.start_time
+        total = self.total_seconds
+        rtf = elapsed / processed_seconds if processed_seconds else None
+        self.callback({
+            'fraction': min(1.0, processed_seconds / total) if total else None,
+            'processed_seconds': processed_seconds,
+            'total_seconds': total,
+            'elapsed': elapsed,
+            'rtf': rtf,
+            'eta': max(0.0, (total - processed_seconds) * rtf) if total and rtf is not None else None,
+        })
+
+
+def crossfade_windows(length):
+    """Fenêtres de fondu (cosinus surélevé) dont la somme vaut 1 en tout point."""
+    t = (np.arange(length) + 0.5) / length
+    fade_in = np.sin(0.5 * np.pi * t) ** 2
+    return fade_in.astype(np.float32), (1.0 - fade_in).astype(np.float32)
+
+
+def denoise_chunks(chunks, denoise, overlap):
+    """
+    Débruite une suite de blocs avec chevauchement.
+
+    Chaque bloc est précédé des `overlap` derniers échantillons du bloc précédent ;
+    cette zone traitée deux fois est mélangée par fondu enchaîné, ce qui évite les
+    discontinuités aux frontières. Génère les échantillons de sortie dans l'ordre.
     """
-    print("[DEBUG] Début de process_audio")
-    print(f"[DEBUG] Paramètres reçus: input={input_wav}, output_dir={output_dir}, options={options}")
-    
+    fade_in, fade_out = crossfade_windows(overlap) if overlap else (None, None)
+    input_tail = None
+    output_tail = None
+
+    chunks = iter(chunks)
+    current = next(chunks, None)
+    while current is not None:
+        following = next(chunks, None)
+        block = current if input_tail is None else np.concatenate([input_tail, current])
+        cleaned = np.asarray(denoise(block), dtype=np.float32)[:len(block)]
+
+        if output_tail is not None:
+            shape = (-1,) + (1,) * (cleaned.ndim - 1)  # Diffusion sur les canaux éventuels
+            cleaned[:overlap] = output_tail * fade_out.reshape(shape) + cleaned[:overlap] * fade_in.reshape(shape)
+
+        if following is None or not overlap:
+            yield cleaned
+        else:
+            yield cleaned[:-overlap]
+            output_tail = cleaned[-overlap:]
+            input_tail = block[-overlap:]
+        current = following
+
+
+def build_command(input_wav, output_dir, options):
+    """Construit la ligne de commande `deep-filter` pour les options données."""
     command = [
         "deep-filter", input_wav, "-o", output_dir
     ]
-    
+
     # Ajout des options
     if options['postfilter']:
         command += ['--pf']
@@ -18,21 +129,666 @@ def process_audio(input_wav, output_dir, options={}):
         command += ['--pf-beta', str(options['pf_beta'])]
     if options['atten_lim_db']:
         command += ['--atten-lim-db', str(options['atten_lim_db'])]
-    
-    print(f"[DEBUG] Commande complète: {' '.join(command)}")
-    
-    try:
-        # Exécuter la commande et capturer la sortie
-        result = subprocess.run(command, capture_output=True, text=True)
-        print(f"[DEBUG] Sortie standard: {result.stdout}")
-        print(f"[DEBUG] Sortie d'erreur: {result.stderr}")
-        print(f"[DEBUG] Code de retour: {result.returncode}")
-        
-        if result.returncode != 0:
-            print(f"[ERROR] La commande a échoué avec le code {result.returncode}")
-            
-    except Exception as e:
-        print(f"[ERROR] Erreur lors de l'exécution de la commande: {str(e)}")
-        raise
-    
-    print("[DEBUG] Fin de process_audio")
\ No newline at end of file
+    return command
+
+
+class DenoiseBackend:
+    """
+    Interface commune des moteurs de débruitage.
+
+    `denoise` travaille sur des tableaux numpy en mémoire (float32, 48 kHz,
+    forme (n,) ou (n, canaux)) ; `process_file` reproduit le contrat historique
+    de `process_audio` : le résultat est écrit dans output_dir sous le même nom.
+    `parallel_channels` : les canaux d'un fichier multicanal gagnent à être traités
+    séparément et simultanément (voir process_channels).
+    `chunk_seconds` : taille des blocs de process_file.
+    `batches` : denoise_batch traite un lot en un seul passage, chaque signal gardant
+    son propre état du modèle ; sinon les signaux sont débruités un à un.
+    `streams` : `stream` fournit un débruiteur en flux, trame par trame (mode direct).
+    """
+    name = None
+    parallel_channels = False
+    batches = False
+    streams = False
+    chunk_seconds = FILE_CHUNK_SECONDS
+
+    def __init__(self, options=None):
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+
+    def denoise(self, samples, sample_rate=SAMPLE_RATE):
+        raise NotImplementedError
+
+    def denoise_block(self, samples, sample_rate, cancel=None):
+        """Un bloc de iter_denoise ; les moteurs capables d'interrompre un bloc en cours reçoivent `cancel`."""
+        return self.denoise(samples, sample_rate)
+
+    def iter_denoise(self, samples, sample_rate, progress=None, cancel=None):
+        """
+        Débruite par blocs de `chunk_seconds` qui se chevauchent et génère les blocs de
+        sortie dans l'ordre, en signalant chaque bloc terminé à `progress` (optionnel).
+        `samples` peut être une vue paresseuse (wavio.SampleView) : seul le bloc courant
+        est alors en mémoire. `cancel` (threading.Event) est vérifié entre les blocs ;
+        lève Cancelled s'il est positionné.
+        """
+        chunk = int(self.chunk_seconds * sample_rate)
+        reporter = ProgressReporter(len(samples) / float(sample_rate), progress) if progress is not None else None
+        done = 0
+        for block in denoise_chunks((samples[i:i + chunk] for i in range(0, len(samples), chunk)),
+                                    lambda block: self.denoise_block(block, sample_rate, cancel),
+                                    int(FILE_OVERLAP_SECONDS * sample_rate)):
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            yield block
+            done += len(block)
+            if reporter is not None:
+                reporter.update(done / float(sample_rate))
+
+    def denoise_with_progress(self, samples, sample_rate, progress, cancel=None):
+        """Comme iter_denoise, mais renvoie le signal débruité complet."""
+        cleaned = list(self.iter_denoise(samples, sample_rate, progress, cancel))
+        return np.concatenate(cleaned) if cleaned else samples[:0]
+
+    def denoise_batch(self, signals, sample_rate=SAMPLE_RATE):
+        """
+        Débruite plusieurs signaux courts et retourne les signaux débruités dans l'ordre.
+        Par défaut un appel par signal : mis bout à bout, ils partageraient l'état du
+        modèle, et le débruitage d'un signal dépendrait de celui qui le précède.
+        """
+        return [self.denoise(np.asarray(signal, dtype=np.float32), sample_rate) for signal in signals]
+
+    def stream(self, frame_size):
+        """
+        Débruiteur en flux pour des trames mono de `frame_size` échantillons à 48 kHz :
+        `process(trame)` rend autant d'échantillons débruités qu'il en reçoit, retardés
+        de `delay` échantillons. Réservé aux moteurs dont `streams` est vrai.
+        """
+        raise NotImplementedError(f"Le moteur {self.name} ne sait pas débruiter en flux")
+
+    def process_file(self, input_wav, output_dir, progress=None, cancel=None):
+        # Toujours par blocs (voir iter_denoise), du fichier d'entrée projeté en mémoire vers la sortie projetée
+        output_file = os.path.join(output_dir, os.path.basename(input_wav))
+        try:
+            with open_wav(input_wav) as source, \
+                    create_wav(output_file, source.frames, source.channels, source.sample_rate) as target:
+                position = 0
+                for block in self.iter_denoise(source.view(), source.sample_rate, progress, cancel):
+                    target.write(position, block)
+                    position += len(block)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(output_file)  # Pas de sortie partielle
+            raise
+        return output_file
+
+    def close(self):
+        pass
+
+
+class SubprocessBackend(DenoiseBackend):
+    """
+    Moteur de secours : lance l'exécutable `deep-filter` pour chaque bloc.
+    Les blocs sont plus longs que pour le moteur en processus, chaque lancement
+    rechargeant le modèle ; la progression compte les blocs réellement terminés.
+    """
+    name = 'subprocess'
+    # Un processus `deep-filter` par canal : le travail se répartit sur les cœurs
+    parallel_channels = True
+    chunk_seconds = 30.0
+    poll_interval = 0.25
+
+    @staticmethod
+    def is_available():
+        return shutil.which("deep-filter") is not None
+
+    def denoise(self, samples, sample_rate=SAMPLE_RATE):
+        return self.denoise_block(samples, sample_rate)
+
+    def denoise_block(self, samples, sample_rate, cancel=None):
+        # Aller-retour par un WAV temporaire, imposé par l'exécutable
+        with tempfile.TemporaryDirectory(prefix='deepfilter_') as work_dir:
+            input_wav = os.path.join(work_dir, 'input.wav')
+            output_dir = os.path.join(work_dir, 'output')
+            os.makedirs(output_dir)
+            write_wav(input_wav, samples, sample_rate)
+            output_file = self.run(input_wav, output_dir, cancel)
+            if not os.path.exists(output_file):
+                raise Exception("deep-filter n'a produit aucun fichier de sortie")
+            cleaned, _ = read_wav(output_file)
+        return cleaned
+
+    def run(self, input_wav, output_dir, cancel=None):
+        """Un appel à `deep-filter` sur input_wav ; `cancel` arrête l'exécutable en cours."""
+        command = build_command(input_wav, output_dir, self.options)
+        logger.debug("Commande complète: %s", ' '.join(command))
+        try:
+            # Exécuter la commande et capturer la sortie
+            with metrics.span('deep_filter_process') as span:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                while True:
+                    try:
+                        stdout, stderr = process.communicate(timeout=self.poll_interval)
+                        break
+                    except subprocess.TimeoutExpired:
+                        if cancel is not None and cancel.is_set():
+                            # Arrêt effectif de l'exécutable, pas seulement de l'attente
+                            process.kill()
+                            process.communicate()
+                            span.set(returncode='cancelled')
+                            raise Cancelled()
+                span.set(returncode=process.returncode)
+            logger.debug("Sortie standard: %s", stdout)
+            logger.debug("Sortie d'erreur: %s", stderr)
+            logger.debug("Code de retour: %s", process.returncode)
+
+            if process.returncode != 0:
+                logger.error("La commande a échoué avec le code %s", process.returncode)
+
+        except Cancelled:
+            logger.debug("Commande annulée: %s", ' '.join(command))
+            raise
+        except Exception as e:
+            logger.error("Erreur lors de l'exécution de la commande: %s", e)
+            raise
+        return os.path.join(output_dir, os.path.basename(input_wav))
+
+
+class DeepFilterEngine(DenoiseBackend):
+    """
+    Moteur en processus : le modèle DeepFilterNet (paquet Python `deepfilternet`)
+    est chargé une seule fois par processus et partagé par toutes les instances, quelles
+    que soient leurs options : post-filtre et atténuation sont appliqués à chaque appel.
+    Les canaux d'un signal multicanal sont traités en un seul lot, torch répartissant
+    le calcul sur les cœurs.
+    """
+    name = 'inprocess'
+    batches = True
+    streams = True
+    # (torch, enhance, modèle, état DF, verrou du modèle), voir _load_model
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self._torch, self._enhance, self._model, self._df_state, self._lock = self._load_model()
+        self.sample_rate = self._df_state.sr()
+        with self._lock:
+            self._configure_post_filter()  # Options inapplicables refusées dès la création
+
+    @classmethod
+    def _load_model(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                import torch
+                from df.enhance import enhance, init_df
+
+                logger.debug("Chargement du modèle DeepFilterNet...")
+                with metrics.span('model_load'):
+                    model, df_state, _ = init_df(post_filter=bool(DEFAULT_OPTIONS['postfilter']),
+                                                 log_level="ERROR", log_file=None)
+                cls._shared = (torch, enhance, model, df_state, threading.Lock())
+                logger.debug("Modèle chargé (sr=%s)", df_state.sr())
+            return cls._shared
+
+    def _configure_post_filter(self):
+        """
+        Applique `postfilter` et `pf_beta` au modèle partagé (verrou tenu), comme `--pf`/`--pf-beta` pour l'exécutable
+        (beta nul : valeur par défaut, comme quand l'option est omise). DeepFilterNet3 lit
+        `post_filter` et `post_filter_beta` sur le réseau à chaque passage ; les modèles
+        antérieurs portent le post-filtre dans leur module Mask, avec le beta fixe de Mask.pf :
+        un autre beta lève UnsupportedOptions plutôt que d'être ignoré.
+        """
+        enabled = bool(self.options['postfilter'])
+        beta = float(self.options['pf_beta'] or DEFAULT_OPTIONS['pf_beta'])
+        if hasattr(self._model, 'post_filter_beta'):
+            self._model.post_filter = enabled
+            self._model.post_filter_beta = beta
+            return
+        from df.modules import Mask
+        masks = [module for module in self._model.modules() if isinstance(module, Mask)]
+        fixed_beta = inspect.signature(Mask.pf).parameters['beta'].default
+        if not masks or (enabled and beta != fixed_beta):
+            raise UnsupportedOptions(f"pf_beta={beta} non applicable par ce modèle DeepFilterNet "
+                                     f"(post-filtre {'absent' if not masks else f'à beta fixe {fixed_beta}'})")
+        for mask in masks:
+            mask.post_filter = enabled
+
+    @staticmethod
+    def is_available():
+        try:
+            import df.enhance  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def denoise(self, samples, sample_rate=SAMPLE_RATE):
+        if sample_rate != self.sample_rate:
+            raise ValueError(f"Fréquence {sample_rate} Hz non supportée, {self.sample_rate} Hz attendus")
+        samples = np.asarray(samples, dtype=np.float32)
+        # enhance attend un tenseur (canaux, n)
+        audio = self._torch.from_numpy(np.ascontiguousarray(samples.T if samples.ndim == 2 else samples[None, :]))
+        atten_lim_db = self.options['atten_lim_db'] or None
+        with self._lock, self._torch.no_grad():
+            self._configure_post_filter()
+            cleaned = self._enhance(self._model, self._df_state, audio, atten_lim_db=atten_lim_db)
+        cleaned = cleaned.cpu().numpy()
+        return cleaned[0] if samples.ndim == 1 else cleaned.T
+
+    def denoise_batch(self, signals, sample_rate=SAMPLE_RATE):
+        """
+        Signaux mono : complétés par des zéros à la même longueur et empilés comme les
+        canaux d'un même signal, ils forment un lot que le modèle traite d'un seul passage,
+        chaque canal étant une entrée distincte du lot, avec son propre état.
+        """
+        signals = [np.asarray(signal, dtype=np.float32) for signal in signals]
+        if len(signals) == 1 or any(signal.ndim != 1 for signal in signals):
+            return super().denoise_batch(signals, sample_rate)
+        stacked = np.zeros((max(len(signal) for signal in signals), len(signals)), dtype=np.float32)
+        for index, signal in enumerate(signals):
+            stacked[:len(signal), index] = signal
+        cleaned = self.denoise(stacked, sample_rate)
+        return [cleaned[:len(signal), index] for index, signal in enumerate(signals)]
+
+    def stream(self, frame_size):
+        return DeepFilterStream(self, frame_size)
+
+
+class DeepFilterStream:
+    """
+    Débruitage en flux par le modèle du moteur en processus. STFT, normalisations, état
+    des GRU et synthèse sont conservés d'une trame à l'autre : à chaque pas, seules les
+    trames nouvelles traversent les GRU, les convolutions revoyant en plus
+    STREAM_CONTEXT_FRAMES trames d'historique. Le résultat est celui de `enhance` sur le
+    signal entier, retardé de `delay` échantillons (anticipation du modèle et recouvrement
+    de la STFT).
+    """
+
+    def __init__(self, engine, frame_size):
+        import libdf
+        from df.model import ModelParams
+        from df.utils import get_norm_alpha
+
+        params = ModelParams()
+        df_state = engine._df_state
+        self.hop = df_state.hop_size()
+        if frame_size % self.hop:
+            raise ValueError(f"Trames de {frame_size} échantillons : multiple de {self.hop} attendu en flux")
+        self._engine = engine
+        self._libdf = libdf
+        self._df = libdf.DF(sr=df_state.sr(), fft_size=df_state.fft_size(), hop_size=self.hop,
+                            nb_bands=params.nb_erb, min_nb_erb_freqs=params.min_nb_freqs)
+        self._erb_widths = self._df.erb_widths()
+        self._nb_df = getattr(engine._model, 'nb_df', params.nb_df)
+        # Normalisations de df_features, dont libdf ne rend pas l'état : mêmes valeurs initiales
+        self._alpha = get_norm_alpha(False)
+        self._erb_norm = np.linspace(-60.0, -90.0, params.nb_erb, dtype=np.float32)
+        self._unit_norm = libdf.unit_norm_init(self._nb_df)[0].astype(np.float32)
+        self._spec = np.zeros((0, df_state.fft_size() // 2 + 1), dtype=np.complex64)
+        self._erb = np.zeros((0, params.nb_erb), dtype=np.float32)
+        self._feat = np.zeros((0, self._nb_df), dtype=np.complex64)
+        # Une trame n'est définitive qu'une fois vues les `lookahead` suivantes
+        self._lookahead = max(params.conv_lookahead, params.df_lookahead)
+        self._frames = 0
+        self._done = 0
+        self._grus = [module for module in engine._model.modules() if isinstance(module, engine._torch.nn.GRU)]
+        self._gru_states = {}
+        atten_lim_db = engine.options['atten_lim_db']
+        self._lim = 10 ** (-abs(atten_lim_db) / 20) if atten_lim_db else 0.0
+        self._output = np.zeros(self._lookahead * self.hop, dtype=np.float32)
+        self.delay = self._lookahead * self.hop + df_state.fft_size() - self.hop
+
+    def process(self, frame):
+        """Débruite une trame (multiple du pas de la STFT) ; rend autant d'échantillons, retardés de `delay`."""
+        frame = np.asarray(frame, dtype=np.float32)
+        if len(frame) % self.hop:
+            raise ValueError(f"Trame de {len(frame)} échantillons : multiple de {self.hop} attendu en flux")
+        spec = self._df.analysis(frame[None], reset=False)[0]
+        erb = self._libdf.erb(spec[None], self._erb_widths)[0]
+        feat = spec[:, :self._nb_df].copy()
+        alpha = self._alpha
+        for t in range(len(spec)):
+            self._erb_norm = erb[t] * (1 - alpha) + self._erb_norm * alpha
+            erb[t] = (erb[t] - self._erb_norm) / 40.0
+            self._unit_norm = np.abs(feat[t]) * (1 - alpha) + self._unit_norm * alpha
+            feat[t] = feat[t] / np.sqrt(self._unit_norm)
+        keep = STREAM_CONTEXT_FRAMES + len(spec)
+        self._spec = np.concatenate([self._spec, spec])[-keep:]
+        self._erb = np.concatenate([self._erb, erb])[-keep:]
+        self._feat = np.concatenate([self._feat, feat])[-keep:]
+        self._frames += len(spec)
+        ready = self._frames - self._lookahead
+        if ready > self._done:
+            self._output = np.concatenate([self._output, self._enhance(ready - self._done)])
+            self._done = ready
+        cleaned, self._output = self._output[:len(frame)], self._output[len(frame):]
+        return cleaned
+
+    def _enhance(self, count):
+        """Passe le modèle sur la fenêtre et synthétise ses `count` trames devenues définitives."""
+        engine, torch = self._engine, self._engine._torch
+        window = len(self._spec)
+        first = window - self._lookahead - count
+
+        # Les GRU ne reçoivent que les trames définitives, avec l'état laissé au pas précédent ;
+        # leur sortie est replacée dans la fenêtre (les couches suivantes sont trame à trame)
+        def before(module, args):
+            return args[0][:, first:first + count], self._gru_states.get(module)
+
+        def after(module, args, output):
+            output, state = output
+            self._gru_states[module] = state
+            padded = output.new_zeros((output.shape[0], window) + output.shape[2:])
+            padded[:, first:first + count] = output
+            return padded, state
+
+        spec = torch.view_as_real(torch.from_numpy(self._spec))[None, None]
+        erb = torch.from_numpy(self._erb)[None, None]
+        feat = torch.view_as_real(torch.from_numpy(self._feat))[None, None]
+        with engine._lock, torch.no_grad():
+            engine._configure_post_filter()
+            hooks = []
+            try:
+                for gru in self._grus:
+                    hooks += [gru.register_forward_pre_hook(before), gru.register_forward_hook(after)]
+                enhanced = engine._model(spec.clone(), erb, feat)[0]
+            finally:
+                for hook in hooks:
+                    hook.remove()
+        enhanced = torch.view_as_complex(enhanced[0, 0, first:first + count].contiguous()).numpy()
+        if self._lim:
+            # Comme `enhance` : une part du spectre bruité borne l'atténuation
+            enhanced = (self._spec[first:first + count] * self._lim + enhanced * (1 - self._lim)).astype(np.complex64)
+        return self._df.synthesis(enhanced[None], reset=False)[0]
+
+
+BACKENDS = {
+    DeepFilterEngine.name: DeepFilterEngine,
+    SubprocessBackend.name: SubprocessBackend,
+}
+
+# Moteurs déjà initialisés, gardés « chauds » : les MAX_ENGINES derniers utilisés.
+# Un moteur évincé reste utilisable par qui le détient ; le modèle en processus est
+# de toute façon partagé (voir DeepFilterEngine), seules les options diffèrent.
+MAX_ENGINES = 8
+_engines = collections.OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def get_backend(name='auto', options=None):
+    """
+    Retourne un moteur initialisé, réutilisé entre les appels pour des options identiques.
+    'auto' choisit le moteur en processus s'il est installé, sinon l'exécutable `deep-filter` ;
+    il se replie aussi sur l'exécutable si le modèle en processus ne sait pas appliquer
+    les options (voir UnsupportedOptions), pour ne jamais en ignorer une silencieusement.
+    """
+    if name == 'auto':
+        if DeepFilterEngine.is_available():
+            try:
+                return get_backend(DeepFilterEngine.name, options)
+            except UnsupportedOptions as e:
+                if not SubprocessBackend.is_available():
+                    raise
+                logger.warning("Moteur en processus écarté: %s ; repli sur `deep-filter`", e)
+        name = SubprocessBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur inconnu: {name} (disponibles: {', '.join(BACKENDS)})")
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    key = (name, tuple(sorted(options.items())))
+    with _engines_lock:
+        if key in _engines:
+            _engines.move_to_end(key)
+        else:
+            _engines[key] = BACKENDS[name](options)
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+        return _engines[key]
+
+
+def resolve_backend(name='auto', options=None):
+    """
+    Nom du moteur qui traitera `options` (hors `skip_silence`) pour process_audio :
+    'auto' est résolu comme par get_backend, repli sur `deep-filter` compris.
+    """
+    if name != 'auto':
+        return name
+    options = {key: value for key, value in (options or {}).items() if key != 'skip_silence'}
+    return get_backend(name, options).name
+
+
+def format_progress(report):
+    """Résumé lisible d'un rapport de progression."""
+    text = f"{report['processed_seconds']:.1f}s traitées"
+    if report['fraction'] is not None:
+        text = f"{100 * report['fraction']:.0f}% ({text})"
+    if report['rtf'] is not None:
+        text += f", RTF {report['rtf']:.2f}"
+    if report['eta'] is not None:
+        text += f", reste ~{report['eta']:.0f}s"
+    return text
+
+
+class _AnyEvent:
+    """Positionné dès que l'un des évènements l'est (annulation externe ou échec d'un autre canal)."""
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
+
+
+def process_channels(engine, input_wav, output_dir, progress=None, cancel=None, workers=None):
+    """
+    Débruite chaque canal d'un WAV multicanal indépendamment, jusqu'à `workers`
+    canaux à la fois (défaut : nombre de cœurs), puis réassemble un WAV multicanal
+    aligné échantillon par échantillon dans output_dir, sous le même nom.
+    La progression rapportée est la moyenne de celle des canaux. Les canaux sont
+    séparés et réassemblés par blocs entre fichiers projetés en mémoire.
+    """
+    source = open_wav(input_wav)
+    channels, sample_rate, frames = source.channels, source.sample_rate, source.frames
+    workers = max(1, min(channels, workers or os.cpu_count() or 1))
+    reporter = ProgressReporter(source.duration, progress) if progress is not None else None
+    processed = [0.0] * channels
+    progress_lock = threading.Lock()
+    failed = threading.Event()
+    stop = _AnyEvent(cancel, failed)
+
+    def channel_progress(channel, report):
+        with progress_lock:
+            processed[channel] = report['processed_seconds']
+            reporter.update(sum(processed) / channels)
+
+    def run(channel, work_dir):
+        channel_dir = os.path.join(work_dir, str(channel))
+        os.makedirs(os.path.join(channel_dir, 'output'))
+        channel_wav = os.path.join(channel_dir, 'input.wav')
+        try:
+            with create_wav(channel_wav, frames, 1, sample_rate) as target:
+                for start, block in source.blocks(channel=channel):
+                    target.write(start, block)
+            with metrics.span('denoise_channel', backend=engine.name):
+                output_file = engine.process_file(
+                    channel_wav, os.path.join(channel_dir, 'output'),
+                    (lambda report: channel_progress(channel, report)) if reporter is not None else None, stop)
+            if not os.path.exists(output_file):
+                raise Exception(f"Aucune sortie pour le canal {channel}")
+        except BaseException:
+            failed.set()  # Inutile de poursuivre les autres canaux
+            raise
+        return output_file
+
+    logger.debug("Débruitage de %s canaux, %s à la fois", channels, workers)
+    output_file = os.path.join(output_dir, os.path.basename(input_wav))
+    with tempfile.TemporaryDirectory(prefix='deepfilter_channels_') as work_dir:
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run, channel, work_dir) for channel in range(channels)]
+                errors = [future.exception() for future in futures]
+        finally:
+            source.close()
+        # L'erreur d'origine prime sur les annulations qu'elle a provoquées dans les autres canaux
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise next((error for error in errors if not isinstance(error, Cancelled)), errors[0])
+
+        # Réassemblage aligné sur la longueur d'entrée (le moteur peut ajouter ou retirer
+        # quelques échantillons) ; la fin éventuellement manquante reste à zéro
+        with create_wav(output_file, frames, channels, sample_rate) as target:
+            for channel, future in enumerate(futures):
+                with open_wav(future.result()) as cleaned:
+                    length = min(cleaned.frames, frames)
+                    for start in range(0, length, BLOCK_FRAMES):
+                        target.write(start, cleaned.read(start, min(start + BLOCK_FRAMES, length), mono=True),
+                                     channel=channel)
+    return output_file
+
+
+def _denoise_file(engine, input_wav, output_dir, progress=None, cancel=None, channel_workers=None):
+    """Débruite un WAV entier : canaux en parallèle si le moteur y gagne, sinon en un seul appel."""
+    channels, _, _ = read_wav_info(input_wav)
+    if channels > 1 and engine.parallel_channels:
+        return process_channels(engine, input_wav, output_dir, progress, cancel, channel_workers)
+    return engine.process_file(input_wav, output_dir, progress, cancel)
+
+
+def process_active(engine, input_wav, output_dir, progress=None, cancel=None, channel_workers=None):
+    """
+    Ne débruite que les régions actives d'un WAV (voir vad.py), écrit dans output_dir
+    sous le même nom. Les régions, chacune précédée de REGION_CONTEXT_SECONDS d'audio
+    d'origine (sortie ignorée) pour que l'état du modèle ne porte pas la région
+    précédente, sont concaténées dans un WAV compact traité en un seul appel au
+    moteur ; le reste reçoit le gain d'atténuation maximal du moteur (atten_lim_db),
+    avec fondu enchaîné de FADE_SECONDS aux frontières, pris dans la marge de la
+    région. La progression porte sur le WAV compact.
+    Retourne les statistiques : durées totale, active et ignorée (s), part ignorée,
+    nombre de régions, temps de traitement économisé estimé (s) et `applied` (faux
+    si trop peu d'audio était ignorable : le fichier a alors été débruité en entier).
+    """
+    output_file = os.path.join(output_dir, os.path.basename(input_wav))
+    with open_wav(input_wav) as source:
+        regions = vad.find_active_regions(source)
+        frames, channels, sample_rate = source.frames, source.channels, source.sample_rate
+        active = sum(stop - start for start, stop in regions)
+        context = int(REGION_CONTEXT_SECONDS * sample_rate)
+        # (début du contexte, début, fin) de chaque région et longueur du WAV compact
+        segments = [(max(0, start - context), start, stop) for start, stop in regions]
+        compact = sum(stop - lead for lead, _, stop in segments)
+        stats = {
+            'total_seconds': frames / float(sample_rate),
+            'active_seconds': active / float(sample_rate),
+            'skipped_seconds': (frames - active) / float(sample_rate),
+            'skipped_fraction': 1.0 - active / float(frames) if frames else 0.0,
+            'regions': len(regions),
+            'saved_seconds': 0.0,
+            'applied': False,
+        }
+        if not frames or 1.0 - compact / float(frames) < vad.MIN_SKIP_FRACTION:
+            _denoise_file(engine, input_wav, output_dir, progress, cancel, channel_workers)
+            return stats
+
+        atten_lim_db = engine.options['atten_lim_db']
+        gain = 10.0 ** (-atten_lim_db / 20.0) if atten_lim_db else 0.0
+        with tempfile.TemporaryDirectory(prefix='deepfilter_vad_') as work_dir:
+            compact_wav = os.path.join(work_dir, os.path.basename(input_wav))
+            offsets = []  # Position du début de chaque région dans le WAV compact
+            if active:
+                with create_wav(compact_wav, compact, channels, sample_rate) as target:
+                    position = 0
+                    for lead, start, stop in segments:
+                        offsets.append(position + start - lead)
+                        for block_start in range(lead, stop, BLOCK_FRAMES):
+                            block = source.read(block_start, min(block_start + BLOCK_FRAMES, stop))
+                            target.write(position, block)
+                            position += len(block)
+                os.makedirs(os.path.join(work_dir, 'output'))
+                start_time = time.perf_counter()
+                cleaned_file = _denoise_file(engine, compact_wav, os.path.join(work_dir, 'output'),
+                                             progress, cancel, channel_workers)
+                if not os.path.exists(cleaned_file):
+                    raise Exception("Aucune sortie pour les régions actives")
+                # Coût évité, au rythme mesuré sur le WAV compact
+                stats['saved_seconds'] = (time.perf_counter() - start_time) * (frames - compact) / float(compact)
+
+            fade = int(FADE_SECONDS * sample_rate)
+            try:
+                with create_wav(output_file, frames, channels, sample_rate) as target:
+                    for start, block in source.blocks():
+                        target.write(start, block * gain)
+                    if active:
+                        with open_wav(cleaned_file) as cleaned:
+                            _merge_regions(target, source, cleaned, regions, offsets, gain, fade)
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(output_file)  # Pas de sortie partielle
+                raise
+    stats['applied'] = True
+    metrics.count('silence_skipped_seconds', stats['skipped_seconds'], backend=engine.name)
+    metrics.count('silence_saved_seconds', stats['saved_seconds'], backend=engine.name)
+    logger.info("Silences ignorés: %.0f %% de %.1fs (%s régions actives), ~%.1fs de traitement économisées",
+                100 * stats['skipped_fraction'], stats['total_seconds'], stats['regions'], stats['saved_seconds'])
+    return stats
+
+
+def _merge_regions(target, source, cleaned, regions, offsets, gain, fade):
+    """
+    Replace dans `target` les régions débruitées (lues dans `cleaned` à partir de leur
+    position `offsets`), en fondu enchaîné avec le signal atténué (`source` × gain) à
+    chaque frontière intérieure.
+    """
+    frames = source.frames
+    for (start, stop), position in zip(regions, offsets):
+        length = stop - start
+        head = min(fade, length // 2) if start > 0 else 0
+        tail = min(fade, length // 2) if stop < frames else 0
+        head_in = crossfade_windows(head)[0] if head else None
+        tail_out = crossfade_windows(tail)[1] if tail else None
+        for block_start in range(start, stop, BLOCK_FRAMES):
+            block_stop = min(block_start + BLOCK_FRAMES, stop)
+            offset = position + block_start - start
+            block = cleaned.read(min(offset, cleaned.frames), min(offset + block_stop - block_start, cleaned.frames))
+            if len(block) < block_stop - block_start:  # Le moteur peut rogner la fin
+                missing = (block_stop - block_start - len(block),) + block.shape[1:]
+                block = np.concatenate([block, np.zeros(missing, dtype=np.float32)])
+            index = np.arange(block_start, block_stop) - start
+            weight = np.ones(len(index), dtype=np.float32)
+            if head:
+                starting = index < head
+                weight[starting] = head_in[index[starting]]
+            if tail:
+                ending = index >= length - tail
+                weight[ending] *= tail_out[index[ending] - (length - tail)]
+            if (weight < 1).any():
+                shape = (-1,) + (1,) * (block.ndim - 1)
+                attenuated = source.read(block_start, block_stop) * gain
+                block = block * weight.reshape(shape) + attenuated * (1.0 - weight).reshape(shape)
+            target.write(block_start, block)
+
+
+def process_audio(input_wav, output_dir, options={}, backend='auto', progress=None, cancel=None,
+                  channel_workers=None):
+    """
+    Appelle DeepFilterNet pour traiter un fichier audio avec les options spécifiées.
+    `progress(rapport)` reçoit l'avancement (voir ProgressReporter).
+    `cancel` (threading.Event) interrompt le traitement, processus `deep-filter` compris : lève Cancelled.
+    Un WAV multicanal garde ses canaux ; avec le moteur `subprocess`, ils sont débruités
+    simultanément par au plus `channel_workers` processus (défaut : nombre de cœurs).
+    L'option `skip_silence` ne débruite que les régions actives (voir process_active) ;
+    les statistiques de process_active sont alors renvoyées, None sinon.
+    """
+    logger.debug("Début de process_audio: input=%s, output_dir=%s, options=%s, backend=%s",
+                 input_wav, output_dir, options, backend)
+
+    options = dict(options or {})
+    skip_silence = options.pop('skip_silence', False)  # Hors des options du moteur
+    engine = get_backend(backend, options)
+    channels, sample_rate, frames = read_wav_info(input_wav)
+    stats = None
+    with metrics.span('denoise', backend=engine.name, channels=channels):
+        if skip_silence:
+            stats = process_active(engine, input_wav, output_dir, progress, cancel, channel_workers)
+        else:
+            _denoise_file(engine, input_wav, output_dir, progress, cancel, channel_workers)
+    metrics.count('denoised_seconds', frames / float(sample_rate), backend=engine.name)
+
+    logger.debug("Fin de process_audio")
+    return stats
@@ -0,0 +1,161 @@
+"""
+Export simultané d'un résultat vers plusieurs formats.
+
+Le WAV nettoyé est projeté en mémoire une seule fois. Ses échantillons PCM bruts
+sont envoyés tels quels, par blocs, à un encodeur ffmpeg par format cible, tous
+lancés en parallèle : aucun encodeur ne relit ni ne redécode le fichier, et la
+progression de chaque cible est exacte (part des échantillons transmis).
+"""
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pydub import AudioSegment
+
+import metrics
+from deepfilter_interface import Cancelled
+from utils import EXPORT_CODECS, EXPORT_MUXERS
+from wavio import BLOCK_FRAMES, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, open_wav
+
+logger = logging.getLogger(__name__)
+
+# Formats proposés, et débit par défaut des formats avec perte
+EXPORT_FORMATS = ['wav', 'flac', 'mp3', 'm4a', 'ogg']
+LOSSLESS_FORMATS = {'wav', 'flac'}
+DEFAULT_BITRATES = {'mp3': '192k', 'm4a': '192k', 'ogg': '160k'}
+
+# (format WAV, bits) -> format brut ffmpeg des échantillons envoyés sur l'entrée standard
+_RAW_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): 'u8',
+    (WAVE_FORMAT_PCM, 16): 's16le',
+    (WAVE_FORMAT_PCM, 24): 's24le',
+    (WAVE_FORMAT_PCM, 32): 's32le',
+    (WAVE_FORMAT_IEEE_FLOAT, 32): 'f32le',
+    (WAVE_FORMAT_IEEE_FLOAT, 64): 'f64le',
+}
+
+
+def parse_targets(spec):
+    """
+    Cibles d'export depuis une liste « format[:débit] » séparée par des virgules
+    (ex. « wav,flac,mp3:320k,m4a ») : [{'format', 'bitrate'}, ...].
+    """
+    targets = []
+    for item in spec.split(','):
+        format, _, bitrate = item.strip().lower().lstrip('.').partition(':')
+        if not format:
+            continue
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Format d'export inconnu: {format} (disponibles: {', '.join(EXPORT_FORMATS)})")
+        if format in LOSSLESS_FORMATS:
+            bitrate = None
+        targets.append({'format': format, 'bitrate': bitrate or DEFAULT_BITRATES.get(format)})
+    if not targets:
+        raise ValueError("Aucun format d'export")
+    return targets
+
+
+def target_paths(base_path, targets):
+    """Associe à chaque cible le chemin `<base_path>.<format>` (extension de base_path retirée)."""
+    stem = os.path.splitext(base_path)[0]
+    return [dict(target, path=f"{stem}.{target['format']}") for target in targets]
+
+
+def encoder_command(wav, target, output_path):
+    """Ligne de commande ffmpeg qui encode le PCM brut de `wav` (wavio.MappedWav) lu sur l'entrée standard."""
+    raw_format = _RAW_FORMATS[(wav.format_tag, wav.bits)]
+    command = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-y",
+        "-f", raw_format, "-ar", str(wav.sample_rate), "-ac", str(wav.channels), "-i", "-"
+    ]
+    format = target['format']
+    if format == 'wav':
+        command += ["-c:a", f"pcm_{raw_format}"]  # Échantillons recopiés sans conversion
+    elif format in EXPORT_CODECS:
+        command += ["-c:a", EXPORT_CODECS[format]]
+    if target.get('bitrate') and format not in LOSSLESS_FORMATS:
+        command += ["-b:a", target['bitrate']]
+    command += ["-f", EXPORT_MUXERS.get(format, format), output_path]
+    return command
+
+
+def _encode(wav, target, index, progress, cancel):
+    """Alimente un encodeur bloc par bloc ; la sortie n'apparaît sous son nom qu'une fois complète."""
+    path = target['path']
+    stem, ext = os.path.splitext(path)
+    partial = f"{stem}.partial{ext}"
+    command = encoder_command(wav, target, partial)
+    logger.debug("Commande d'export: %s", ' '.join(command))
+    start_time = time.perf_counter()
+    with metrics.span('export', format=target['format']):
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            try:
+                for start in range(0, wav.frames, BLOCK_FRAMES):
+                    if cancel is not None and cancel.is_set():
+                        raise Cancelled()
+                    process.stdin.write(np.ascontiguousarray(wav.raw[start:start + BLOCK_FRAMES]).data)
+                    if progress is not None:
+                        progress(index, min(wav.frames, start + BLOCK_FRAMES) / float(wav.frames))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # L'encodeur s'est arrêté : son message d'erreur suit
+            error = process.stderr.read().decode(errors='replace')
+            if process.wait() != 0:
+                raise Exception(f"Échec de l'export {target['format']}: {error.strip()}")
+            os.replace(partial, path)
+        except BaseException:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if os.path.exists(partial):
+                os.unlink(partial)
+            raise
+    if progress is not None and not wav.frames:
+        progress(index, 1.0)
+    return time.perf_counter() - start_time
+
+
+def export_targets(wav_path, targets, workers=None, progress=None, cancel=None):
+    """
+    Encode `wav_path` vers chaque cible ({'format', 'bitrate', 'path'}, voir parse_targets
+    et target_paths), jusqu'à `workers` encodeurs simultanés (défaut : tous).
+    `progress(index de la cible, fraction)` est appelé depuis les fils d'export.
+    Une cible en échec n'interrompt pas les autres. Retourne, dans l'ordre des cibles,
+    {'format', 'bitrate', 'path', 'status' ('ok' | 'error'), 'error', 'elapsed', 'size'}.
+    `cancel` (threading.Event) arrête tous les encodeurs : lève Cancelled.
+    """
+    workers = max(1, min(len(targets), workers or len(targets)))
+    with open_wav(wav_path) as wav:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_encode, wav, target, index, progress, cancel)
+                       for index, target in enumerate(targets)]
+            outcomes = [(future.result() if future.exception() is None else None, future.exception())
+                        for future in futures]
+    if any(isinstance(error, Cancelled) for _, error in outcomes):
+        raise Cancelled()
+
+    results = []
+    for target, (elapsed, error) in zip(targets, outcomes):
+        results.append(dict(target, status='error' if error else 'ok', error=str(error) if error else None,
+                            elapsed=elapsed, size=None if error else os.path.getsize(target['path'])))
+        if error:
+            logger.error("Export %s impossible: %s", target['path'], error)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Export d'un WAV vers plusieurs formats en parallèle")
+    parser.add_argument('input', help="WAV à exporter")
+    parser.add_argument('-o', '--output', required=True, help="Chemin de base des sorties (extension remplacée)")
+    parser.add_argument('--formats', default='wav,flac,mp3,m4a', help="Formats, ex. 'wav,flac,mp3:320k,m4a'")
+    parser.add_argument('-j', '--jobs', type=int, help="Encodeurs simultanés (défaut : tous)")
+    args = parser.parse_args()
+    results = export_targets(args.input, target_paths(args.output, parse_targets(args.formats)), args.jobs)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
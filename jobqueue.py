@@ -0,0 +1,304 @@
+"""
+File d'attente de traitements avec ordonnanceur à concurrence bornée.
+
+Les tâches sont servies par priorité décroissante puis par ordre d'arrivée, par
+au plus `max_workers` fils d'exécution (modifiable à chaud). Le débruitage
+lui-même tourne dans l'exécutable `deep-filter` ou dans le moteur en processus,
+des fils suffisent donc à occuper les cœurs sans bloquer l'interface.
+
+Chaque tâche travaille dans son propre dossier. L'annulation d'une tâche en
+attente la retire de la file ; celle d'une tâche en cours arrête le processus
+`deep-filter` (voir process_audio(cancel=...)) et supprime son dossier de travail.
+"""
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import metrics
+from audio_buffer import decode_file
+from cache import link_or_copy, make_key
+from deepfilter_interface import Cancelled, process_audio, resolve_backend
+from utils import convert_to_wav
+from waveform import build_peaks, peaks_for_wav
+from wavio import read_wav_info
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+STATE_LABELS = {
+    PENDING: "En attente",
+    RUNNING: "En cours",
+    DONE: "Terminé",
+    FAILED: "Erreur",
+    CANCELLED: "Annulé",
+}
+
+
+class Job:
+    """Un fichier à traiter, son état et ses résultats."""
+
+    def __init__(self, job_id, input_path, priority=0, options=None, wav_file=None, keep_channels=False):
+        self.id = job_id
+        self.input_path = input_path
+        self.priority = priority
+        self.options = options
+        # WAV 48 kHz déjà préparé (fichier ouvert dans l'interface), sinon produit par la tâche
+        self.wav_file = wav_file
+        # Conserver les canaux d'origine plutôt que mixer en mono
+        self.keep_channels = keep_channels
+        self.state = PENDING
+        self.fraction = 0.0
+        self.report = None
+        self.error = None
+        self.work_dir = None
+        self.output_file = None
+        self.has_video = False
+        self.audio_duration = None
+        self.cached = False
+        # Statistiques des silences ignorés (option skip_silence, voir process_active)
+        self.silence = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def name(self):
+        return os.path.basename(self.input_path)
+
+    @property
+    def processing_time(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rtf(self):
+        if self.state != DONE or not self.audio_duration:
+            return None
+        return self.processing_time / self.audio_duration
+
+
+class JobScheduler:
+    """
+    Ordonnanceur : `run(job, update)` exécute une tâche (dans un fil dédié) et
+    appelle `update()` à chaque avancement ; il doit lever Cancelled quand
+    `job.cancel_event` est positionné. `on_update(job)` est appelé à chaque
+    changement d'état ou d'avancement, depuis le fil de la tâche.
+    """
+
+    def __init__(self, run, max_workers=2, on_update=None):
+        self._run = run
+        self.max_workers = max(1, max_workers)
+        self.on_update = on_update
+        self.jobs = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._running = 0
+        self._threads = []
+        self._closed = False
+
+    def submit(self, input_path, priority=0, options=None, wav_file=None, keep_channels=False):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("La file de traitement est fermée")
+            job = Job(next(self._ids), input_path, priority, options, wav_file, keep_channels)
+            self.jobs[job.id] = job
+            self._push(job)
+            self._spawn()
+        self._notify(job)
+        return job
+
+    def _push(self, job):
+        # Entrées invalidées paresseusement : seule la plus récente priorité d'une tâche compte
+        heapq.heappush(self._heap, (-job.priority, next(self._sequence), job.id, job.priority))
+
+    def _pop(self):
+        while self._heap:
+            _, _, job_id, priority = heapq.heappop(self._heap)
+            job = self.jobs.get(job_id)
+            if job is not None and job.state == PENDING and job.priority == priority:
+                return job
+        return None
+
+    def _spawn(self):
+        """Démarre des fils tant que la limite le permet et qu'il reste des tâches (verrou tenu)."""
+        pending = sum(1 for job in self.jobs.values() if job.state == PENDING)
+        while pending > 0 and self._running < self.max_workers:
+            self._running += 1
+            pending -= 1
+            thread = threading.Thread(target=self._worker, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None if self._running > self.max_workers else self._pop()
+                if job is None:
+                    self._running -= 1
+                    self._threads.remove(threading.current_thread())
+                    self._cond.notify_all()
+                    return
+                job.state = RUNNING
+                job.started = time.time()
+            self._notify(job)
+            self._execute(job)
+
+    def _execute(self, job):
+        try:
+            with metrics.span('job'):
+                self._run(job, lambda: self._notify(job))
+            job.state = DONE
+            job.fraction = 1.0
+        except Cancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            logger.error("Échec de la tâche %s (%s): %s", job.id, job.name, e)
+            job.state = FAILED
+            job.error = str(e)
+        job.finished = time.time()
+        metrics.count('jobs', state=job.state)
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def cancel(self, job_id):
+        """Annule une tâche : retirée de la file si elle attend, interrompue si elle tourne."""
+        job = self.jobs[job_id]
+        with self._cond:
+            if job.state in FINISHED_STATES:
+                return False
+            job.cancel_event.set()
+            if job.state == PENDING:
+                job.state = CANCELLED
+                job.finished = time.time()
+        self._notify(job)
+        return True
+
+    def set_priority(self, job_id, priority):
+        """Change la priorité d'une tâche en attente (plus grand = servi plus tôt)."""
+        job = self.jobs[job_id]
+        with self._cond:
+            if job.state != PENDING:
+                return False
+            job.priority = priority
+            self._push(job)
+        self._notify(job)
+        return True
+
+    def set_max_workers(self, max_workers):
+        """Nouvelle limite de concurrence ; les fils en trop s'arrêtent après leur tâche courante."""
+        with self._cond:
+            self.max_workers = max(1, max_workers)
+            self._spawn()
+
+    def remove_finished(self):
+        """Oublie les tâches terminées (leurs fichiers restent à la charge de l'appelant)."""
+        with self._cond:
+            for job_id in [job.id for job in self.jobs.values() if job.state in FINISHED_STATES]:
+                del self.jobs[job_id]
+
+    def stats(self):
+        """Compteurs par état, temps cumulés et débit (secondes audio traitées par seconde écoulée)."""
+        jobs = list(self.jobs.values())
+        done = [job for job in jobs if job.state == DONE]
+        audio = sum(job.audio_duration or 0.0 for job in done)
+        busy = sum(job.processing_time for job in done)
+        started = [job.started for job in jobs if job.started is not None]
+        wall = (max(job.finished or time.time() for job in jobs if job.started is not None) - min(started)
+                if started else 0.0)
+        counts = {state: sum(1 for job in jobs if job.state == state) for state in STATE_LABELS}
+        return dict(counts, **{
+            'audio_seconds': audio,
+            'busy_seconds': busy,
+            'wall_seconds': wall,
+            # Débit global (parallélisme compris) : secondes audio par seconde écoulée
+            'throughput': audio / wall if wall else None,
+        })
+
+    def shutdown(self, cancel=True, timeout=10.0):
+        """Ferme la file ; annule les tâches restantes puis attend la fin des fils."""
+        with self._cond:
+            self._closed = True
+        if cancel:
+            for job_id in list(self.jobs):
+                self.cancel(job_id)
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._threads and time.time() < deadline:
+                self._cond.wait(max(0.0, deadline - time.time()))
+
+
+def denoise_job(job, update, work_root, cache=None, options=None):
+    """
+    Exécution d'une tâche de débruitage : préparation du WAV 48 kHz, cache de
+    résultats, process_audio, pics de forme d'onde. Le résultat (job.output_file) et le WAV d'entrée
+    restent dans le dossier de travail de la tâche ; en cas d'annulation ou
+    d'erreur, ce dossier est supprimé.
+    """
+    options = job.options or options or {}
+    job.work_dir = tempfile.mkdtemp(prefix=f"job{job.id}_", dir=work_root)
+    try:
+        if job.wav_file is None:
+            audio = decode_file(job.input_path)
+            job.has_video = audio.has_video
+            job.audio_duration = audio.duration
+            job.wav_file = convert_to_wav(job.input_path, os.path.join(job.work_dir, 'input'), audio=audio,
+                                          keep_channels=job.keep_channels)
+            build_peaks(audio.view(mono=True), audio.sample_rate, job.wav_file)
+            del audio
+        if job.audio_duration is None:
+            _, sample_rate, frames = read_wav_info(job.wav_file)
+            job.audio_duration = frames / float(sample_rate)
+        if job.cancel_event.is_set():
+            raise Cancelled()
+
+        output_file = os.path.join(job.work_dir, f"{uuid.uuid4().hex}.wav")
+        cache_key = make_key(job.wav_file, options, resolve_backend('auto', options)) if cache is not None else None
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached:
+            logger.debug("Tâche %s: résultat trouvé dans le cache: %s", job.id, cached)
+            link_or_copy(cached, output_file)
+            job.cached = True
+        else:
+            output_dir = os.path.join(job.work_dir, 'output')
+            os.makedirs(output_dir)
+
+            def on_progress(report):
+                job.report = report
+                if report['fraction'] is not None:
+                    job.fraction = report['fraction']
+                update()
+
+            job.silence = process_audio(job.wav_file, output_dir, options, progress=on_progress,
+                                        cancel=job.cancel_event)
+            produced = os.path.join(output_dir, os.path.basename(job.wav_file))
+            if not os.path.exists(produced):
+                raise Exception(f"Le fichier de sortie n'a pas été créé. Contenu du dossier: {os.listdir(output_dir)}")
+            os.replace(produced, output_file)
+            if cache is not None:
+                cache.put(cache_key, output_file)
+        # Forme d'onde du résultat, prête pour l'affichage
+        peaks_for_wav(output_file)
+        job.output_file = output_file
+    except BaseException:
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+        job.work_dir = None
+        raise
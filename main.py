@@ -1,70 +1,332 @@
 import sys
 import os
+import logging
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QPushButton, 
                             QVBoxLayout, QHBoxLayout, QLabel, QFileDialog, 
                             QProgressBar, QSlider, QStyle, QMessageBox, 
-                            QStatusBar)
-from PyQt6.QtCore import Qt, QUrl, QThread, pyqtSignal
+                            QStatusBar, QDialog, QTableWidget, QTableWidgetItem,
+                            QHeaderView, QSpinBox, QAbstractItemView, QCheckBox,
+                            QDoubleSpinBox, QComboBox)
+from PyQt6.QtCore import Qt, QUrl, QThread, QTimer, QPointF, QLineF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPainterPath, QPen, QColor, QImage
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from deepfilter_interface import process_audio
-from utils import convert_to_wav, convert_audio_format, reconstruct_video_from_audio_and_video
+from deepfilter_interface import DEFAULT_OPTIONS, format_progress
+from cache import ResultCache
+from utils import convert_to_wav, reconstruct_video_from_audio_and_video
+from audio_buffer import DecodedAudio, MappedAudio, decode_file
 import tempfile
-import uuid
-import numpy as np
-import librosa
-import librosa.display
 import time
+import math
+import threading
+import numpy as np
+import spectrogram
+from spectrogram import build_pyramid, to_argb
+from waveform import build_peaks, peaks_for_wav
+from export import DEFAULT_BITRATES, EXPORT_FORMATS, LOSSLESS_FORMATS, export_targets, target_paths
+from preview import PREVIEW_SECONDS, describe_options, option_grid, preview_variants
+from jobqueue import JobScheduler, denoise_job, STATE_LABELS, RUNNING, DONE, FAILED, CANCELLED
+from batch import AUDIO_EXTENSIONS, VIDEO_EXTENSIONS
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Le fichier ouvert dans l'interface passe devant les tâches ajoutées à la file
+INTERACTIVE_PRIORITY = 10
+
+MEDIA_FILTER = "Fichiers audio/vidéo (*.mp3 *.wav *.flac *.ogg *.m4a *.mp4 *.mkv *.avi *.mov)"
 
-# Ajout d'une classe pour gérer le traitement en arrière-plan
-class AudioProcessingThread(QThread):
-    finished = pyqtSignal(str)  # Signal émis quand le traitement est terminé
-    progress = pyqtSignal(int)  # Signal pour mettre à jour la progression
-    error = pyqtSignal(str)     # Signal en cas d'erreur
+class IdlePlaceholder(QWidget):
+    """Image de démarrage (ondes stylisées) dessinée avec QPainter, sans matplotlib ni numpy"""
+    COLOR = QColor(74, 158, 255)
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        wave_color = QColor(self.COLOR)
+        wave_color.setAlphaF(0.5)
+        painter.setPen(QPen(wave_color, 2))
+        
+        width, height = self.width(), self.height()
+        panel = height / 2.0
+        # Une onde amortie par panneau, et son symétrique
+        for index, (frequency, decay) in enumerate([(1, 10.0), (2, 8.0)]):
+            center = panel * (index + 0.5)
+            for sign in (1, -1):
+                path = QPainterPath()
+                for step in range(201):
+                    x = 4 * math.pi * step / 200
+                    y = sign * 0.3 * math.sin(frequency * x) * math.exp(-x / decay)
+                    point = QPointF(width * step / 200, center - y * panel / 2)
+                    if step:
+                        path.lineTo(point)
+                    else:
+                        path.moveTo(point)
+                painter.drawPath(path)
+        
+        text_color = QColor(self.COLOR)
+        text_color.setAlphaF(0.8)
+        painter.setPen(text_color)
+        painter.drawText(0, 0, width, int(panel / 2), Qt.AlignmentFlag.AlignCenter, "En attente du fichier audio")
 
-    def __init__(self, input_file, output_dir):
+class SpectrogramThread(QThread):
+    """Calcule (ou relit depuis le cache) les pyramides de spectrogrammes hors du thread graphique"""
+    finished = pyqtSignal(object, object)  # Pyramides originale et nettoyée
+    error = pyqtSignal(str)
+
+    def __init__(self, original, cleaned, max_bytes=spectrogram.DEFAULT_MAX_BYTES):
         super().__init__()
-        self.input_file = input_file
-        self.output_dir = output_dir
+        self.original = original
+        self.cleaned = cleaned
+        self.max_bytes = max_bytes
+        self.cancel = threading.Event()
 
     def run(self):
         try:
-            # Récupérer le nom du fichier d'entrée
-            input_basename = os.path.basename(self.input_file)
-            # Le fichier de sortie aura initialement le même nom
-            temp_output = os.path.join(self.output_dir, input_basename)
-            # Le nom final avec un UUID
-            final_output = os.path.join(self.output_dir, f"{uuid.uuid4().hex}.wav")
-            
-            print(f"[DEBUG] Fichier d'entrée: {self.input_file}")
-            print(f"[DEBUG] Fichier de sortie temporaire attendu: {temp_output}")
-            print(f"[DEBUG] Fichier de sortie final: {final_output}")
-            
-            # Options par défaut pour DeepFilterNet
-            options = {
-                'postfilter': True,
-                'pf_beta': 0.02,
-                'atten_lim_db': 100
-            }
-            
-            # Traitement audio
-            self.progress.emit(10)
-            process_audio(self.input_file, self.output_dir, options)
-            self.progress.emit(90)
-            
-            # Vérifier si le fichier de sortie existe et le renommer
-            if os.path.exists(temp_output):
-                print(f"[DEBUG] Renommage du fichier: {temp_output} -> {final_output}")
-                os.rename(temp_output, final_output)
-                self.progress.emit(100)
-                self.finished.emit(final_output)
-            else:
-                raise Exception(f"Le fichier de sortie n'a pas été créé. Contenu du dossier: {os.listdir(self.output_dir)}")
-            
+            pyramids = []
+            for audio in (self.original, self.cleaned):
+                # La première pyramide reste dans le cache pendant le calcul de la seconde
+                pyramids.append(build_pyramid(audio.view(mono=True), audio.sample_rate, cancel=self.cancel,
+                                              max_bytes=self.max_bytes,
+                                              keep=[pyramid.directory for pyramid in pyramids]))
+            logger.debug("Pyramides de spectrogrammes prêtes")
+            self.finished.emit(*pyramids)
+        except Exception as e:
+            if not self.cancel.is_set():
+                self.error.emit(str(e))
+
+class PreviewThread(QThread):
+    """Débruite un extrait sous la grille de réglages (voir preview.py) hors du thread graphique"""
+    variant_ready = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, wav_file, start, duration, work_dir, base_options, cache):
+        super().__init__()
+        self.wav_file = wav_file
+        self.start_seconds = start
+        self.duration = duration
+        self.work_dir = work_dir
+        self.base_options = base_options
+        self.cache = cache
+        self.cancel = threading.Event()
+
+    def run(self):
+        try:
+            result = preview_variants(self.wav_file, self.start_seconds, self.duration, self.work_dir,
+                                      option_grid(base=self.base_options), cache=self.cache,
+                                      cancel=self.cancel, on_variant=self.variant_ready.emit)
+            self.finished.emit(result)
         except Exception as e:
-            print(f"[ERROR] Une erreur est survenue: {str(e)}")
-            self.error.emit(str(e))
+            if not self.cancel.is_set():
+                self.error.emit(str(e))
+
+class WaveformView(QWidget):
+    """
+    Forme d'onde tirée d'une pyramide de pics (waveform.PeakPyramid) : clic pour se
+    positionner, molette pour zoomer, double-clic pour revoir tout le fichier.
+    Redimensionner ou zoomer ne relit jamais l'audio.
+    """
+    seek_requested = pyqtSignal(float)  # Position demandée, en secondes
+    COLOR = QColor(74, 158, 255)
+    PLAYHEAD_COLOR = QColor(220, 60, 60)
+    
+    def __init__(self):
+        super().__init__()
+        self.setMinimumHeight(60)
+        self.peaks = None
+        self.window = (0.0, 0.0)
+        self.position = 0.0
+        self._columns = None  # (largeur, fenêtre, minimums, maximums) du dernier échantillonnage
+    
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.window = (0.0, peaks.duration if peaks is not None else 0.0)
+        self._columns = None
+        self.update()
+    
+    def set_position(self, seconds):
+        self.position = seconds
+        self.update()
+    
+    def columns(self):
+        """Minimums et maximums par colonne de pixels, rééchantillonnés seulement si la largeur ou la fenêtre change"""
+        key = (self.width(), self.window)
+        if self._columns is None or self._columns[:2] != key:
+            mins, maxs = self.peaks.sample(self.width(), *self.window)
+            self._columns = key + (mins.tolist(), maxs.tolist())
+        return self._columns[2:]
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        if self.peaks is None or not self.peaks.duration:
+            return
+        height = self.height()
+        middle = height / 2.0
+        mins, maxs = self.columns()
+        painter.setPen(QPen(self.COLOR, 1))
+        painter.drawLines([QLineF(x + 0.5, middle - high * middle, x + 0.5, middle - low * middle)
+                           for x, (low, high) in enumerate(zip(mins, maxs))])
+        start, end = self.window
+        if start <= self.position <= end:
+            x = (self.position - start) / (end - start) * self.width()
+            painter.setPen(QPen(self.PLAYHEAD_COLOR, 2))
+            painter.drawLine(QLineF(x, 0, x, height))
+    
+    def seconds_at(self, x):
+        start, end = self.window
+        return min(max(start + x / max(1, self.width()) * (end - start), 0.0), self.peaks.duration)
+    
+    def mousePressEvent(self, event):
+        if self.peaks is not None and event.button() == Qt.MouseButton.LeftButton:
+            self.seek_requested.emit(self.seconds_at(event.position().x()))
+    
+    def mouseDoubleClickEvent(self, event):
+        if self.peaks is not None:
+            self.window = (0.0, self.peaks.duration)
+            self.update()
+    
+    def wheelEvent(self, event):
+        """Zoom (molette) centré sur la position de la souris"""
+        if self.peaks is None:
+            return
+        start, end = self.window
+        duration = self.peaks.duration
+        anchor = self.seconds_at(event.position().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        width = min(duration, max(0.05, (end - start) * factor))
+        ratio = (anchor - start) / (end - start)
+        start = min(max(0.0, anchor - ratio * width), duration - width)
+        self.window = (start, start + width)
+        self.update()
+
+class SpectrogramView(QWidget):
+    """
+    Spectrogramme peint sans matplotlib : les magnitudes d'une pyramide (spectrogram.py)
+    passent par la table de couleurs dans un tampon numpy partagé avec une QImage, recopiée
+    telle quelle à l'écran. Un défilement d'un nombre entier de pixels décale le tampon et
+    ne calcule que les colonnes découvertes ; la tête de lecture est dessinée par-dessus,
+    sans recalcul de l'image.
+    """
+    zoom_requested = pyqtSignal(float, bool)  # Instant sous la souris, zoom avant
+    pan_requested = pyqtSignal(int)  # Déplacement à la souris, en pixels
+    TITLE_COLOR = QColor(255, 255, 255, 204)
+    PLAYHEAD_COLOR = QColor(220, 60, 60)
+    
+    def __init__(self, title):
+        super().__init__()
+        self.title = title
+        self.setMinimumHeight(150)
+        self.pyramid = None
+        self.window = (0.0, 0.0)
+        self.position = None
+        self._buffer = None  # Pixels (hauteur, largeur) uint32, partagés avec _image
+        self._image = None
+        self._rendered = None  # (largeur, hauteur, début, secondes par pixel) du tampon
+        self._drag_x = None
+    
+    def set_pyramid(self, pyramid, window):
+        self.pyramid = pyramid
+        self.window = window
+        self._rendered = None
+        self.update()
+    
+    def seconds_per_pixel(self):
+        start, end = self.window
+        return (end - start) / max(1, self.width())
+    
+    def seconds_at(self, x):
+        return self.window[0] + x * self.seconds_per_pixel()
+    
+    def set_window(self, start, end):
+        """Nouvelle fenêtre de temps : décalage du tampon si l'échelle est inchangée, sinon nouveau rendu"""
+        self.window = (start, end)
+        rendered = self._rendered
+        if rendered is not None and rendered[:2] == (self.width(), self.height()):
+            seconds_per_pixel = self.seconds_per_pixel()
+            shift = (start - rendered[2]) / seconds_per_pixel
+            dx = round(shift)
+            if math.isclose(seconds_per_pixel, rendered[3], rel_tol=1e-9) and abs(shift - dx) < 1e-3 \
+                    and abs(dx) < self.width():
+                self.scroll_buffer(dx)
+                return
+        self._rendered = None
+        self.update()
+    
+    def scroll_buffer(self, dx):
+        width = self.width()
+        if dx > 0:  # La fenêtre avance : l'image glisse vers la gauche
+            self._buffer[:, :width - dx] = self._buffer[:, dx:]
+            self.render_columns(width - dx, width)
+        elif dx < 0:
+            self._buffer[:, -dx:] = self._buffer[:, :width + dx]
+            self.render_columns(0, -dx)
+        self._rendered = (width, self.height(), self.window[0], self.seconds_per_pixel())
+        self.update()
+    
+    def render_columns(self, first, last):
+        """Calcule les colonnes de pixels [first, last) du tampon"""
+        seconds_per_pixel = self.seconds_per_pixel()
+        image = self.pyramid.columns(self.seconds_at(first), seconds_per_pixel, last - first, self.height())
+        self._buffer[:, first:last] = to_argb(image)
+    
+    def render(self):
+        width, height = self.width(), self.height()
+        with metrics.span('spectrogram_draw'):
+            self._buffer = np.empty((height, width), dtype=np.uint32)
+            self._image = QImage(self._buffer.data, width, height, width * 4, QImage.Format.Format_RGB32)
+            self.render_columns(0, width)
+        self._rendered = (width, height, self.window[0], self.seconds_per_pixel())
+        logger.debug("Spectrogramme %s affiché (%.1fs - %.1fs)", self.title, *self.window)
+    
+    def playhead_x(self):
+        start, end = self.window
+        if self.position is None or not start <= self.position <= end or end <= start:
+            return None
+        return (self.position - start) / self.seconds_per_pixel()
+    
+    def set_position(self, seconds):
+        """Déplace la tête de lecture : seules les bandes de l'ancienne et de la nouvelle position sont repeintes"""
+        previous = self.playhead_x()
+        self.position = seconds
+        for x in {previous, self.playhead_x()} - {None}:
+            self.update(int(x) - 2, 0, 5, self.height())
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.pyramid is None or not self.pyramid.duration or self.width() < 1 or self.height() < 1:
+            painter.fillRect(self.rect(), Qt.GlobalColor.black)
+            return
+        if self._rendered is None or self._rendered[:2] != (self.width(), self.height()):
+            self.render()
+        # Seule la zone à repeindre est recopiée depuis l'image
+        painter.drawImage(event.rect(), self._image, event.rect())
+        painter.setPen(self.TITLE_COLOR)
+        painter.drawText(8, 16, self.title)
+        x = self.playhead_x()
+        if x is not None:
+            painter.setPen(QPen(self.PLAYHEAD_COLOR, 2))
+            painter.drawLine(QLineF(x, 0, x, self.height()))
+    
+    def wheelEvent(self, event):
+        if self.pyramid is not None:
+            self.zoom_requested.emit(self.seconds_at(event.position().x()), event.angleDelta().y() > 0)
+    
+    def mousePressEvent(self, event):
+        if self.pyramid is not None and event.button() == Qt.MouseButton.LeftButton:
+            self._drag_x = round(event.position().x())
+    
+    def mouseMoveEvent(self, event):
+        """Glisser : la fenêtre suit la souris, pixel par pixel"""
+        if self._drag_x is None:
+            return
+        x = round(event.position().x())
+        if x != self._drag_x:
+            self.pan_requested.emit(x - self._drag_x)
+            self._drag_x = x
+    
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
 
 class AudioPlayer(QWidget):
     def __init__(self, title="Lecteur Audio"):
@@ -99,7 +361,9 @@ class AudioPlayer(QWidget):
         controls_layout.addWidget(self.stop_button)
         layout.addLayout(controls_layout)
         
-        # Slider de position
+        # Forme d'onde (clic pour se positionner) et slider de position
+        self.waveform = WaveformView()
+        layout.addWidget(self.waveform)
         self.position_slider = QSlider(Qt.Orientation.Horizontal)
         layout.addWidget(self.position_slider)
         
@@ -127,8 +391,11 @@ class AudioPlayer(QWidget):
         self.volume_slider.valueChanged.connect(self.set_volume)
         self.media_player.positionChanged.connect(self.position_changed)
         self.media_player.durationChanged.connect(self.duration_changed)
+        self.waveform.seek_requested.connect(lambda seconds: self.set_position(int(seconds * 1000)))
         
-    def set_audio_file(self, file_path):
+    def set_audio_file(self, file_path, peaks=None):
+        """`peaks` : pyramide de pics du fichier pour la forme d'onde (voir waveform.py)"""
+        self.waveform.set_peaks(peaks)
         self.media_player.setSource(QUrl.fromLocalFile(file_path))
         self.audio_output.setVolume(self.volume_slider.value() / 100)
         self.play_button.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
@@ -153,6 +420,7 @@ class AudioPlayer(QWidget):
         
     def position_changed(self, position):
         self.position_slider.setValue(position)
+        self.waveform.set_position(position / 1000)
         self.update_time_label()
         
     def duration_changed(self, duration):
@@ -170,7 +438,172 @@ class AudioPlayer(QWidget):
         m, s = divmod(s, 60)
         return f"{m}:{s:02d}"
 
+class StatsDialog(QDialog):
+    """Panneau des mesures d'instrumentation (durées par étape et compteurs), rafraîchi chaque seconde"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Statistiques de traitement")
+        self.resize(640, 360)
+        layout = QVBoxLayout(self)
+        
+        self.stages_table = QTableWidget(0, 5)
+        self.stages_table.setHorizontalHeaderLabels(["Étape", "Appels", "Total (s)", "Moyenne (s)", "Max (s)"])
+        self.stages_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.stages_table)
+        
+        self.counters_table = QTableWidget(0, 2)
+        self.counters_table.setHorizontalHeaderLabels(["Compteur", "Valeur"])
+        self.counters_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.counters_table)
+        
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+    
+    @staticmethod
+    def describe(name, labels):
+        if not labels:
+            return name
+        return f"{name} ({', '.join(f'{key}={value}' for key, value in labels.items())})"
+    
+    def refresh(self):
+        snapshot = metrics.registry.snapshot()
+        self.stages_table.setRowCount(len(snapshot['spans']))
+        for row, item in enumerate(snapshot['spans']):
+            values = [self.describe(item['name'], item['labels']), str(item['count']),
+                      f"{item['total']:.3f}", f"{item['total'] / item['count']:.3f}", f"{item['max']:.3f}"]
+            for column, value in enumerate(values):
+                self.stages_table.setItem(row, column, QTableWidgetItem(value))
+        self.counters_table.setRowCount(len(snapshot['counters']))
+        for row, item in enumerate(snapshot['counters']):
+            value = item['value']
+            self.counters_table.setItem(row, 0, QTableWidgetItem(self.describe(item['name'], item['labels'])))
+            self.counters_table.setItem(row, 1, QTableWidgetItem(f"{value:.1f}" if isinstance(value, float) else str(value)))
+
+class ExportThread(QThread):
+    """Exporte le résultat vers une ou plusieurs cibles en parallèle (voir export.py) hors du thread graphique"""
+    progress = pyqtSignal(int, float)  # Indice de la cible, fraction
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, wav_file, targets):
+        super().__init__()
+        self.wav_file = wav_file
+        self.targets = targets
+        self.cancel = threading.Event()
+
+    def run(self):
+        try:
+            self.finished.emit(export_targets(self.wav_file, self.targets, progress=self.progress.emit,
+                                              cancel=self.cancel))
+        except Exception as e:
+            if not self.cancel.is_set():
+                self.error.emit(str(e))
+
+class ExportDialog(QDialog):
+    """Export du résultat vers plusieurs formats à la fois, avec la progression de chaque format"""
+    BITRATES = ['96k', '128k', '160k', '192k', '256k', '320k']
+
+    def __init__(self, wav_file, default_name, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exporter plusieurs formats")
+        self.wav_file = wav_file
+        self.default_name = default_name
+        self.thread = None
+        layout = QVBoxLayout(self)
+        
+        self.rows = {}
+        for format in EXPORT_FORMATS:
+            row = QHBoxLayout()
+            check = QCheckBox(format.upper())
+            check.setChecked(format != 'ogg')
+            row.addWidget(check)
+            bitrate = QComboBox()
+            if format in LOSSLESS_FORMATS:
+                bitrate.addItem("sans perte")
+                bitrate.setEnabled(False)
+            else:
+                bitrate.addItems(self.BITRATES)
+                bitrate.setCurrentText(DEFAULT_BITRATES[format])
+            row.addWidget(bitrate)
+            bar = QProgressBar()
+            row.addWidget(bar, 1)
+            layout.addLayout(row)
+            self.rows[format] = (check, bitrate, bar)
+        
+        self.status_label = QLabel("Un encodeur par format, tous lancés en même temps")
+        layout.addWidget(self.status_label)
+        buttons = QHBoxLayout()
+        self.export_button = QPushButton("Exporter...")
+        self.export_button.clicked.connect(self.on_export_click)
+        buttons.addWidget(self.export_button)
+        self.cancel_button = QPushButton("Annuler")
+        self.cancel_button.clicked.connect(self.cancel_export)
+        self.cancel_button.setEnabled(False)
+        buttons.addWidget(self.cancel_button)
+        layout.addLayout(buttons)
+    
+    def selected_targets(self):
+        return [{'format': format, 'bitrate': None if format in LOSSLESS_FORMATS else bitrate.currentText()}
+                for format, (check, bitrate, _) in self.rows.items() if check.isChecked()]
+    
+    def on_export_click(self):
+        targets = self.selected_targets()
+        if not targets:
+            return
+        base_path, _ = QFileDialog.getSaveFileName(self, "Nom des fichiers exportés (l'extension suit le format)",
+                                                   self.default_name)
+        if not base_path:
+            return
+        self.targets = target_paths(base_path, targets)
+        for _, _, bar in self.rows.values():
+            bar.setValue(0)
+        self.export_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText("Export en cours...")
+        self.thread = ExportThread(self.wav_file, self.targets)
+        self.thread.progress.connect(self.on_progress)
+        self.thread.finished.connect(self.on_finished)
+        self.thread.error.connect(self.on_error)
+        self.thread.start()
+    
+    def on_progress(self, index, fraction):
+        self.rows[self.targets[index]['format']][2].setValue(int(100 * fraction))
+    
+    def on_finished(self, results):
+        self.export_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        lines = []
+        for result in results:
+            if result['status'] == 'ok':
+                lines.append(f"{os.path.basename(result['path'])} : {result['size'] / 1e6:.1f} Mo "
+                             f"en {result['elapsed']:.1f} s")
+            else:
+                self.rows[result['format']][2].setValue(0)
+                lines.append(f"{result['format'].upper()} : échec ({result['error']})")
+        self.status_label.setText("\n".join(lines))
+    
+    def on_error(self, message):
+        self.export_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText(f"Erreur lors de l'export : {message}")
+    
+    def cancel_export(self):
+        if self.thread is not None and self.thread.isRunning():
+            self.thread.cancel.set()
+            self.thread.wait()
+            self.status_label.setText("Export annulé")
+        self.export_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+    
+    def closeEvent(self, event):
+        self.cancel_export()
+        super().closeEvent(event)
+
 class AudioCleanerApp(QMainWindow):
+    job_updated = pyqtSignal(object)  # Émis depuis les fils de la file, reçu dans le thread graphique
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("DeepFilterNet GUI")
@@ -190,16 +623,30 @@ class AudioCleanerApp(QMainWindow):
         self.file_label = QLabel("Aucun fichier sélectionné")
         layout.addWidget(self.file_label)
         
-        # Spectrogrammes avec un style amélioré
-        plt.style.use('dark_background')
-        self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(8, 4))
-        self.fig.patch.set_alpha(0.0)  # Fond transparent
-        self.canvas = FigureCanvas(self.fig)
-        self.canvas.setStyleSheet("background-color: transparent;")  # Rend le widget transparent
-        layout.addWidget(self.canvas)
+        # Stéréo/multicanal conservé : chaque canal est débruité séparément, en parallèle
+        self.keep_channels_check = QCheckBox("Conserver les canaux (stéréo...)")
+        self.keep_channels_check.setToolTip("Sinon l'audio est mixé en mono. "
+                                            "S'applique aux prochains fichiers ouverts ou ajoutés à la file.")
+        layout.addWidget(self.keep_channels_check)
         
-        # Image de démarrage
-        self.setup_initial_plot()
+        # Détection d'activité : seuls les passages actifs passent par DeepFilterNet
+        self.skip_silence_check = QCheckBox("Ignorer les silences")
+        self.skip_silence_check.setToolTip("Les silences et le bruit de fond entre les prises de parole ne sont pas "
+                                           "débruités mais simplement atténués : le traitement est plus rapide.")
+        layout.addWidget(self.skip_silence_check)
+        
+        # Image de démarrage ; les spectrogrammes la remplacent au premier affichage (ensure_spectrogram_views)
+        self.placeholder = IdlePlaceholder()
+        self.placeholder.setMinimumHeight(300)
+        layout.addWidget(self.placeholder)
+        self.spectrogram_views = None
+        
+        # Spectrogrammes : calcul en arrière-plan, zoom à la molette et déplacement à la souris
+        self.spectrogram_thread = None
+        self.spectrograms = None
+        self.spectrogram_window = (0.0, 0.0)
+        # Début de l'audio chargé dans les lecteurs (extrait d'aperçu), pour la tête de lecture
+        self.playhead_offset = 0.0
         
         # Lecteurs audio
         players_layout = QHBoxLayout()
@@ -214,166 +661,438 @@ class AudioCleanerApp(QMainWindow):
         self.clean_button.clicked.connect(self.on_clean_click)
         layout.addWidget(self.clean_button)
         
+        # Aperçu des réglages : un extrait débruité sous plusieurs combinaisons, à comparer dans les lecteurs
+        preview_layout = QHBoxLayout()
+        preview_layout.addWidget(QLabel("Aperçu à partir de (s):"))
+        self.preview_start_spin = QDoubleSpinBox()
+        self.preview_start_spin.setRange(0, 24 * 3600)
+        self.preview_start_spin.setToolTip("Un clic sur la forme d'onde originale choisit aussi le début de l'extrait")
+        preview_layout.addWidget(self.preview_start_spin)
+        preview_layout.addWidget(QLabel("durée (s):"))
+        self.preview_duration_spin = QDoubleSpinBox()
+        self.preview_duration_spin.setRange(1, 30)
+        self.preview_duration_spin.setValue(PREVIEW_SECONDS)
+        preview_layout.addWidget(self.preview_duration_spin)
+        self.preview_button = QPushButton("Comparer les réglages")
+        self.preview_button.clicked.connect(self.on_preview_click)
+        preview_layout.addWidget(self.preview_button)
+        self.preview_combo = QComboBox()
+        self.preview_combo.currentIndexChanged.connect(self.on_preview_selected)
+        preview_layout.addWidget(self.preview_combo, 1)
+        self.apply_preview_button = QPushButton("Appliquer au fichier")
+        self.apply_preview_button.clicked.connect(self.on_apply_preview_click)
+        preview_layout.addWidget(self.apply_preview_button)
+        layout.addLayout(preview_layout)
+        self.original_player.waveform.seek_requested.connect(self.on_original_seek)
+        self.preview_thread = None
+        self.preview = None
+        self.showing_excerpt = False
+        # Réglages appliqués au débruitage (modifiés par « Appliquer au fichier »)
+        self.denoise_settings = dict(DEFAULT_OPTIONS)
+        
         # Barre de progression
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
         
+        # File de traitement : plusieurs fichiers, traitements simultanés, priorités et annulation
+        queue_controls = QHBoxLayout()
+        self.add_jobs_button = QPushButton("Ajouter à la file...")
+        self.add_jobs_button.clicked.connect(self.on_add_jobs_click)
+        queue_controls.addWidget(self.add_jobs_button)
+        queue_controls.addWidget(QLabel("Traitements simultanés:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(max(1, min(2, (os.cpu_count() or 1) // 2)))
+        self.workers_spin.valueChanged.connect(self.on_workers_changed)
+        queue_controls.addWidget(self.workers_spin)
+        self.priority_up_button = QPushButton("Priorité +")
+        self.priority_up_button.clicked.connect(lambda: self.on_priority_click(1))
+        queue_controls.addWidget(self.priority_up_button)
+        self.priority_down_button = QPushButton("Priorité -")
+        self.priority_down_button.clicked.connect(lambda: self.on_priority_click(-1))
+        queue_controls.addWidget(self.priority_down_button)
+        self.cancel_job_button = QPushButton("Annuler")
+        self.cancel_job_button.clicked.connect(self.on_cancel_job_click)
+        queue_controls.addWidget(self.cancel_job_button)
+        self.show_job_button = QPushButton("Afficher")
+        self.show_job_button.clicked.connect(self.on_show_job_click)
+        queue_controls.addWidget(self.show_job_button)
+        layout.addLayout(queue_controls)
+        
+        self.queue_table = QTableWidget(0, 5)
+        self.queue_table.setHorizontalHeaderLabels(["Fichier", "État", "Progression", "RTF", "Priorité"])
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.queue_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.queue_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.queue_table.setMaximumHeight(150)
+        self.queue_table.cellDoubleClicked.connect(lambda row, column: self.on_show_job_click())
+        layout.addWidget(self.queue_table)
+        self.queue_label = QLabel("File vide (glissez des fichiers sur la fenêtre pour les ajouter)")
+        layout.addWidget(self.queue_label)
+        self.setAcceptDrops(True)
+        
         # Bouton de sauvegarde
+        save_layout = QHBoxLayout()
         self.save_button = QPushButton("Sauvegarder")
         self.save_button.clicked.connect(self.on_save_click)
-        layout.addWidget(self.save_button)
+        save_layout.addWidget(self.save_button)
+        # Livraison en plusieurs formats : encodeurs en parallèle, en arrière-plan
+        self.export_button = QPushButton("Exporter plusieurs formats...")
+        self.export_button.clicked.connect(self.on_export_click)
+        save_layout.addWidget(self.export_button)
+        layout.addLayout(save_layout)
+        self.save_thread = None
+        self.export_dialog = None
         
         # Ajout d'une barre de statut
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         
-        # Initialisation du thread de traitement
-        self.processing_thread = None
+        # Panneau des statistiques d'instrumentation
+        self.stats_dialog = None
+        # Budget du cache des spectrogrammes : les moins récemment affichés au-delà sont supprimés
+        self.status_bar.addPermanentWidget(QLabel("Cache spectrogrammes (Mo):"))
+        self.spectrogram_cache_spin = QSpinBox()
+        self.spectrogram_cache_spin.setRange(0, 1024 * 1024)
+        self.spectrogram_cache_spin.setSingleStep(256)
+        self.spectrogram_cache_spin.setValue(spectrogram.DEFAULT_MAX_BYTES // 1024 ** 2)
+        self.spectrogram_cache_spin.setKeyboardTracking(False)
+        self.spectrogram_cache_spin.valueChanged.connect(self.on_spectrogram_cache_changed)
+        self.status_bar.addPermanentWidget(self.spectrogram_cache_spin)
+        self.stats_button = QPushButton("Statistiques")
+        self.stats_button.clicked.connect(self.on_stats_click)
+        self.status_bar.addPermanentWidget(self.stats_button)
         
         # Désactiver certains boutons au démarrage
         self.clean_button.setEnabled(False)
         self.save_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+        self.preview_button.setEnabled(False)
+        self.preview_combo.setEnabled(False)
+        self.apply_preview_button.setEnabled(False)
         
         # Création des dossiers temporaires
         self.temp_dir_obj = tempfile.TemporaryDirectory(prefix='deepfilterapp_temp_')
         self.temp_dir = self.temp_dir_obj.name
         self.output_dir_obj = tempfile.TemporaryDirectory(prefix='deepfilterapp_output_')
         self.output_dir = self.output_dir_obj.name
-
-    def setup_initial_plot(self):
-        """Configure l'affichage initial avec une animation de type oscilloscope"""
-        self.ax1.clear()
-        self.ax2.clear()
-        
-        # Désactiver les axes et grilles
-        for ax in [self.ax1, self.ax2]:
-            ax.set_xticks([])
-            ax.set_yticks([])
-            ax.set_frame_on(False)
-            ax.set_facecolor('none')  # Fond transparent
-        
-        # Créer une onde sinusoïdale stylisée
-        x = np.linspace(0, 4*np.pi, 1000)
-        y = 0.3 * np.sin(x) * np.exp(-x/10)
         
-        # Tracer l'onde dans le premier axe
-        self.ax1.plot(x, y, color='#4a9eff', alpha=0.5, linewidth=2)
-        self.ax1.plot(x, -y, color='#4a9eff', alpha=0.5, linewidth=2)
-        self.ax1.text(0, 1, 'En attente du fichier audio', 
-                      ha='center', va='center', color='#4a9eff',
-                      fontsize=12, alpha=0.8,
-                      bbox=dict(facecolor='none', edgecolor='none'))
+        # Cache persistant des résultats (désactivé s'il ne peut pas être créé)
+        try:
+            self.result_cache = ResultCache()
+        except Exception as e:
+            logger.debug("Cache de résultats indisponible: %s", e)
+            self.result_cache = None
         
-        # Tracer une forme d'onde différente dans le second axe
-        y2 = 0.3 * np.sin(2*x) * np.exp(-x/8)
-        self.ax2.plot(x, y2, color='#4a9eff', alpha=0.5, linewidth=2)
-        self.ax2.plot(x, -y2, color='#4a9eff', alpha=0.5, linewidth=2)
+        # Ordonnanceur de la file (les résultats restent dans le dossier de sortie temporaire)
+        self.current_job_id = None
+        self.scheduler = JobScheduler(
+            lambda job, update: denoise_job(job, update, self.output_dir, self.result_cache, DEFAULT_OPTIONS),
+            max_workers=self.workers_spin.value(),
+            on_update=self.job_updated.emit
+        )
+        self.job_updated.connect(self.on_job_updated)
 
+    def ensure_spectrogram_views(self):
+        """Remplace l'image de démarrage par les deux spectrogrammes au premier affichage"""
+        if self.spectrogram_views is not None:
+            return
+        container = QWidget()
+        container_layout = QVBoxLayout(container)
+        container_layout.setContentsMargins(0, 0, 0, 0)
+        self.spectrogram_views = (SpectrogramView("Signal Original"), SpectrogramView("Signal Nettoyé"))
+        for view, player in zip(self.spectrogram_views, (self.original_player, self.cleaned_player)):
+            view.zoom_requested.connect(self.on_spectrogram_zoom)
+            view.pan_requested.connect(self.on_spectrogram_pan)
+            # Tête de lecture synchronisée avec le lecteur correspondant
+            player.media_player.positionChanged.connect(
+                lambda position, view=view: view.set_position(self.playhead_offset + position / 1000))
+            container_layout.addWidget(view)
         
-        # Ajuster les limites pour centrer l'onde
-        for ax in [self.ax1, self.ax2]:
-            ax.set_ylim(-1, 1)
-        
-        self.fig.patch.set_alpha(0.0)  # S'assurer que le fond est transparent
-        self.fig.tight_layout()
-        self.canvas.draw()
+        self.centralWidget().layout().replaceWidget(self.placeholder, container)
+        self.placeholder.deleteLater()
+        self.placeholder = None
 
     def on_select_file(self):
         self.file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Sélectionner un fichier audio/vidéo",
             "",
-            "Fichiers audio/vidéo (*.mp3 *.wav *.flac *.ogg *.m4a *.mp4 *.mkv *.avi *.mov)"  # Ajout de *.m4a
+            MEDIA_FILTER
         )
         
         if self.file_path:
-            print(f"\n[DEBUG] Fichier sélectionné: {self.file_path}")
-            print(f"[DEBUG] Extension: {os.path.splitext(self.file_path)[1]}")
+            # Un traitement en cours pour le fichier précédent continue dans la file
+            self.current_job_id = None
+            logger.debug("Fichier sélectionné: %s", self.file_path)
+            logger.debug("Extension: %s", os.path.splitext(self.file_path)[1])
             
-            # Vérifier d'abord si c'est un fichier audio
-            audio_extensions = {'.mp3', '.wav', '.flac', '.ogg', '.m4a'}  # Ajout de .m4a
-            if os.path.splitext(self.file_path)[1].lower() in audio_extensions:
-                print("[DEBUG] Fichier audio détecté")
-                self.video_path = None
-                self.is_video = False
-            else:
-                # Si ce n'est pas un fichier audio, essayer de l'ouvrir comme vidéo
-                try:
-                    from moviepy.editor import VideoFileClip
-                    print("[DEBUG] Tentative d'ouverture comme vidéo...")
-                    video = VideoFileClip(self.file_path)
-                    
-                    print(f"[DEBUG] Attributs de la vidéo:")
-                    print(f"[DEBUG] - Durée: {video.duration}")
-                    print(f"[DEBUG] - Taille: {video.size}")
-                    print(f"[DEBUG] - FPS: {video.fps}")
-                    print(f"[DEBUG] - Audio présent: {video.audio is not None}")
-                    print(f"[DEBUG] - Rotation: {video.rotation}")
-                    
-                    if video.size is not None and video.fps is not None:
-                        print("[DEBUG] ✓ C'est une vidéo (détecté via size et fps)")
-                        self.status_bar.showMessage("Fichier vidéo détecté, extraction de l'audio...")
-                        self.video_path = self.file_path
-                        self.is_video = True
-                    else:
-                        print("[DEBUG] ✗ Pas de piste vidéo trouvée")
-                        self.video_path = None
-                        self.is_video = False
-                    video.close()
-                    
-                except Exception as e:
-                    print(f"[DEBUG] ✗ Erreur lors de la vérification vidéo: {str(e)}")
+            try:
+                # Décodage unique : le même tampon sert à la détection, au WAV, aux spectrogrammes et à l'export
+                logger.debug("Décodage du fichier...")
+                audio = decode_file(self.file_path)
+                self.release_audio()
+                self.audio = audio
+                self.release_cleaned()
+                
+                # Détection vidéo depuis les métadonnées des flux (pas d'ouverture VideoFileClip)
+                if self.audio.has_video:
+                    logger.debug("Attributs de la vidéo:")
+                    logger.debug("- Durée: %s", self.audio.duration)
+                    logger.debug("- Taille: %s", self.audio.video['size'])
+                    logger.debug("- FPS: %s", self.audio.video['fps'])
+                    logger.debug("- Rotation: %s", self.audio.video['rotation'])
+                    logger.debug("✓ C'est une vidéo (détecté via size et fps)")
+                    self.status_bar.showMessage("Fichier vidéo détecté, extraction de l'audio...")
+                    self.video_path = self.file_path
+                    self.is_video = True
+                else:
+                    logger.debug("Fichier audio détecté")
                     self.video_path = None
                     self.is_video = False
-
-            try:
+                
                 # Conversion en WAV pour le traitement
-                print("[DEBUG] Conversion en WAV...")
-                self.wav_file = convert_to_wav(self.file_path, self.temp_dir)
-                print(f"[DEBUG] Fichier WAV créé: {self.wav_file}")
+                logger.debug("Conversion en WAV...")
+                self.wav_file = convert_to_wav(self.file_path, self.temp_dir, audio=self.audio,
+                                               keep_channels=self.keep_channels_check.isChecked())
+                logger.debug("Fichier WAV créé: %s", self.wav_file)
+                # Pics de la forme d'onde, depuis le tampon décodé, enregistrés à côté du WAV
+                build_peaks(self.audio.view(mono=True), self.audio.sample_rate, self.wav_file)
                 
                 # Mise à jour de l'interface
                 self.file_label.setText(os.path.basename(self.file_path))
                 self.clean_button.setEnabled(True)
+                self.reset_preview()
                 self.status_bar.showMessage("Fichier prêt pour le traitement")
                 
             except Exception as e:
-                print(f"[DEBUG] Erreur lors de la conversion WAV: {str(e)}")
+                logger.error("Erreur lors de la conversion WAV: %s", e)
                 self.status_bar.showMessage("Erreur lors de la préparation du fichier")
                 QMessageBox.critical(self, "Erreur", f"Impossible de préparer le fichier:\n{str(e)}")
                 return
             
-            print(f"[DEBUG] État final - is_video: {hasattr(self, 'is_video')} = {getattr(self, 'is_video', None)}")
-            print(f"[DEBUG] État final - video_path: {hasattr(self, 'video_path')} = {getattr(self, 'video_path', None)}")
+            logger.debug("État final - is_video: %s = %s", hasattr(self, 'is_video'), getattr(self, 'is_video', None))
+            logger.debug("État final - video_path: %s = %s", hasattr(self, 'video_path'), getattr(self, 'video_path', None))
 
     def on_clean_click(self):
         if not hasattr(self, 'wav_file'):
             QMessageBox.warning(self, "Erreur", "Veuillez d'abord sélectionner un fichier.")
             return
 
-        # Désactiver les boutons pendant le traitement
+        # Seul le fichier ouvert est bloqué : la sélection et la file restent utilisables
         self.clean_button.setEnabled(False)
-        self.select_button.setEnabled(False)
-        self.save_button.setEnabled(False)
         self.progress_bar.setValue(0)
         
-        # Créer et démarrer le thread de traitement
-        self.processing_thread = AudioProcessingThread(self.wav_file, self.output_dir)
-        self.processing_thread.progress.connect(self.update_progress)
-        self.processing_thread.finished.connect(self.on_processing_finished)
-        self.processing_thread.error.connect(self.on_processing_error)
-        
+        # Le WAV déjà préparé est confié à la file, en tête grâce à sa priorité
+        job = self.scheduler.submit(self.file_path, priority=INTERACTIVE_PRIORITY, options=self.denoise_options(),
+                                    wav_file=self.wav_file)
+        job.has_video = self.is_video
+        job.audio_duration = self.audio.duration
+        self.current_job_id = job.id
         self.status_bar.showMessage("Traitement en cours...")
-        self.processing_thread.start()
+
+    def denoise_options(self):
+        """Options des prochaines tâches (skip_silence absent si décoché : clés de cache inchangées)"""
+        if self.skip_silence_check.isChecked():
+            return dict(self.denoise_settings, skip_silence=True)
+        return self.denoise_settings
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
-    def on_processing_finished(self, output_file):
+    def update_progress_report(self, report):
+        self.status_bar.showMessage(f"Traitement en cours... {format_progress(report)}")
+
+    def on_job_updated(self, job):
+        self.refresh_queue()
+        if job.id != self.current_job_id:
+            return
+        if job.state == RUNNING:
+            # Le débruitage occupe la plage 10-90 % de la barre
+            self.update_progress(10 + int(80 * job.fraction))
+            if job.report is not None:
+                self.update_progress_report(job.report)
+        elif job.state == DONE:
+            self.current_job_id = None
+            self.update_progress(90)
+            self.on_processing_finished(job.output_file, silence=job.silence)
+        elif job.state == FAILED:
+            self.current_job_id = None
+            self.on_processing_error(job.error)
+        elif job.state == CANCELLED:
+            self.current_job_id = None
+            self.clean_button.setEnabled(True)
+            self.progress_bar.setValue(0)
+            self.status_bar.showMessage("Traitement annulé", 5000)
+
+    def refresh_queue(self):
+        """Met à jour la vue de la file (les tâches ne sont jamais retirées : les lignes restent stables)"""
+        jobs = list(self.scheduler.jobs.values())
+        self.queue_table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            rtf = job.rtf if job.rtf is not None else (job.report or {}).get('rtf')
+            values = [
+                job.name + (" [cache]" if job.cached else ""),
+                STATE_LABELS[job.state] + (f": {job.error}" if job.error else ""),
+                f"{100 * job.fraction:.0f}%",
+                f"{rtf:.2f}" if rtf is not None else "",
+                str(job.priority),
+            ]
+            for column, value in enumerate(values):
+                item = self.queue_table.item(row, column)
+                if item is None:
+                    self.queue_table.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+        
+        stats = self.scheduler.stats()
+        if not jobs:
+            return
+        text = (f"{stats['done']} terminés, {stats['running']} en cours, {stats['pending']} en attente, "
+                f"{stats['failed']} en erreur, {stats['cancelled']} annulés")
+        if stats['throughput']:
+            text += (f" — débit {stats['throughput']:.1f}x temps réel "
+                     f"({stats['audio_seconds']:.0f}s d'audio en {stats['wall_seconds']:.0f}s)")
+        self.queue_label.setText(text)
+
+    def selected_job(self):
+        row = self.queue_table.currentRow()
+        jobs = list(self.scheduler.jobs.values())
+        return jobs[row] if 0 <= row < len(jobs) else None
+
+    def add_jobs(self, paths):
+        supported = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
+        for path in paths:
+            if os.path.splitext(path)[1].lower() in supported:
+                self.scheduler.submit(path, options=self.denoise_options(),
+                                      keep_channels=self.keep_channels_check.isChecked())
+            else:
+                logger.debug("Fichier ignoré (format non pris en charge): %s", path)
+
+    def on_add_jobs_click(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Ajouter des fichiers à la file", "", MEDIA_FILTER)
+        self.add_jobs(paths)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        self.add_jobs([url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()])
+        event.acceptProposedAction()
+
+    def on_workers_changed(self, value):
+        self.scheduler.set_max_workers(value)
+
+    def on_priority_click(self, delta):
+        job = self.selected_job()
+        if job is not None and not self.scheduler.set_priority(job.id, job.priority + delta):
+            self.status_bar.showMessage("Seule la priorité d'une tâche en attente peut être modifiée", 5000)
+
+    def on_cancel_job_click(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.cancel(job.id)
+
+    def on_show_job_click(self):
+        """Charge le résultat d'une tâche terminée dans les lecteurs et les spectrogrammes"""
+        job = self.selected_job()
+        if job is None or job.state != DONE:
+            return
+        self.file_path = job.input_path
+        self.wav_file = job.wav_file
+        self.release_audio()
+        self.audio = DecodedAudio.from_wav(job.wav_file, mapped=True)
+        self.is_video = job.has_video
+        self.video_path = job.input_path if job.has_video else None
+        self.file_label.setText(os.path.basename(job.input_path))
+        self.clean_button.setEnabled(True)
+        self.reset_preview()
+        self.on_processing_finished(job.output_file, notify=False, silence=job.silence)
+
+    def reset_preview(self):
+        """Oublie l'aperçu du fichier précédent (un calcul en cours est interrompu)"""
+        self.stop_preview_thread()
+        self.preview_thread = None
+        self.preview = None
+        self.preview_combo.clear()
+        self.preview_combo.setEnabled(False)
+        self.apply_preview_button.setEnabled(False)
+        self.preview_button.setEnabled(True)
+        self.preview_start_spin.setMaximum(self.audio.duration)
+
+    def on_original_seek(self, seconds):
+        if not self.showing_excerpt:
+            self.preview_start_spin.setValue(seconds)
+
+    def on_preview_click(self):
+        self.reset_preview()
+        self.preview_button.setEnabled(False)
+        self.preview = {'variants': []}
+        self.status_bar.showMessage("Aperçu des réglages en cours...")
+        self.preview_thread = PreviewThread(self.wav_file, self.preview_start_spin.value(),
+                                            self.preview_duration_spin.value(),
+                                            tempfile.mkdtemp(prefix='preview_', dir=self.temp_dir),
+                                            self.denoise_options(), self.result_cache)
+        thread = self.preview_thread
+        thread.variant_ready.connect(lambda variant: self.on_preview_variant(thread, variant))
+        thread.finished.connect(lambda result: self.on_preview_finished(thread, result))
+        thread.error.connect(lambda message: self.on_preview_error(thread, message))
+        thread.start()
+
+    def on_preview_variant(self, thread, variant):
+        """Variante prête : ajoutée à la liste (dans l'ordre d'arrivée), la première est chargée"""
+        if thread is not self.preview_thread:
+            return
+        self.preview['variants'].append(variant)
+        cached = " [cache]" if variant['cached'] else ""
+        self.preview_combo.addItem(describe_options(variant['options']) + cached, variant)
+        self.preview_combo.setEnabled(True)
+        self.apply_preview_button.setEnabled(True)
+
+    def on_preview_finished(self, thread, result):
+        if thread is not self.preview_thread:
+            return
+        self.preview_button.setEnabled(True)
+        self.preview_start_spin.setValue(result['start'])
+        cached = sum(variant['cached'] for variant in result['variants'])
+        self.status_bar.showMessage(f"Aperçu prêt : {len(result['variants'])} réglages ({cached} en cache), "
+                                    f"choisissez-en un dans la liste pour l'écouter", 5000)
+
+    def on_preview_error(self, thread, message):
+        if thread is not self.preview_thread:
+            return
+        self.preview_button.setEnabled(True)
+        self.status_bar.showMessage("Erreur lors de l'aperçu des réglages", 5000)
+        QMessageBox.critical(self, "Erreur", f"Aperçu impossible:\n{message}")
+
+    def on_preview_selected(self, index):
+        """A/B : l'extrait d'origine dans le premier lecteur, la variante choisie dans le second"""
+        variant = self.preview_combo.itemData(index) if index >= 0 else None
+        if variant is None:
+            return
+        excerpt = os.path.join(os.path.dirname(variant['file']), 'excerpt.wav')
+        self.showing_excerpt = True
+        self.playhead_offset = self.preview_start_spin.value()
+        self.original_player.set_audio_file(excerpt, peaks_for_wav(excerpt))
+        self.cleaned_player.set_audio_file(variant['file'], peaks_for_wav(variant['file']))
+
+    def on_apply_preview_click(self):
+        """Le réglage choisi devient celui du débruitage, appliqué au fichier entier"""
+        variant = self.preview_combo.currentData()
+        if variant is None:
+            return
+        self.denoise_settings = {key: value for key, value in variant['options'].items() if key != 'skip_silence'}
+        self.status_bar.showMessage(f"Réglages appliqués : {describe_options(self.denoise_settings)}", 5000)
+        self.on_clean_click()
+
+    def on_processing_finished(self, output_file, notify=True, silence=None):
         # Réactiver les boutons
         self.clean_button.setEnabled(True)
         self.select_button.setEnabled(True)
         self.save_button.setEnabled(True)
+        self.export_button.setEnabled(True)
         
         # Mettre à jour l'interface
         self.progress_bar.setValue(80)  # 80% avant les spectrogrammes
@@ -381,16 +1100,30 @@ class AudioCleanerApp(QMainWindow):
         
         # Stocker le chemin du fichier nettoyé
         self.cleaned_audio = output_file
-        print(f"[DEBUG] Fichier nettoyé stocké: {self.cleaned_audio}")
+        # Projeté en mémoire : les spectrogrammes lisent le fichier par tuiles
+        self.release_cleaned()
+        self.cleaned = DecodedAudio.from_wav(output_file, mapped=True)
+        logger.debug("Fichier nettoyé stocké: %s", self.cleaned_audio)
         
         # Mettre à jour les lecteurs audio et spectrogrammes
-        self.original_player.set_audio_file(self.wav_file)
-        self.cleaned_player.set_audio_file(self.cleaned_audio)
-        self.plot_spectrograms(self.wav_file, self.cleaned_audio)
+        self.showing_excerpt = False
+        self.playhead_offset = 0.0
+        self.original_player.set_audio_file(self.wav_file, peaks_for_wav(self.wav_file))
+        self.cleaned_player.set_audio_file(self.cleaned_audio, peaks_for_wav(self.cleaned_audio))
+        self.plot_spectrograms(self.audio, self.cleaned)
         
         # Finaliser
         self.progress_bar.setValue(100)
-        self.status_bar.showMessage("Traitement terminé avec succès!", 5000)
+        message = "Traitement terminé avec succès!"
+        if self.result_cache is not None:
+            stats = self.result_cache.stats()
+            message += f" (cache: {stats['hits']} hits / {stats['misses']} misses)"
+        if silence is not None and silence['applied']:
+            message += (f" — silences ignorés: {100 * silence['skipped_fraction']:.0f} %, "
+                        f"~{silence['saved_seconds']:.1f}s économisées")
+        self.status_bar.showMessage(message, 5000)
+        if not notify:
+            return
         
         # Afficher une notification
         msg = QMessageBox()
@@ -414,17 +1147,17 @@ class AudioCleanerApp(QMainWindow):
             QMessageBox.warning(self, "Erreur", "Aucun fichier traité à sauvegarder.")
             return
 
-        print(f"[DEBUG] cleaned_audio: {self.cleaned_audio}")
-        print(f"[DEBUG] Attributs vidéo - is_video: {hasattr(self, 'is_video')} = {getattr(self, 'is_video', None)}")
-        print(f"[DEBUG] Attributs vidéo - video_path: {hasattr(self, 'video_path')} = {getattr(self, 'video_path', None)}")
+        logger.debug("cleaned_audio: %s", self.cleaned_audio)
+        logger.debug("Attributs vidéo - is_video: %s = %s", hasattr(self, 'is_video'), getattr(self, 'is_video', None))
+        logger.debug("Attributs vidéo - video_path: %s = %s", hasattr(self, 'video_path'), getattr(self, 'video_path', None))
 
         # Déterminer le format d'origine
         original_ext = os.path.splitext(self.file_path)[1].lower()
-        print(f"[DEBUG] Format d'origine: {original_ext}")
+        logger.debug("Format d'origine: %s", original_ext)
         
         # Si c'est une vidéo, demander à l'utilisateur
         if hasattr(self, 'is_video') and self.is_video:
-            print("[DEBUG] Demande à l'utilisateur (vidéo détectée)")
+            logger.debug("Demande à l'utilisateur (vidéo détectée)")
             choice = QMessageBox.question(
                 self,
                 "Type de sauvegarde",
@@ -433,9 +1166,9 @@ class AudioCleanerApp(QMainWindow):
                 QMessageBox.StandardButton.Yes
             )
             save_as_video = (choice == QMessageBox.StandardButton.Yes)
-            print(f"[DEBUG] Choix utilisateur - save_as_video: {save_as_video}")
+            logger.debug("Choix utilisateur - save_as_video: %s", save_as_video)
         else:
-            print("[DEBUG] Pas de vidéo détectée, sauvegarde en audio")
+            logger.debug("Pas de vidéo détectée, sauvegarde en audio")
             save_as_video = False
 
         # Préparer les filtres pour le dialogue de sauvegarde
@@ -467,128 +1200,196 @@ class AudioCleanerApp(QMainWindow):
         
         if file_path:
             try:
-                print(f"[DEBUG] Sauvegarde vers: {file_path}")
+                logger.debug("Sauvegarde vers: %s", file_path)
                 self.status_bar.showMessage("Sauvegarde en cours...")
                 desired_ext = os.path.splitext(file_path)[1].lower()
-                print(f"[DEBUG] Extension désirée: {desired_ext}")
+                logger.debug("Extension désirée: %s", desired_ext)
                 
                 if save_as_video and self.is_video:
-                    print("[DEBUG] Début reconstruction vidéo")
-                    self.status_bar.showMessage("Reconstruction de la vidéo en cours... Cette opération peut prendre plusieurs minutes.")
-                    reconstruct_video_from_audio_and_video(
+                    logger.debug("Début reconstruction vidéo")
+                    self.status_bar.showMessage("Reconstruction de la vidéo en cours...")
+                    QApplication.processEvents()
+                    report = reconstruct_video_from_audio_and_video(
                         self.video_path,
                         self.cleaned_audio,
                         file_path,
                         format=desired_ext[1:]
                     )
-                    print("[DEBUG] Fin reconstruction vidéo")
+                    method = "copie du flux vidéo" if report['mode'] == 'remux' else "ré-encodage de la vidéo"
+                    success_message = f"La vidéo a été sauvegardée avec succès!\n({method}, {report['elapsed']:.1f} s)"
+                    logger.debug("Fin reconstruction vidéo")
                 else:
-                    print("[DEBUG] Début conversion audio")
-                    convert_audio_format(
-                        self.cleaned_audio,
-                        file_path,
-                        format=desired_ext[1:]
-                    )
-                    print("[DEBUG] Fin conversion audio")
+                    # Encodage en arrière-plan : la fenêtre reste utilisable (voir on_save_finished)
+                    logger.debug("Début conversion audio")
+                    self.start_save_export(file_path, desired_ext[1:])
+                    return
                 
                 self.status_bar.showMessage("Sauvegarde terminée avec succès!", 5000)
                 QMessageBox.information(
                     self,
                     "Succès",
-                    "Le fichier a été sauvegardé avec succès!"
+                    success_message
                 )
                 
             except Exception as e:
-                print(f"[ERROR] Erreur lors de la sauvegarde: {str(e)}")
+                logger.error("Erreur lors de la sauvegarde: %s", e)
                 self.status_bar.showMessage("Erreur lors de la sauvegarde!", 5000)
                 QMessageBox.critical(self, "Erreur", f"Une erreur est survenue lors de la sauvegarde:\n{str(e)}")
 
-    def plot_spectrograms(self, original_file, cleaned_file):
-        """Affiche les spectrogrammes des fichiers audio"""
-        # Paramètres configurables pour l'optimisation
-        SAMPLE_RATE = int(22050/4)        # Fréquence d'échantillonnage (22050 Hz = environ 1/2 de 44100 Hz)
-        N_FFT = int(2048/2)              # Taille de la FFT (défaut=2048). Plus grand = moins de résolution temporelle
-        HOP_LENGTH = int(512*4)          # Nombre d'échantillons entre trames successives (défaut=512)
-                                 # Plus grand = moins de colonnes temporelles
+    def start_save_export(self, file_path, format):
+        self.save_button.setEnabled(False)
+        target = {'format': format, 'bitrate': DEFAULT_BITRATES.get(format), 'path': file_path}
+        self.save_thread = ExportThread(self.cleaned_audio, [target])
+        self.save_thread.progress.connect(
+            lambda index, fraction: self.status_bar.showMessage(f"Sauvegarde en cours... {100 * fraction:.0f}%"))
+        self.save_thread.finished.connect(self.on_save_finished)
+        self.save_thread.error.connect(self.on_save_error)
+        self.save_thread.start()
+
+    def on_save_finished(self, results):
+        if results[0]['status'] != 'ok':
+            self.on_save_error(results[0]['error'])
+            return
+        logger.debug("Fin conversion audio")
+        self.save_button.setEnabled(True)
+        self.status_bar.showMessage("Sauvegarde terminée avec succès!", 5000)
+        QMessageBox.information(self, "Succès", "Le fichier a été sauvegardé avec succès!")
+
+    def on_save_error(self, message):
+        logger.error("Erreur lors de la sauvegarde: %s", message)
+        self.save_button.setEnabled(True)
+        self.status_bar.showMessage("Erreur lors de la sauvegarde!", 5000)
+        QMessageBox.critical(self, "Erreur", f"Une erreur est survenue lors de la sauvegarde:\n{message}")
+
+    def on_export_click(self):
+        if not hasattr(self, 'cleaned_audio'):
+            return
+        if self.export_dialog is not None:
+            self.export_dialog.cancel_export()
+        default_name = os.path.splitext(os.path.basename(self.file_path))[0] + "_clean"
+        self.export_dialog = ExportDialog(self.cleaned_audio, default_name, self)
+        self.export_dialog.show()
+
+    def on_stats_click(self):
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def stop_spectrogram_thread(self):
+        """Interrompt le calcul des spectrogrammes en cours et attend la fin du fil"""
+        if self.spectrogram_thread is not None and self.spectrogram_thread.isRunning():
+            self.spectrogram_thread.cancel.set()
+            self.spectrogram_thread.wait()
+
+    def stop_preview_thread(self):
+        """Interrompt le calcul de l'aperçu en cours et attend la fin du fil"""
+        if self.preview_thread is not None and self.preview_thread.isRunning():
+            # Le processus deep-filter en cours est arrêté : l'attente est brève
+            self.preview_thread.cancel.set()
+            self.preview_thread.wait()
+
+    def release_audio(self):
+        """Libère la projection mémoire du fichier précédent, une fois les fils qui la lisent arrêtés"""
+        audio, self.audio = getattr(self, 'audio', None), None
+        if isinstance(audio, MappedAudio):
+            self.stop_spectrogram_thread()
+            self.stop_preview_thread()
+            audio.close()
+
+    def release_cleaned(self):
+        """Libère la projection mémoire du résultat précédent, une fois les spectrogrammes qui la lisent arrêtés"""
+        cleaned, self.cleaned = getattr(self, 'cleaned', None), None
+        if isinstance(cleaned, MappedAudio):
+            self.stop_spectrogram_thread()
+            cleaned.close()
+
+    def plot_spectrograms(self, original, cleaned):
+        """Lance le calcul des spectrogrammes en arrière-plan (tampons DecodedAudio)"""
+        self.stop_spectrogram_thread()
         
-        start_time = time.time()
+        logger.debug("Génération des spectrogrammes en arrière-plan...")
+        self.spectrogram_thread = SpectrogramThread(original, cleaned,
+                                                    self.spectrogram_cache_spin.value() * 1024 ** 2)
+        self.spectrogram_thread.finished.connect(self.on_spectrograms_ready)
+        self.spectrogram_thread.error.connect(self.on_spectrograms_error)
+        self.spectrogram_thread.start()
+
+    def on_spectrogram_cache_changed(self, megabytes):
+        """Applique tout de suite le nouveau budget, sans toucher aux pyramides affichées"""
+        displayed = [pyramid.directory for pyramid in (self.spectrograms or ())]
+        removed = spectrogram.evict(max_bytes=megabytes * 1024 ** 2, keep=displayed)
+        logger.debug("Budget du cache des spectrogrammes: %s Mo (%s pyramides évincées)", megabytes, removed)
+
+    def on_spectrograms_ready(self, original_pyramid, cleaned_pyramid):
+        self.spectrograms = (original_pyramid, cleaned_pyramid)
+        self.spectrogram_window = (0.0, max(original_pyramid.duration, cleaned_pyramid.duration))
+        self.ensure_spectrogram_views()
+        for view, pyramid in zip(self.spectrogram_views, self.spectrograms):
+            view.set_pyramid(pyramid, self.spectrogram_window)
+
+    def on_spectrograms_error(self, error_message):
+        logger.error("Erreur lors de la génération des spectrogrammes: %s", error_message)
+        self.status_bar.showMessage("Erreur lors de la génération des spectrogrammes", 5000)
+
+    def set_spectrogram_window(self, start, end):
+        """Même fenêtre de temps pour les deux spectrogrammes"""
+        self.spectrogram_window = (start, end)
+        for view in self.spectrogram_views:
+            view.set_window(start, end)
+
+    def on_spectrogram_zoom(self, anchor, zoom_in):
+        """Zoom (molette) centré sur la position de la souris"""
+        start, end = self.spectrogram_window
+        duration = max(p.duration for p in self.spectrograms)
+        factor = 0.8 if zoom_in else 1.25
+        width = min(duration, max(0.5, (end - start) * factor))
+        ratio = (anchor - start) / (end - start)
+        start = min(max(0.0, anchor - ratio * width), duration - width)
+        self.set_spectrogram_window(start, start + width)
+
+    def on_spectrogram_pan(self, pixels):
+        """Déplacement (glisser) de la fenêtre de temps, d'un nombre entier de pixels"""
+        start, end = self.spectrogram_window
+        duration = max(p.duration for p in self.spectrograms)
+        shift = -pixels * self.spectrogram_views[0].seconds_per_pixel()
+        shift = min(max(shift, -start), duration - end)
+        if shift:
+            self.set_spectrogram_window(start + shift, end + shift)
+
+    def closeEvent(self, event):
+        logger.debug("Début de la fermeture de l'application")
         try:
-            print("[DEBUG] Génération des spectrogrammes...")
-            print(f"[DEBUG] Paramètres: sr={SAMPLE_RATE}Hz, n_fft={N_FFT}, hop_length={HOP_LENGTH}")
-            
-            # Nettoyer les axes
-            self.ax1.clear()
-            self.ax2.clear()
-            
-            # Configuration des axes pour la transparence
-            for ax in [self.ax1, self.ax2]:
-                ax.set_xticks([])
-                ax.set_yticks([])
-                ax.set_frame_on(False)
-                ax.set_facecolor('none')
-            
-            # Charger les fichiers audio avec fréquence réduite
-            y_orig, sr = librosa.load(original_file, sr=SAMPLE_RATE)
-            y_clean, _ = librosa.load(cleaned_file, sr=SAMPLE_RATE)
-            
-            print(f"[DEBUG] Chargement audio: {time.time() - start_time:.2f}s")
-            
-            # Calculer les spectrogrammes avec résolution réduite
-            D_orig = librosa.amplitude_to_db(
-                abs(librosa.stft(y_orig, n_fft=N_FFT, hop_length=HOP_LENGTH)), 
-                ref=np.max
-            )
-            D_clean = librosa.amplitude_to_db(
-                abs(librosa.stft(y_clean, n_fft=N_FFT, hop_length=HOP_LENGTH)), 
-                ref=np.max
-            )
+            # Annuler la file : les processus deep-filter en cours sont arrêtés
+            self.scheduler.shutdown()
             
-            print(f"[DEBUG] Calcul spectrogrammes: {time.time() - start_time:.2f}s")
+            # 0. Interrompre le calcul des spectrogrammes et de l'aperçu en cours
+            for thread in (self.spectrogram_thread, self.preview_thread, self.save_thread):
+                if thread is not None and thread.isRunning():
+                    thread.cancel.set()
+                    thread.wait()
             
-            # Afficher les spectrogrammes avec un style amélioré
-            img1 = librosa.display.specshow(D_orig, ax=self.ax1, cmap='magma',
-                                          hop_length=HOP_LENGTH, sr=SAMPLE_RATE)
-            img2 = librosa.display.specshow(D_clean, ax=self.ax2, cmap='magma',
-                                          hop_length=HOP_LENGTH, sr=SAMPLE_RATE)
+            if self.export_dialog is not None:
+                self.export_dialog.cancel_export()
             
-            # Titres stylisés
-            self.ax1.text(0.02, 0.95, 'Signal Original', 
-                         transform=self.ax1.transAxes,
-                         color='white', fontsize=10, alpha=0.8)
-            self.ax2.text(0.02, 0.95, 'Signal Nettoyé', 
-                         transform=self.ax2.transAxes,
-                         color='white', fontsize=10, alpha=0.8)
-            
-            # Ajuster la mise en page
-            self.fig.tight_layout()
-            self.canvas.draw()
-            
-            # S'assurer que le fond reste transparent
-            self.fig.patch.set_alpha(0.0)
-            self.canvas.draw()
-            
-            print(f"[DEBUG] Spectrogrammes générés avec succès en {time.time() - start_time:.2f} secondes")
-            
-        except Exception as e:
-            print(f"[ERROR] Erreur lors de la génération des spectrogrammes: {str(e)}")
-            self.status_bar.showMessage("Erreur lors de la génération des spectrogrammes", 5000)
-
-    def closeEvent(self, event):
-        print("[DEBUG] Début de la fermeture de l'application")
-        try:
             # 1. Arrêter et libérer les lecteurs audio
             if hasattr(self, 'original_player'):
-                print("[DEBUG] Arrêt du lecteur original")
+                logger.debug("Arrêt du lecteur original")
                 self.original_player.media_player.stop()
                 self.original_player.media_player.setSource(QUrl())  # Libérer la source
                 self.original_player.media_player.deleteLater()
                 
             if hasattr(self, 'cleaned_player'):
-                print("[DEBUG] Arrêt du lecteur nettoyé")
+                logger.debug("Arrêt du lecteur nettoyé")
                 self.cleaned_player.media_player.stop()
                 self.cleaned_player.media_player.setSource(QUrl())  # Libérer la source
                 self.cleaned_player.media_player.deleteLater()
             
+            # Libérer les projections mémoire des WAV intermédiaires (sinon non supprimables sous Windows)
+            for audio in (getattr(self, 'audio', None), getattr(self, 'cleaned', None)):
+                if isinstance(audio, MappedAudio):
+                    audio.close()
+            
             # 2. Attendre un peu que les ressources soient libérées
             QApplication.processEvents()
             time.sleep(0.5)  # Petit délai pour laisser le temps aux ressources d'être libérées
@@ -596,7 +1397,7 @@ class AudioCleanerApp(QMainWindow):
             # 3. Nettoyer les dossiers temporaires
             if hasattr(self, 'temp_dir_obj'):
                 try:
-                    print(f"[DEBUG] Nettoyage du dossier temporaire: {self.temp_dir}")
+                    logger.debug("Nettoyage du dossier temporaire: %s", self.temp_dir)
                     # Supprimer les fichiers manuellement d'abord
                     for filename in os.listdir(self.temp_dir):
                         filepath = os.path.join(self.temp_dir, filename)
@@ -604,19 +1405,19 @@ class AudioCleanerApp(QMainWindow):
                             try:
                                 os.chmod(filepath, 0o777)  # Donner tous les droits
                                 os.unlink(filepath)
-                                print(f"[DEBUG] Fichier supprimé: {filepath}")
+                                logger.debug("Fichier supprimé: %s", filepath)
                             except Exception as e:
-                                print(f"[DEBUG] Impossible de supprimer {filepath}: {str(e)}")
+                                logger.debug("Impossible de supprimer %s: %s", filepath, e)
                     
                     # Puis laisser cleanup faire son travail
                     self.temp_dir_obj.cleanup()
-                    print("[DEBUG] Nettoyage temp_dir réussi")
+                    logger.debug("Nettoyage temp_dir réussi")
                 except Exception as e:
-                    print(f"[DEBUG] Erreur nettoyage temp_dir: {str(e)}")
+                    logger.debug("Erreur nettoyage temp_dir: %s", e)
             
             if hasattr(self, 'output_dir_obj'):
                 try:
-                    print(f"[DEBUG] Nettoyage du dossier de sortie: {self.output_dir}")
+                    logger.debug("Nettoyage du dossier de sortie: %s", self.output_dir)
                     # Supprimer les fichiers manuellement d'abord
                     for filename in os.listdir(self.output_dir):
                         filepath = os.path.join(self.output_dir, filename)
@@ -624,23 +1425,28 @@ class AudioCleanerApp(QMainWindow):
                             try:
                                 os.chmod(filepath, 0o777)  # Donner tous les droits
                                 os.unlink(filepath)
-                                print(f"[DEBUG] Fichier supprimé: {filepath}")
+                                logger.debug("Fichier supprimé: %s", filepath)
                             except Exception as e:
-                                print(f"[DEBUG] Impossible de supprimer {filepath}: {str(e)}")
+                                logger.debug("Impossible de supprimer %s: %s", filepath, e)
                     
                     # Puis laisser cleanup faire son travail
                     self.output_dir_obj.cleanup()
-                    print("[DEBUG] Nettoyage output_dir réussi")
+                    logger.debug("Nettoyage output_dir réussi")
                 except Exception as e:
-                    print(f"[DEBUG] Erreur nettoyage output_dir: {str(e)}")
+                    logger.debug("Erreur nettoyage output_dir: %s", e)
                     
         except Exception as e:
-            print(f"[DEBUG] Erreur lors de la fermeture: {str(e)}")
+            logger.debug("Erreur lors de la fermeture: %s", e)
         
-        print("[DEBUG] Fin de la fermeture de l'application")
+        logger.debug("Fin de la fermeture de l'application")
         event.accept()
 
 if __name__ == "__main__":
+    metrics.setup_logging()
+    # Agrégation en mémoire pour le panneau de statistiques, plus les sorties éventuelles
+    # demandées par DEEPFILTER_METRICS_JSONL / DEEPFILTER_METRICS_PROM
+    metrics.configure()
+    metrics.enable()
     app = QApplication(sys.argv)
     window = AudioCleanerApp()
     window.show()
@@ -0,0 +1,331 @@
+"""
+Instrumentation des étapes de traitement : durées (spans) et compteurs.
+
+    with metrics.span('decode', format='mp3'):
+        ...
+    metrics.count('cache_hits')
+
+Désactivée par défaut : `span` renvoie alors un objet vide partagé et `count`
+retourne immédiatement, le coût se limite à un test de booléen. `enable(*sinks)`
+active l'agrégation en mémoire (lue par le panneau de statistiques de
+l'interface) et transmet chaque évènement aux sorties branchées :
+    - JsonLinesSink : un évènement JSON par ligne, en ajout ;
+    - PrometheusTextSink : fichier texte au format d'exposition Prometheus
+      (collecteur « textfile » de node_exporter), réécrit atomiquement.
+
+Les variables d'environnement DEEPFILTER_METRICS_JSONL et DEEPFILTER_METRICS_PROM
+activent ces sorties sans modifier le code (voir configure).
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+_enabled = False
+_sinks = []
+_state_lock = threading.Lock()
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    """Agrégats en mémoire : nombre, total et maximum des durées ; somme des compteurs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+
+    def record_span(self, name, labels, duration):
+        key = (name, labels)
+        with self._lock:
+            entry = self.spans.get(key)
+            if entry is None:
+                self.spans[key] = [1, duration, duration]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+
+    def record_count(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        """État sérialisable en JSON (transmissible entre processus)."""
+        with self._lock:
+            return {
+                'spans': [{'name': name, 'labels': dict(labels), 'count': count, 'total': total, 'max': peak}
+                          for (name, labels), (count, total, peak) in sorted(self.spans.items())],
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+            }
+
+    def merge(self, snapshot):
+        """Ajoute un état produit par `snapshot` (par exemple renvoyé par un processus de travail)."""
+        with self._lock:
+            for item in snapshot['spans']:
+                key = (item['name'], _label_key(item['labels']))
+                entry = self.spans.get(key)
+                if entry is None:
+                    self.spans[key] = [item['count'], item['total'], item['max']]
+                else:
+                    entry[0] += item['count']
+                    entry[1] += item['total']
+                    entry[2] = max(entry[2], item['max'])
+            for item in snapshot['counters']:
+                key = (item['name'], _label_key(item['labels']))
+                self.counters[key] = self.counters.get(key, 0) + item['value']
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+
+# Agrégat global du processus ; `attach` y ajoute temporairement d'autres registres
+registry = Registry()
+_registries = [registry]
+
+
+class Span:
+    """Mesure la durée d'un bloc `with` ; les libellés peuvent être complétés en cours de route via `set`."""
+    __slots__ = ('name', 'labels', 'start', 'duration')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.duration = None
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.labels['error'] = exc_type.__name__
+        _record('span', self.name, self.labels, self.duration)
+        return False
+
+
+class _NullSpan:
+    duration = None
+
+    def set(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **labels):
+    """Contexte mesurant une étape (objet vide partagé si l'instrumentation est désactivée)."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, labels)
+
+
+def count(name, value=1, **labels):
+    """Incrémente un compteur (secondes audio traitées, octets, succès de cache...)."""
+    if _enabled:
+        _record('counter', name, labels, value)
+
+
+def _record(kind, name, labels, value):
+    key = _label_key(labels)
+    for target in _registries:
+        if kind == 'span':
+            target.record_span(name, key, value)
+        else:
+            target.record_count(name, key, value)
+    if _sinks:
+        event = {'time': time.time(), 'pid': os.getpid(), 'type': kind, 'name': name,
+                 'labels': dict(key), 'value': value}
+        for sink in _sinks:
+            sink.emit(event)
+
+
+def attach(target):
+    """Enregistre aussi dans `target` (par exemple les mesures d'un seul fichier), jusqu'à `detach`."""
+    _registries.append(target)
+
+
+def detach(target):
+    if target in _registries:
+        _registries.remove(target)
+
+
+def merge(snapshot):
+    """Intègre les mesures d'un autre processus à l'agrégat global, puis met à jour les sorties."""
+    if not _enabled:
+        return
+    registry.merge(snapshot)
+    flush()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(*sinks):
+    """Active l'instrumentation et branche des sorties supplémentaires."""
+    global _enabled
+    with _state_lock:
+        _sinks.extend(sinks)
+        _enabled = True
+
+
+def disable(close=True):
+    """
+    Désactive l'instrumentation et débranche les sorties (l'agrégat est conservé).
+    `close=False` les abandonne sans les fermer : copies héritées d'un processus parent.
+    """
+    global _enabled
+    with _state_lock:
+        _enabled = False
+        sinks = list(_sinks)
+        del _sinks[:]
+    if close:
+        for sink in sinks:
+            sink.close()
+
+
+def flush():
+    for sink in list(_sinks):
+        sink.flush()
+
+
+def setup_logging(level=None):
+    """
+    Configure la journalisation des points d'entrée (interface, lot, direct).
+    Niveau par défaut : variable DEEPFILTER_LOG_LEVEL, sinon INFO.
+    """
+    level = level or os.environ.get('DEEPFILTER_LOG_LEVEL', 'INFO')
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level,
+                        format="[%(levelname)s] %(name)s: %(message)s")
+
+
+def configure(jsonl=None, prometheus=None):
+    """
+    Active l'instrumentation avec les sorties demandées (chemins de fichiers),
+    à défaut celles des variables d'environnement. Retourne True si elle est active.
+    """
+    jsonl = jsonl or os.environ.get('DEEPFILTER_METRICS_JSONL')
+    prometheus = prometheus or os.environ.get('DEEPFILTER_METRICS_PROM')
+    sinks = []
+    if jsonl:
+        sinks.append(JsonLinesSink(jsonl))
+    if prometheus:
+        sinks.append(PrometheusTextSink(prometheus))
+    if sinks:
+        enable(*sinks)
+    return _enabled
+
+
+class JsonLinesSink:
+    """Ajoute chaque évènement sur une ligne JSON ; une écriture par ligne, sûre entre processus."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() or c == '_' else '_' for c in name)
+
+
+def render_prometheus(snapshot, prefix='deepfilter'):
+    """Texte au format d'exposition Prometheus pour un état `Registry.snapshot()`."""
+    lines = []
+    if snapshot['spans']:
+        lines += [f"# HELP {prefix}_stage_seconds Durée des étapes de traitement",
+                  f"# TYPE {prefix}_stage_seconds summary"]
+        for item in snapshot['spans']:
+            labels = _format_labels(dict({'stage': item['name']}, **item['labels']))
+            lines.append(f"{prefix}_stage_seconds_count{labels} {item['count']}")
+            lines.append(f"{prefix}_stage_seconds_sum{labels} {item['total']:.6f}")
+        lines += [f"# HELP {prefix}_stage_seconds_max Durée maximale observée par étape",
+                  f"# TYPE {prefix}_stage_seconds_max gauge"]
+        for item in snapshot['spans']:
+            labels = _format_labels(dict({'stage': item['name']}, **item['labels']))
+            lines.append(f"{prefix}_stage_seconds_max{labels} {item['max']:.6f}")
+    declared = set()
+    for item in snapshot['counters']:
+        metric = f"{prefix}_{_metric_name(item['name'])}_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_format_labels(item['labels'])} {item['value']}")
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusTextSink:
+    """
+    Réécrit `path` avec l'agrégat global au plus toutes les `interval` secondes,
+    et à la fermeture. Le fichier est remplacé atomiquement : un collecteur ne
+    lit jamais un fichier à moitié écrit.
+    """
+
+    def __init__(self, path, interval=5.0, prefix='deepfilter'):
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def emit(self, event):
+        if time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+
+    def flush(self):
+        text = render_prometheus(registry.snapshot(), self.prefix)
+        with self._lock:
+            partial = f"{self.path}.{os.getpid()}.tmp"
+            with open(partial, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(partial, self.path)
+            self._last_write = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+
+atexit.register(disable)
@@ -0,0 +1,136 @@
+"""
+Aperçu des réglages : un court extrait débruité sous une grille d'options.
+
+L'extrait est découpé une seule fois dans le WAV 48 kHz, puis chaque combinaison
+de `pf_beta` et `atten_lim_db` est débruitée, en parallèle avec l'exécutable
+`deep-filter` ; le moteur en processus sert toutes les variantes avec un seul
+modèle chargé, les appels se succédant sur celui-ci. Les variantes passent
+par le cache de résultats, dont la clé porte sur le contenu de l'extrait et les
+options : relancer le même aperçu est immédiat, et l'écoute comparée (A/B) dans
+les lecteurs ne recalcule rien.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from cache import link_or_copy, make_key
+from deepfilter_interface import DEFAULT_OPTIONS, Cancelled, get_backend, process_audio, resolve_backend
+from wavio import open_wav, write_wav
+
+logger = logging.getLogger(__name__)
+
+# Grille par défaut (le réglage par défaut, pf_beta 0.02 / 100 dB, en fait partie)
+PF_BETAS = (0.02, 0.05, 0.1)
+ATTEN_LIMS_DB = (12, 24, 100)
+PREVIEW_SECONDS = 5.0
+
+
+def option_grid(pf_betas=PF_BETAS, atten_lims_db=ATTEN_LIMS_DB, base=None):
+    """Combinaisons d'options, les autres réglages étant repris de `base`."""
+    base = dict(DEFAULT_OPTIONS, **(base or {}))
+    return [dict(base, pf_beta=pf_beta, atten_lim_db=atten_lim_db)
+            for pf_beta in pf_betas for atten_lim_db in atten_lims_db]
+
+
+def describe_options(options):
+    """Libellé court d'une combinaison d'options."""
+    return f"pf_beta {options['pf_beta']:g}, atténuation max {options['atten_lim_db']:g} dB"
+
+
+def cut_excerpt(wav_path, start, duration, output_path):
+    """Copie [start, start + duration] secondes d'un WAV (bornées au fichier) ; retourne le début effectif (s)."""
+    with open_wav(wav_path) as wav:
+        duration_frames = int(duration * wav.sample_rate)
+        first = max(0, min(int(start * wav.sample_rate), wav.frames - duration_frames))
+        last = min(wav.frames, first + duration_frames)
+        if last <= first:
+            raise ValueError("Extrait vide")
+        write_wav(output_path, wav.read(first, last), wav.sample_rate)
+        return first / float(wav.sample_rate)
+
+
+def preview_variants(wav_path, start, duration, work_dir, grid=None, cache=None, backend='auto',
+                     workers=None, cancel=None, on_variant=None):
+    """
+    Débruite l'extrait [start, start + duration] de `wav_path` sous chaque combinaison
+    de `grid` (défaut : option_grid()), jusqu'à `workers` à la fois (défaut : nombre de
+    cœurs si le moteur gagne à des appels simultanés, 1 sinon). `work_dir` reçoit
+    l'extrait (excerpt.wav) et les variantes. `on_variant(variante)` est appelé dès
+    qu'une variante est prête, depuis le fil qui l'a calculée.
+    Retourne {'excerpt', 'start', 'duration', 'variants'} ; chaque variante :
+    {'index', 'options', 'file', 'cached', 'elapsed'}, dans l'ordre de la grille.
+    `cancel` (threading.Event) arrête les variantes restantes : lève Cancelled.
+    """
+    grid = option_grid() if grid is None else grid
+    excerpt = os.path.join(work_dir, 'excerpt.wav')
+    start = cut_excerpt(wav_path, start, duration, excerpt)
+    if workers is None:
+        engine_options = {key: value for key, value in grid[0].items() if key != 'skip_silence'}
+        workers = (os.cpu_count() or 1) if get_backend(backend, engine_options).parallel_channels else 1
+    workers = max(1, min(len(grid), workers))
+    logger.debug("Aperçu de %s variantes sur %.1fs à partir de %.1fs", len(grid), duration, start)
+
+    def run(index, options):
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+        start_time = time.perf_counter()
+        output_file = os.path.join(work_dir, f"variant{index}.wav")
+        key = make_key(excerpt, options, resolve_backend(backend, options)) if cache is not None else None
+        cached = cache.get(key) if cache is not None else None
+        if cached:
+            link_or_copy(cached, output_file)
+        else:
+            output_dir = os.path.join(work_dir, f"variant{index}")
+            os.makedirs(output_dir)
+            process_audio(excerpt, output_dir, options, backend=backend, cancel=cancel)
+            os.replace(os.path.join(output_dir, os.path.basename(excerpt)), output_file)
+            if cache is not None:
+                cache.put(key, output_file)
+        variant = {
+            'index': index,
+            'options': options,
+            'file': output_file,
+            'cached': bool(cached),
+            'elapsed': time.perf_counter() - start_time,
+        }
+        if on_variant is not None:
+            on_variant(variant)
+        return variant
+
+    with metrics.span('preview', variants=len(grid)):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run, index, options) for index, options in enumerate(grid)]
+            variants = [future.result() for future in futures]
+    metrics.count('preview_cached_variants', sum(variant['cached'] for variant in variants))
+    return {'excerpt': excerpt, 'start': start, 'duration': duration, 'variants': variants}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from cache import DEFAULT_CACHE_DIR, ResultCache
+    from utils import convert_to_wav
+
+    parser = argparse.ArgumentParser(description="Aperçu de réglages DeepFilterNet sur un court extrait")
+    parser.add_argument('input', help="Fichier audio/vidéo")
+    parser.add_argument('-o', '--output-dir', required=True, help="Dossier de l'extrait et des variantes")
+    parser.add_argument('--start', type=float, default=0.0, help="Début de l'extrait (s)")
+    parser.add_argument('--duration', type=float, default=PREVIEW_SECONDS, help="Durée de l'extrait (s)")
+    parser.add_argument('--pf-beta', type=float, nargs='+', default=PF_BETAS)
+    parser.add_argument('--atten-lim-db', type=float, nargs='+', default=ATTEN_LIMS_DB)
+    parser.add_argument('--backend', default='auto')
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache de résultats")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    wav_file = convert_to_wav(args.input, os.path.join(args.output_dir, 'source'))
+    result = preview_variants(wav_file, args.start, args.duration, args.output_dir,
+                              option_grid(args.pf_beta, args.atten_lim_db),
+                              cache=None if args.no_cache else ResultCache(DEFAULT_CACHE_DIR), backend=args.backend)
+    for variant in result['variants']:
+        cached = " [cache]" if variant['cached'] else ""
+        print(f"{variant['file']}: {describe_options(variant['options'])} ({variant['elapsed']:.2f}s){cached}")
+    print(json.dumps({'excerpt': result['excerpt'], 'start': result['start']}, ensure_ascii=False))
@@ -0,0 +1,341 @@
+"""
+Sonde rapide des fichiers audio/vidéo : seuls les en-têtes du conteneur et des
+flux sont lus, aucun échantillon n'est décodé.
+
+    info = probe_media('film.mp4')
+    info['duration'], info['audio']['channels'], info['video']['rotation']
+
+Selon le fichier, la sonde utilise :
+    - l'en-tête RIFF pour les WAV (lecture Python directe, sans processus) ;
+    - ffprobe s'il est installé ;
+    - à défaut, la description des flux affichée par `ffmpeg -i`.
+
+Les résultats sont mis en cache, indexés par chemin + date de modification +
+taille : en mémoire dans le processus, et dans une base SQLite partagée entre
+processus et sessions (re-sélection d'un fichier, analyse d'un lot de milliers
+de fichiers). Un fichier modifié est automatiquement sondé à nouveau.
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+
+from pydub import AudioSegment
+
+import metrics
+from cache import DEFAULT_CACHE_DIR
+from wavio import WAVE_FORMAT_IEEE_FLOAT, open_wav
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter si le contenu d'une sonde change, pour invalider les anciennes entrées
+PROBE_VERSION = 1
+DEFAULT_PROBE_DB = os.path.join(DEFAULT_CACHE_DIR, 'probe.sqlite')
+# Entrées conservées : en mémoire par processus, et dans la base (les moins récemment utilisées partent)
+MEMORY_ENTRIES = 4096
+MAX_DB_ENTRIES = 200000
+
+SAMPLE_FORMAT_BITS = {'u8': 8, 'u8p': 8, 's16': 16, 's16p': 16, 's32': 32, 's32p': 32,
+                      'flt': 32, 'fltp': 32, 'dbl': 64, 'dblp': 64}
+CHANNEL_LAYOUTS = {'mono': 1, 'stereo': 2, '2.1': 3, '3.0': 3, 'quad': 4, '4.0': 4, '4.1': 5,
+                   '5.0': 5, '5.1': 6, '6.0': 6, '6.1': 7, '7.0': 7, '7.1': 8}
+
+
+def parse_streams(info):
+    """Extrait les informations utiles (audio, vidéo) d'une description au format ffprobe."""
+    audio = None
+    video = None
+    for stream in info.get('streams', []):
+        if stream.get('codec_type') == 'audio' and audio is None:
+            bits = int(stream.get('bits_per_raw_sample') or stream.get('bits_per_sample') or 0)
+            if not bits:
+                bits = SAMPLE_FORMAT_BITS.get(stream.get('sample_fmt'), 16)
+            audio = {
+                'codec': stream.get('codec_name'),
+                'channels': int(stream.get('channels', 1)),
+                'sample_rate': int(stream.get('sample_rate', 0)),
+                'sample_width': max(1, min(4, bits // 8)),
+            }
+        elif (stream.get('codec_type') == 'video' and video is None
+              and not stream.get('disposition', {}).get('attached_pic')):
+            # Les pochettes d'album (attached_pic) ne sont pas de la vidéo
+            num, _, den = (stream.get('avg_frame_rate') or '0/0').partition('/')
+            fps = float(num) / float(den) if den and float(den) else None
+            rotation = int(float(stream.get('tags', {}).get('rotate', 0)))
+            for side_data in stream.get('side_data_list', []):
+                if 'rotation' in side_data:
+                    rotation = int(side_data['rotation'])
+            video = {
+                'codec': stream.get('codec_name'),
+                'size': (stream.get('width'), stream.get('height')),
+                'fps': fps,
+                'rotation': rotation,
+            }
+    return audio, video
+
+
+def _wav_description(path):
+    """Description au format ffprobe tirée de l'en-tête RIFF (ValueError si variante non gérée)."""
+    with open_wav(path) as wav:
+        if wav.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            codec = f"pcm_f{wav.bits}le"
+        else:
+            codec = 'pcm_u8' if wav.bits == 8 else f"pcm_s{wav.bits}le"
+        return {
+            'format': {'format_name': 'wav', 'duration': str(wav.duration)},
+            'streams': [{'index': 0, 'codec_type': 'audio', 'codec_name': codec, 'channels': wav.channels,
+                         'sample_rate': str(wav.sample_rate), 'bits_per_sample': wav.bits}],
+        }
+
+
+def _ffprobe_description(prober, path):
+    result = subprocess.run([prober, "-v", "error", "-of", "json", "-show_format", "-show_streams", path],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Échec de la sonde de {path}: {result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+
+_DURATION = re.compile(r"^\s*Duration: (\d+):(\d+):([\d.]+)")
+_STREAM = re.compile(r"^\s*Stream #\d+:(\d+)\S*: (Audio|Video): (\w+)(.*)$")
+_ROTATION = re.compile(r"displaymatrix: rotation of (-?[\d.]+) degrees")
+
+
+def _ffmpeg_description(path):
+    """
+    Description au format ffprobe reconstruite depuis la sortie de `ffmpeg -i`
+    (sans fichier de sortie, ffmpeg s'arrête après la lecture des en-têtes).
+    """
+    result = subprocess.run([AudioSegment.converter, "-hide_banner", "-nostdin", "-i", path],
+                            capture_output=True, text=True, errors='replace')
+    info = {'format': {}, 'streams': []}
+    stream = None
+    for line in result.stderr.splitlines():
+        match = _DURATION.match(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            info['format']['duration'] = str(int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+            continue
+        match = _STREAM.match(line)
+        if match:
+            index, kind, codec, details = match.groups()
+            stream = {'index': int(index), 'codec_type': kind.lower(), 'codec_name': codec}
+            fields = [field.strip() for field in re.sub(r"\([^()]*\)", "", details).split(',')]
+            if kind == 'Audio':
+                for field in fields:
+                    if field.endswith(' Hz'):
+                        stream['sample_rate'] = field.split()[0]
+                    elif field in CHANNEL_LAYOUTS:
+                        stream['channels'] = CHANNEL_LAYOUTS[field]
+                    elif field.endswith(' channels'):
+                        stream['channels'] = int(field.split()[0])
+                    elif field.split(' ')[0] in SAMPLE_FORMAT_BITS:
+                        stream['sample_fmt'] = field.split(' ')[0]
+            else:
+                for field in fields:
+                    size = re.match(r"^(\d+)x(\d+)", field)
+                    if size and 'width' not in stream:
+                        stream['width'], stream['height'] = int(size.group(1)), int(size.group(2))
+                    elif field.endswith(' fps'):
+                        stream['avg_frame_rate'] = f"{float(field.split()[0])}/1"
+                stream['disposition'] = {'attached_pic': int('(attached pic)' in details)}
+            info['streams'].append(stream)
+            continue
+        match = _ROTATION.search(line)
+        if match and stream is not None and stream['codec_type'] == 'video':
+            stream['side_data_list'] = [{'rotation': int(float(match.group(1)))}]
+    if not info['streams'] and 'duration' not in info['format']:
+        lines = result.stderr.strip().splitlines()
+        raise Exception(f"Échec de la sonde de {path}: {lines[-1] if lines else 'sortie vide'}")
+    return info
+
+
+def describe(path):
+    """Description brute (format ffprobe) et méthode employée, sans cache."""
+    if path.lower().endswith('.wav'):
+        try:
+            return _wav_description(path), 'wav'
+        except (ValueError, KeyError):
+            pass  # Variante WAV non gérée par wavio
+    prober = shutil.which('ffprobe')
+    if prober is not None:
+        return _ffprobe_description(prober, path), 'ffprobe'
+    return _ffmpeg_description(path), 'ffmpeg'
+
+
+def _summarize(path, description):
+    audio, video = parse_streams(description)
+    duration = description.get('format', {}).get('duration')
+    return {
+        'path': path,
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+        'audio': audio,
+        'video': video,
+        'streams': [{'index': s.get('index'), 'type': s.get('codec_type'), 'codec': s.get('codec_name')}
+                    for s in description.get('streams', [])],
+    }
+
+
+class ProbeCache:
+    """
+    Sondes indexées par chemin absolu, valides tant que mtime et taille du fichier
+    ne changent pas. Couche mémoire LRU devant une base SQLite ; si la base est
+    inaccessible (dossier en lecture seule...), seule la couche mémoire sert.
+    """
+
+    def __init__(self, db_path=DEFAULT_PROBE_DB, memory_entries=MEMORY_ENTRIES, max_entries=MAX_DB_ENTRIES):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        try:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            with self._connect() as db:
+                db.execute("""CREATE TABLE IF NOT EXISTS probes (
+                    path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, version INTEGER,
+                    info TEXT, last_access REAL)""")
+        except (OSError, sqlite3.Error) as e:
+            logger.debug("Cache de sondes en mémoire seulement (%s): %s", db_path, e)
+            self.db_path = None
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, path, stat):
+        """Sonde en cache pour ce fichier tel qu'il est sur le disque (os.stat), ou None."""
+        with self._lock:
+            entry = self._memory.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._memory.move_to_end(path)
+                return entry[2]
+        if self.db_path is None:
+            return None
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT info FROM probes WHERE path = ? AND mtime_ns = ? AND size = ? "
+                                 "AND version = ?", (path, stat.st_mtime_ns, stat.st_size, PROBE_VERSION)).fetchone()
+                if row is None:
+                    return None
+                db.execute("UPDATE probes SET last_access = ? WHERE path = ?", (time.time(), path))
+        except sqlite3.Error as e:
+            logger.debug("Lecture du cache de sondes impossible: %s", e)
+            return None
+        info = json.loads(row[0])
+        self._remember(path, stat, info)
+        return info
+
+    def put(self, path, stat, info):
+        self._remember(path, stat, info)
+        if self.db_path is None:
+            return
+        try:
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO probes (path, mtime_ns, size, version, info, last_access) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           (path, stat.st_mtime_ns, stat.st_size, PROBE_VERSION, json.dumps(info), time.time()))
+                self._puts += 1
+                if self._puts % 1000 == 0:
+                    self._prune(db)
+        except sqlite3.Error as e:
+            logger.debug("Écriture du cache de sondes impossible: %s", e)
+
+    def _remember(self, path, stat, info):
+        with self._lock:
+            self._memory[path] = (stat.st_mtime_ns, stat.st_size, info)
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _prune(self, db):
+        """Garde les `max_entries` sondes les plus récemment utilisées."""
+        db.execute("DELETE FROM probes WHERE path NOT IN "
+                   "(SELECT path FROM probes ORDER BY last_access DESC LIMIT ?)", (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path is not None:
+            with self._connect() as db:
+                db.execute("DELETE FROM probes")
+
+    def stats(self):
+        entries = 0
+        if self.db_path is not None:
+            with self._connect() as db:
+                entries = db.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        return {'memory_entries': len(self._memory), 'entries': entries, 'db_path': self.db_path}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Cache partagé du processus (créé au premier appel)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ProbeCache()
+        return _default_cache
+
+
+def probe_media(path, cache=None, use_cache=True):
+    """
+    Sonde un fichier : {'path', 'duration', 'audio', 'video', 'streams'}.
+    'audio' : {'codec', 'channels', 'sample_rate', 'sample_width'} ou None ;
+    'video' : {'codec', 'size', 'fps', 'rotation'} ou None (pochettes exclues).
+    `cache` : ProbeCache à utiliser (défaut : cache partagé du processus).
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    if use_cache:
+        cache = cache or default_cache()
+        info = cache.get(path, stat)
+        if info is not None:
+            metrics.count('probe_cache_hits')
+            return info
+
+    with metrics.span('probe') as span:
+        description, method = describe(path)
+        span.set(method=method)
+    info = _summarize(path, description)
+    if use_cache:
+        cache.put(path, stat, info)
+    return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sonde rapide de fichiers audio/vidéo (avec cache)")
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--no-cache', action='store_true', help="Ignorer le cache de sondes")
+    parser.add_argument('--clear', action='store_true', help="Vider le cache de sondes")
+    args = parser.parse_args()
+    if args.clear:
+        default_cache().clear()
+    for file_path in args.files:
+        start = time.perf_counter()
+        try:
+            result = probe_media(file_path, use_cache=not args.no_cache)
+        except Exception as e:
+            result = {'path': file_path, 'error': str(e)}
+        result['elapsed_ms'] = round(1000 * (time.perf_counter() - start), 3)
+        print(json.dumps(result, ensure_ascii=False))
+    if not args.files:
+        print(json.dumps(default_cache().stats(), indent=2))
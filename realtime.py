@@ -0,0 +1,342 @@
+"""
+Débruitage en direct (microphone ou source simulée) à faible latence.
+
+Trois fils d'exécution reliés par des tampons circulaires sans verrou
+(un producteur, un consommateur) :
+    source -> [anneau d'entrée] -> débruitage -> [anneau de sortie] -> sortie
+
+La source et la sortie sont interchangeables : un fichier WAV lu au rythme de
+l'horloge murale remplace le microphone sur une machine sans carte son, ce qui
+permet de mesurer la latence de bout en bout.
+
+Exemple :
+    python realtime.py --input enregistrement.wav --output nettoye.wav --frame-ms 20 --budget-ms 100
+    python realtime.py --input micro --output haut-parleur     # nécessite sounddevice
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from deepfilter_interface import SAMPLE_RATE, get_backend
+from wavio import open_wav, write_wav
+
+
+class RingBuffer:
+    """
+    Tampon circulaire de trames pour un producteur et un consommateur uniques.
+
+    Chaque côté ne modifie que son propre compteur (entier monotone) ; l'écriture
+    des données précède la publication du compteur, ce qui suffit pour un seul
+    producteur et un seul consommateur : aucun verrou n'est nécessaire.
+    """
+
+    def __init__(self, capacity, frame_size):
+        self.capacity = capacity
+        self.frames = np.zeros((capacity, frame_size), dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.write_count = 0
+        self.read_count = 0
+        self.overruns = 0
+        self.underruns = 0
+
+    def __len__(self):
+        return self.write_count - self.read_count
+
+    def push(self, frame, timestamp):
+        """Ajoute une trame ; si le tampon est plein, la trame est perdue (overrun)."""
+        if self.write_count - self.read_count >= self.capacity:
+            self.overruns += 1
+            return False
+        slot = self.write_count % self.capacity
+        self.frames[slot, :len(frame)] = frame
+        self.frames[slot, len(frame):] = 0.0
+        self.timestamps[slot] = timestamp
+        self.write_count += 1
+        return True
+
+    def pop(self):
+        """Retire la trame la plus ancienne : (trame, horodatage), ou None si vide (underrun)."""
+        if self.write_count == self.read_count:
+            self.underruns += 1
+            return None
+        slot = self.read_count % self.capacity
+        item = (self.frames[slot].copy(), self.timestamps[slot])
+        self.read_count += 1
+        return item
+
+
+class WavFileSource:
+    """Lit un WAV trame par trame au rythme réel, comme le ferait un microphone."""
+
+    def __init__(self, path, frame_size, realtime=True):
+        self._wav = open_wav(path)
+        # À 48 kHz, les trames sont lues au fil de l'eau dans le fichier projeté en mémoire
+        samples = self._wav.view(mono=True)
+        if self._wav.sample_rate != SAMPLE_RATE:
+            from audio_buffer import resample
+            samples = resample(np.asarray(samples), self._wav.sample_rate, SAMPLE_RATE)
+        self.samples = samples
+        self.frame_size = frame_size
+        self.realtime = realtime
+        self._position = 0
+        self._start = None
+
+    def read(self):
+        """Trame suivante (bloquant jusqu'à son instant de capture), ou None en fin de fichier."""
+        if self._position >= len(self.samples):
+            return None
+        if self._start is None:
+            self._start = time.perf_counter()
+        frame = self.samples[self._position:self._position + self.frame_size]
+        self._position += self.frame_size
+        if self.realtime:
+            # La trame n'est « capturée » qu'une fois entièrement jouée
+            delay = self._start + self._position / SAMPLE_RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return frame
+
+    def close(self):
+        self.samples = None
+        self._wav.close()
+
+
+class WavFileSink:
+    """Accumule les trames puis écrit un WAV à la fermeture."""
+
+    def __init__(self, path):
+        self.path = path
+        self._frames = []
+
+    def write(self, frame):
+        self._frames.append(frame)
+
+    def close(self):
+        samples = np.concatenate(self._frames) if self._frames else np.zeros(0, dtype=np.float32)
+        write_wav(self.path, samples, SAMPLE_RATE)
+
+
+class NullSink:
+    def write(self, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+class SoundDeviceSource:
+    """Microphone via le module optionnel `sounddevice`."""
+
+    def __init__(self, frame_size, device=None):
+        import sounddevice
+        self.frame_size = frame_size
+        self._stream = sounddevice.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='float32',
+                                               blocksize=frame_size, device=device)
+        self._stream.start()
+
+    def read(self):
+        frame, _ = self._stream.read(self.frame_size)
+        return frame[:, 0]
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+
+
+class SoundDeviceSink:
+    """Sortie audio via le module optionnel `sounddevice`."""
+
+    def __init__(self, frame_size, device=None):
+        import sounddevice
+        self._stream = sounddevice.OutputStream(samplerate=SAMPLE_RATE, channels=1, dtype='float32',
+                                                blocksize=frame_size, device=device)
+        self._stream.start()
+
+    def write(self, frame):
+        self._stream.write(frame.reshape(-1, 1))
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+
+
+class PassthroughStream:
+    """Flux sans débruitage, pour mesurer le pipeline seul."""
+    delay = 0
+
+    def process(self, frame):
+        return frame
+
+
+def open_stream(frame_size, backend='auto', options=None):
+    """Débruiteur en flux du moteur `backend` ; lève ValueError si ce moteur ne sait pas débruiter en flux."""
+    engine = get_backend(backend, options)
+    if not engine.streams:
+        raise ValueError(f"Le moteur {engine.name} ne sait pas débruiter en flux : le mode direct "
+                         "nécessite le moteur en processus (paquet deepfilternet)")
+    return engine.stream(frame_size)
+
+
+class LiveDenoiser:
+    """
+    Relie une source et une sortie par le débruiteur en flux du moteur (voir
+    DenoiseBackend.stream), qui garde l'état du modèle d'une trame à l'autre : chaque
+    trame n'est calculée qu'une fois. Un moteur incapable de débruiter en flux est refusé
+    (l'exécutable `deep-filter` serait relancé à chaque trame).
+
+    `latency_budget` (s) fixe l'avance constituée avant de commencer à jouer : la
+    sortie est cadencée à l'horloge murale et une trame absente à son échéance
+    est remplacée par du silence (underrun côté sortie). S'y ajoute le retard
+    algorithmique du modèle (`stream.delay`, 30 ms pour DeepFilterNet3).
+    """
+
+    def __init__(self, source, sink, frame_size=960, latency_budget=0.1, stream=None,
+                 backend='auto', options=None, buffer_frames=64):
+        if stream is None:
+            stream = open_stream(frame_size, backend, options)
+        self.source = source
+        self.sink = sink
+        self.frame_size = frame_size
+        self.frame_duration = frame_size / float(SAMPLE_RATE)
+        self.latency_budget = latency_budget
+        self.stream = stream
+        self.input_ring = RingBuffer(buffer_frames, frame_size)
+        self.output_ring = RingBuffer(buffer_frames, frame_size)
+        self.latencies = deque(maxlen=10000)
+        self.processing_times = deque(maxlen=10000)
+        self.frames_in = 0
+        self.frames_out = 0
+        self.late_frames = 0
+        self._capture_done = threading.Event()
+        self._processing_done = threading.Event()
+        self._stop = threading.Event()
+
+    def _capture(self):
+        try:
+            while not self._stop.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                # Horodatage du premier échantillon : la latence inclut l'accumulation de la trame
+                self.input_ring.push(frame, time.perf_counter() - self.frame_duration)
+                self.frames_in += 1
+        finally:
+            self._capture_done.set()
+
+    def _process(self):
+        try:
+            while not self._stop.is_set():
+                if not len(self.input_ring):
+                    if self._capture_done.is_set():
+                        break
+                    time.sleep(self.frame_duration / 4)
+                    continue
+                frame, timestamp = self.input_ring.pop()
+                start = time.perf_counter()
+                cleaned = self.stream.process(frame)
+                elapsed = time.perf_counter() - start
+                self.processing_times.append(elapsed)
+                if elapsed > self.frame_duration:
+                    self.late_frames += 1
+                self.output_ring.push(cleaned, timestamp)
+        finally:
+            self._processing_done.set()
+
+    def _playback(self):
+        # Constitution de l'avance correspondant au budget de latence
+        budget_frames = max(1, int(round(self.latency_budget / self.frame_duration)))
+        while (len(self.output_ring) < budget_frames and not self._processing_done.is_set()
+               and not self._stop.is_set()):
+            time.sleep(self.frame_duration / 4)
+
+        next_deadline = time.perf_counter()
+        while not self._stop.is_set():
+            if self._processing_done.is_set() and not len(self.output_ring):
+                break
+            item = self.output_ring.pop()
+            if item is None:
+                self.sink.write(np.zeros(self.frame_size, dtype=np.float32))
+            else:
+                frame, timestamp = item
+                self.sink.write(frame)
+                self.frames_out += 1
+                self.latencies.append(time.perf_counter() - timestamp)
+            next_deadline += self.frame_duration
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def run(self, duration=None):
+        """Exécute le pipeline jusqu'à la fin de la source (ou `duration` secondes). Retourne les statistiques."""
+        threads = [threading.Thread(target=target, daemon=True)
+                   for target in (self._capture, self._process, self._playback)]
+        for thread in threads:
+            thread.start()
+        try:
+            threads[2].join(timeout=duration)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.source.close()
+            self.sink.close()
+        return self.stats()
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000.0
+        processing = np.array(self.processing_times) * 1000.0
+        return {
+            'frame_ms': self.frame_duration * 1000.0,
+            'latency_budget_ms': self.latency_budget * 1000.0,
+            # Retard propre au modèle, dans le signal : non compris dans les latences mesurées
+            'algorithmic_delay_ms': self.stream.delay * 1000.0 / SAMPLE_RATE,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'input_overruns': self.input_ring.overruns,
+            'output_overruns': self.output_ring.overruns,
+            # Les underruns d'entrée (débruiteur en attente) sont normaux ; seuls ceux de sortie s'entendent
+            'output_underruns': self.output_ring.underruns,
+            'late_frames': self.late_frames,
+            'latency_ms_mean': float(latencies.mean()) if len(latencies) else None,
+            'latency_ms_p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'latency_ms_max': float(latencies.max()) if len(latencies) else None,
+            'processing_ms_mean': float(processing.mean()) if len(processing) else None,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Débruitage en direct avec DeepFilterNet")
+    parser.add_argument('--input', default='micro', help="Fichier WAV simulant le micro, ou 'micro'")
+    parser.add_argument('--output', default='haut-parleur', help="Fichier WAV, 'haut-parleur' ou 'aucune'")
+    parser.add_argument('--frame-ms', type=float, default=20.0, help="Taille des trames (ms)")
+    parser.add_argument('--budget-ms', type=float, default=100.0, help="Budget de latence (ms)")
+    parser.add_argument('--backend', default='auto', help="Moteur de débruitage (auto, inprocess, subprocess)")
+    parser.add_argument('--duration', type=float, help="Durée maximale (s)")
+    parser.add_argument('--passthrough', action='store_true', help="Sans débruitage (mesure du pipeline seul)")
+    args = parser.parse_args(argv)
+
+    frame_size = int(args.frame_ms * SAMPLE_RATE / 1000.0)
+    try:
+        stream = PassthroughStream() if args.passthrough else open_stream(frame_size, args.backend)
+    except ValueError as e:
+        parser.error(str(e))
+    source = SoundDeviceSource(frame_size) if args.input == 'micro' else WavFileSource(args.input, frame_size)
+    if args.output == 'haut-parleur':
+        sink = SoundDeviceSink(frame_size)
+    elif args.output == 'aucune':
+        sink = NullSink()
+    else:
+        sink = WavFileSink(args.output)
+
+    live = LiveDenoiser(source, sink, frame_size, args.budget_ms / 1000.0, stream=stream)
+    print(json.dumps(live.run(args.duration), indent=2))
+
+
+if __name__ == "__main__":
+    main()
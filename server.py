@@ -0,0 +1,489 @@
+"""
+Service local de débruitage (HTTP sur TCP ou socket Unix).
+
+Le moteur est initialisé au démarrage puis gardé chaud (voir get_backend) : les
+autres outils appellent le débruitage sans lancer l'interface. Les requêtes
+courtes arrivées presque en même temps sont regroupées en lots pour le moteur
+en processus, dont un lot forme un seul passage du modèle, chaque requête gardant
+son propre état (voir DenoiseBackend.denoise_batch) ; avec l'exécutable
+`deep-filter`, chaque requête est traitée seule. Les requêtes longues sont traitées
+seules, par fichier, comme dans l'interface.
+
+Points d'accès :
+    POST /denoise   corps : fichier audio/vidéo (envoi), ou JSON {"path": ..., "output": ...}
+                    (chemins sous les dossiers --root seulement, refusé sans --root)
+                    réglages en paramètres : pf_beta, atten_lim_db, postfilter, skip_silence,
+                    keep_channels, format (extension de l'envoi, défaut wav).
+                    Réponse : le WAV débruité, envoyé par blocs ; en JSON si "output" est donné.
+    GET  /health    état du service et moteur chargé
+    GET  /queue     requêtes en attente de lot et en cours
+    GET  /latency   latences récentes (centiles) et taille des lots
+
+Exemple :
+    python server.py --port 8765
+    curl --data-binary @voix.wav -H "Content-Type: audio/wav" "http://127.0.0.1:8765/denoise?atten_lim_db=24" -o propre.wav
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import shutil
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import metrics
+from deepfilter_interface import DEFAULT_OPTIONS, SAMPLE_RATE, get_backend, process_audio
+from utils import convert_to_wav, encode_wav_file
+from wavio import read_wav, read_wav_info, write_wav
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Taille maximale d'un lot, et attente maximale de la première requête d'un lot
+MAX_BATCH = 8
+BATCH_WINDOW_SECONDS = 0.02
+# Au-delà de cette durée, une requête est traitée seule, par fichier
+MAX_BATCH_SECONDS = 20.0
+# Nombre de requêtes récentes retenues pour les centiles de latence
+LATENCY_HISTORY = 1000
+# Taille des blocs lus et envoyés
+STREAM_CHUNK = 1 << 16
+
+
+def _parse_flag(value):
+    return value.lower() not in ('0', 'false', 'no', 'non')
+
+
+# Réglages acceptés en paramètres de requête -> conversion
+_OPTION_PARSERS = {
+    'pf_beta': float,
+    'atten_lim_db': float,
+    'postfilter': _parse_flag,
+    'skip_silence': _parse_flag,
+}
+_CONTENT_EXTENSIONS = {
+    'audio/wav': 'wav', 'audio/x-wav': 'wav', 'audio/wave': 'wav', 'audio/mpeg': 'mp3',
+    'audio/flac': 'flac', 'audio/ogg': 'ogg', 'audio/mp4': 'm4a', 'video/mp4': 'mp4',
+}
+
+
+class Batcher:
+    """
+    File d'attente des requêtes courtes. Les requêtes de mêmes options sont regroupées :
+    un lot part dès qu'il compte `max_batch` signaux, ou quand sa plus ancienne requête
+    a attendu `window` secondes. `workers` fils traitent les lots.
+    """
+
+    def __init__(self, backend='auto', max_batch=MAX_BATCH, window=BATCH_WINDOW_SECONDS, workers=1, stats=None):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.window = window
+        self.stats = stats
+        self._pending = collections.OrderedDict()  # clé d'options -> [(signal, options, future, arrivée)]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f'batcher-{index}', daemon=True)
+                         for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def depth(self):
+        with self._condition:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def submit(self, samples, options):
+        """Ajoute un signal (float32, SAMPLE_RATE) ; retourne un Future du signal débruité."""
+        options = dict(DEFAULT_OPTIONS, **options)
+        key = tuple(sorted(options.items()))
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Service arrêté")
+            self._pending.setdefault(key, []).append((samples, options, future, time.perf_counter()))
+            self._condition.notify_all()
+        return future
+
+    def _take(self):
+        """Attend puis retire le prochain lot ; None à l'arrêt."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                # Lot dont la première requête est la plus ancienne
+                key = min(self._pending, key=lambda key: self._pending[key][0][3])
+                queue = self._pending[key]
+                remaining = queue[0][3] + self.window - time.perf_counter()
+                if len(queue) < self.max_batch and remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                batch, rest = queue[:self.max_batch], queue[self.max_batch:]
+                if rest:
+                    self._pending[key] = rest
+                else:
+                    del self._pending[key]
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            start_time = time.perf_counter()
+            try:
+                engine = get_backend(self.backend, batch[0][1])
+                with metrics.span('serve_batch', backend=engine.name):
+                    cleaned = engine.denoise_batch([samples for samples, _, _, _ in batch], SAMPLE_RATE)
+            except Exception as e:
+                logger.error("Échec d'un lot de %s requêtes: %s", len(batch), e)
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            metrics.count('serve_batched_requests', len(batch))
+            if self.stats is not None:
+                self.stats.record_batch(len(batch), [start_time - queued for _, _, _, queued in batch])
+            for (_, _, future, _), samples in zip(batch, cleaned):
+                future.set_result((samples, len(batch)))
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            pending = [item for queue in self._pending.values() for item in queue]
+            self._pending.clear()
+            self._condition.notify_all()
+        for _, _, future, _ in pending:
+            future.set_exception(RuntimeError("Service arrêté"))
+        for thread in self._threads:
+            thread.join()
+
+
+class ServiceStats:
+    """Compteurs du service et latences des LATENCY_HISTORY dernières requêtes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_HISTORY)
+        self._waits = collections.deque(maxlen=LATENCY_HISTORY)
+        self._batch_sizes = collections.deque(maxlen=LATENCY_HISTORY)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.batches = 0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, latency, audio_seconds, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if error:
+                self.errors += 1
+            else:
+                self._latencies.append((latency, audio_seconds))
+
+    def record_batch(self, size, waits):
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(size)
+            self._waits.extend(waits)
+
+    def latency(self):
+        with self._lock:
+            latencies = np.array([latency for latency, _ in self._latencies], dtype=np.float64)
+            audio = sum(seconds for _, seconds in self._latencies)
+            waits = np.array(self._waits, dtype=np.float64)
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+        return {
+            'window': len(latencies),
+            'latency': _summary(latencies),
+            'queue_wait': _summary(waits),
+            'rtf': float(latencies.sum() / audio) if audio else None,
+            'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+        }
+
+
+def _summary(values):
+    """Moyenne, centiles et maximum (secondes) d'une série de durées."""
+    if not len(values):
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'mean': float(values.mean()), 'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+            'max': float(values.max())}
+
+
+class DenoiseService:
+    """Moteur chaud, file de lots et statistiques, partagés par toutes les connexions."""
+
+    def __init__(self, backend='auto', options=None, max_batch=MAX_BATCH, window=BATCH_WINDOW_SECONDS,
+                 max_batch_seconds=MAX_BATCH_SECONDS, workers=None, temp_dir=None, roots=()):
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+        self.max_batch_seconds = max_batch_seconds
+        self.temp_dir = temp_dir
+        # Dossiers où les requêtes JSON peuvent lire et écrire ; aucun : mode JSON refusé
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.start_time = time.time()
+        # Chargement au démarrage : la première requête ne paie pas l'initialisation
+        engine = get_backend(backend, self.options)
+        self.backend = engine.name
+        # Le modèle en processus traite un lot à la fois ; l'exécutable gagne à en lancer plusieurs
+        workers = workers or ((os.cpu_count() or 1) if engine.parallel_channels else 1)
+        if not engine.batches:
+            max_batch, window = 1, 0.0  # Lot d'une requête : rien à attendre
+        self.stats = ServiceStats()
+        self.batcher = Batcher(self.backend, max_batch, window, workers, self.stats)
+
+    def parse_options(self, query):
+        """Réglages de la requête (paramètres d'URL) ajoutés aux réglages du service ; lève ValueError."""
+        options = dict(self.options)
+        for name, values in parse_qs(query).items():
+            if name in _OPTION_PARSERS:
+                options[name] = _OPTION_PARSERS[name](values[-1])
+            elif name not in ('format', 'keep_channels'):
+                raise ValueError(f"Paramètre inconnu: {name}")
+        return options
+
+    def resolve_path(self, path):
+        """
+        Chemin réel de `path` (liens suivis) s'il se trouve sous l'un des dossiers autorisés ;
+        lève PermissionError sinon.
+        """
+        if not self.roots:
+            raise PermissionError("Chemins locaux désactivés (lancer le service avec --root)")
+        if not isinstance(path, str) or not path:
+            raise PermissionError(f"Chemin invalide: {path!r}")
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([root, real]) == root for root in self.roots):
+            raise PermissionError(f"Chemin hors des dossiers autorisés: {path}")
+        return real
+
+    def denoise(self, input_path, work_dir, options, keep_channels=False):
+        """
+        Débruite un fichier audio/vidéo vers un WAV 48 kHz de `work_dir`. Les fichiers courts
+        passent par la file de lots, les autres par process_audio.
+        Retourne (chemin du WAV, {'duration', 'batch_size', 'latency'}).
+        """
+        start_time = time.perf_counter()
+        duration = 0.0
+        self.stats.begin()
+        try:
+            wav_file = convert_to_wav(input_path, os.path.join(work_dir, 'input'), keep_channels=keep_channels)
+            channels, sample_rate, frames = read_wav_info(wav_file)
+            duration = frames / float(sample_rate)
+            output_dir = os.path.join(work_dir, 'output')
+            os.makedirs(output_dir)
+            output_file = os.path.join(output_dir, os.path.basename(wav_file))
+            if duration <= self.max_batch_seconds and not options.get('skip_silence'):
+                samples, _ = read_wav(wav_file)
+                cleaned, batch_size = self.batcher.submit(samples, options).result()
+                write_wav(output_file, cleaned, sample_rate)
+                metrics.count('serve_requests', mode='batch')
+            else:
+                process_audio(wav_file, output_dir, options, backend=self.backend)
+                batch_size = 1
+                metrics.count('serve_requests', mode='file')
+        except BaseException:
+            self.stats.end(time.perf_counter() - start_time, duration, error=True)
+            raise
+        latency = time.perf_counter() - start_time
+        self.stats.end(latency, duration)
+        return output_file, {'duration': duration, 'batch_size': batch_size, 'latency': latency}
+
+    def health(self):
+        return {'status': 'ok', 'backend': self.backend, 'uptime': time.time() - self.start_time,
+                'options': self.options}
+
+    def queue(self):
+        stats = self.stats
+        return {'depth': self.batcher.depth, 'in_flight': stats.in_flight, 'requests': stats.requests,
+                'errors': stats.errors, 'batches': stats.batches}
+
+    def close(self):
+        self.batcher.close()
+
+
+class DenoiseRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'DeepFilterNetGui'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Socket Unix : pas d'adresse (client_address vide)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        routes = {'/health': self.service.health, '/queue': self.service.queue, '/latency': self.service.stats.latency}
+        route = routes.get(urlsplit(self.path).path)
+        if route is None:
+            self.send_json({'error': "Point d'accès inconnu"}, 404)
+        else:
+            self.send_json(route())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        if url.path != '/denoise':
+            self.rfile.read(length)
+            self.send_json({'error': "Point d'accès inconnu"}, 404)
+            return
+        try:
+            options = self.service.parse_options(url.query)
+        except ValueError as e:
+            self.rfile.read(length)
+            self.send_json({'error': str(e)}, 400)
+            return
+        query = parse_qs(url.query)
+        keep_channels = _parse_flag(query.get('keep_channels', ['0'])[-1])
+
+        with tempfile.TemporaryDirectory(prefix='deepfilter_serve_', dir=self.service.temp_dir) as work_dir:
+            output = None
+            content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type == 'application/json':
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                    input_path, output = payload['path'], payload.get('output')
+                except (ValueError, KeyError, TypeError):
+                    self.send_json({'error': 'JSON attendu: {"path": ..., "output": ...}'}, 400)
+                    return
+                try:
+                    input_path = self.service.resolve_path(input_path)
+                    if output is not None:
+                        output = self.service.resolve_path(output)
+                except PermissionError as e:
+                    self.send_json({'error': str(e)}, 403)
+                    return
+                if not os.path.isfile(input_path):
+                    self.send_json({'error': f"Fichier introuvable: {input_path}"}, 404)
+                    return
+            else:
+                extension = query.get('format', [_CONTENT_EXTENSIONS.get(content_type, 'wav')])[-1].lstrip('.')
+                input_path = os.path.join(work_dir, f"upload.{extension}")
+                with open(input_path, 'wb') as upload:
+                    remaining = length
+                    while remaining > 0:
+                        chunk = self.rfile.read(min(STREAM_CHUNK, remaining))
+                        if not chunk:
+                            break
+                        upload.write(chunk)
+                        remaining -= len(chunk)
+
+            try:
+                output_file, info = self.service.denoise(input_path, work_dir, options, keep_channels)
+                if output:
+                    format = os.path.splitext(output)[1].lower().lstrip('.') or 'wav'
+                    if format == 'wav':
+                        shutil.move(output_file, output)
+                    else:
+                        encode_wav_file(output_file, output, format)
+            except Exception as e:
+                logger.error("Échec de la requête %s: %s", self.path, e)
+                self.send_json({'error': str(e)}, 500)
+                return
+
+            if output:
+                self.send_json(dict(info, output=output))
+                return
+            # Envoi par blocs : le résultat n'est jamais chargé entier en mémoire
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/wav')
+            self.send_header('Content-Length', str(os.path.getsize(output_file)))
+            self.send_header('X-Audio-Seconds', f"{info['duration']:.3f}")
+            self.send_header('X-Latency-Seconds', f"{info['latency']:.4f}")
+            self.send_header('X-Batch-Size', str(info['batch_size']))
+            self.end_headers()
+            with open(output_file, 'rb') as result:
+                shutil.copyfileobj(result, self.wfile, STREAM_CHUNK)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+    """Serveur HTTP multi-fils sur TCP, ou sur le socket Unix `unix_socket`."""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixHTTPServer(unix_socket, DenoiseRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), DenoiseRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service local de débruitage DeepFilterNet")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Adresse d'écoute (défaut: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port d'écoute (défaut: %(default)s)")
+    parser.add_argument('--unix-socket', help="Écouter sur ce socket Unix plutôt qu'en TCP")
+    parser.add_argument('--backend', default='auto', help="Moteur: auto, inprocess ou subprocess")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="Requêtes par lot au plus")
+    parser.add_argument('--batch-window-ms', type=float, default=BATCH_WINDOW_SECONDS * 1000,
+                        help="Attente maximale pour compléter un lot (ms)")
+    parser.add_argument('--max-batch-seconds', type=float, default=MAX_BATCH_SECONDS,
+                        help="Durée au-delà de laquelle une requête est traitée seule (s)")
+    parser.add_argument('--batch-workers', type=int,
+                        help="Lots traités simultanément (défaut: 1 en processus, nombre de cœurs sinon)")
+    parser.add_argument('--temp-dir', help="Dossier des fichiers intermédiaires")
+    parser.add_argument('--root', action='append', default=[],
+                        help="Dossier où les requêtes JSON peuvent lire et écrire (répétable) ; "
+                             "sans --root, seuls les envois de fichiers sont acceptés")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.setup_logging()
+    metrics.configure()
+    service = DenoiseService(args.backend, max_batch=args.max_batch, window=args.batch_window_ms / 1000.0,
+                             max_batch_seconds=args.max_batch_seconds, workers=args.batch_workers,
+                             temp_dir=args.temp_dir, roots=args.root)
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    # serve_forever ne s'arrête que depuis un autre fil
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logger.info("Service de débruitage (%s) à l'écoute sur %s", service.backend,
+                args.unix_socket or f"http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
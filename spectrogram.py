@@ -0,0 +1,320 @@
+"""
+Pyramide multi-résolution de spectrogrammes.
+
+Le spectrogramme (magnitudes en dB) est calculé une seule fois par contenu audio,
+par tuiles de `tile_frames` trames pour borner la mémoire, à pleine résolution
+(niveau 0). Chaque niveau suivant divise par deux la résolution temporelle
+(maximum de paires de trames). Les niveaux sont stockés en memmap float16 dans
+un dossier de cache ; l'affichage demande une fenêtre de temps et reçoit le
+niveau le plus fin qui tient dans la largeur disponible. Le cache est borné en
+taille : au-delà de `max_bytes`, les pyramides les moins récemment affichées sont
+supprimées (voir evict).
+
+Pour l'écran, `columns` échantillonne une colonne de magnitudes par pixel et
+`to_argb` les convertit en pixels par une table de couleurs précalculée.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+from wavio import SampleView
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('DEEPFILTER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'deepfiltergui')),
+    'spectrograms'
+)
+DEFAULT_MAX_BYTES = 1024 ** 3
+TOP_DB = 80.0
+# Trames hachées par bloc (4 Mo en float32 mono)
+DIGEST_BLOCK_FRAMES = 1 << 20
+
+# Palette « magma » de matplotlib échantillonnée en 17 points (RVB), interpolée dans colormap_lut
+MAGMA = (
+    (0, 0, 4), (10, 8, 34), (29, 17, 71), (54, 16, 107), (81, 18, 124), (106, 28, 129),
+    (131, 38, 129), (156, 46, 127), (183, 55, 121), (208, 65, 111), (231, 82, 99), (245, 107, 92),
+    (252, 137, 97), (254, 167, 114), (254, 196, 136), (253, 226, 163), (252, 253, 191),
+)
+LUT_SIZE = 256
+
+
+class Cancelled(Exception):
+    """Calcul interrompu via l'événement `cancel`."""
+
+
+def audio_digest(samples, sample_rate, n_fft, hop_length):
+    """Identifiant de contenu + paramètres d'analyse, par blocs (sans copie d'un tableau contigu)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{sample_rate}:{n_fft}:{hop_length}:{tuple(samples.shape)}".encode())
+    for start in range(0, len(samples), DIGEST_BLOCK_FRAMES):
+        block = np.ascontiguousarray(samples[start:start + DIGEST_BLOCK_FRAMES], dtype=np.float32)
+        digest.update(memoryview(block).cast('B'))
+    return digest.hexdigest()
+
+
+class SpectrogramPyramid:
+    """Niveaux de spectrogramme en memmap : level(k) a la forme (trames, bins)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.sample_rate = meta['sample_rate']
+        self.n_fft = meta['n_fft']
+        self.hop_length = meta['hop_length']
+        self.max_db = meta['max_db']
+        self.duration = meta['duration']
+        self.levels = [np.load(os.path.join(directory, f"level{k}.npy"), mmap_mode='r')
+                       for k in range(meta['levels'])]
+
+    @property
+    def max_frequency(self):
+        return self.sample_rate / 2.0
+
+    def frame_duration(self, level):
+        return self.hop_length * (1 << level) / float(self.sample_rate)
+
+    def choose_level(self, start, end, max_columns):
+        """Niveau le plus fin dont le nombre de trames sur [start, end] ne dépasse pas max_columns."""
+        for level in range(len(self.levels)):
+            if (end - start) / self.frame_duration(level) <= max_columns:
+                return level
+        return len(self.levels) - 1
+
+    def view(self, start=0.0, end=None, max_columns=2048):
+        """
+        Magnitudes en dB relatifs au maximum global (bins, trames), bornées à -TOP_DB,
+        pour la fenêtre [start, end]. Retourne (image, (début, fin) réels).
+        """
+        end = self.duration if end is None else end
+        level = self.choose_level(start, end, max_columns)
+        frames = self.levels[level]
+        step = self.frame_duration(level)
+        first = max(0, int(start / step))
+        last = min(len(frames), int(np.ceil(end / step)) + 1)
+        image = np.asarray(frames[first:last], dtype=np.float32).T - self.max_db
+        np.maximum(image, -TOP_DB, out=image)
+        return image, (first * step, last * step)
+
+    def columns(self, start, seconds_per_column, count, rows):
+        """
+        Image (rows, count) en dB relatifs au maximum global, bornée à -TOP_DB : la colonne c
+        montre l'instant start + (c + 0.5) * seconds_per_column, la ligne 0 la fréquence la plus
+        haute. Le niveau ne dépend que de seconds_per_column : des colonnes calculées séparément
+        (défilement) se raccordent exactement.
+        """
+        level = self.choose_level(0.0, seconds_per_column, 1)
+        frames = self.levels[level]
+        times = start + (np.arange(count) + 0.5) * seconds_per_column
+        index = np.floor(times / self.frame_duration(level)).astype(np.intp)
+        inside = (times >= 0) & (times < self.duration) & (index < len(frames))
+        image = np.full((rows, count), -TOP_DB, dtype=np.float32)
+        if not inside.any() or not rows:
+            return image
+        first, last = index[inside].min(), index[inside].max() + 1
+        bins = frames.shape[1]
+        row_bins = ((rows - np.arange(rows) - 0.5) * bins / rows).astype(np.intp)
+        block = np.asarray(frames[first:last], dtype=np.float32)
+        image[:, inside] = block[index[inside] - first][:, row_bins].T - self.max_db
+        np.maximum(image, -TOP_DB, out=image)
+        return image
+
+
+@lru_cache(maxsize=8)
+def colormap_lut(anchors=MAGMA, size=LUT_SIZE):
+    """Table de `size` couleurs 0xFFRRGGBB (format QImage RGB32) interpolées entre les `anchors` RVB."""
+    anchors = np.asarray(anchors, dtype=np.float64)
+    position = np.linspace(0.0, len(anchors) - 1, size)
+    rgb = np.stack([np.interp(position, np.arange(len(anchors)), anchors[:, channel]) for channel in range(3)], axis=1)
+    rgb = rgb.round().astype(np.uint32)
+    return 0xFF000000 | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+def to_argb(image, lut=None, top_db=TOP_DB):
+    """Magnitudes en dB ([-top_db, 0]) -> pixels 0xFFRRGGBB, par indexation de la table `lut`."""
+    lut = colormap_lut() if lut is None else lut
+    index = ((image + top_db) * ((len(lut) - 1) / top_db)).astype(np.intp)
+    return lut.take(index, mode='clip')
+
+
+def _stft_db(samples, first, count, n_fft, hop_length, window):
+    """Trames centrées [first, first + count) en dB (trames, bins)."""
+    start = first * hop_length - n_fft // 2
+    stop = (first + count - 1) * hop_length - n_fft // 2 + n_fft
+    segment = np.zeros(stop - start, dtype=np.float32)
+    lo, hi = max(start, 0), min(stop, len(samples))
+    if hi > lo:
+        segment[lo - start:hi - start] = samples[lo:hi]
+    frames = np.lib.stride_tricks.sliding_window_view(segment, n_fft)[::hop_length][:count]
+    magnitude = np.abs(np.fft.rfft(frames * window, axis=1))
+    return 20.0 * np.log10(np.maximum(magnitude, 1e-10))
+
+
+def build_pyramid(samples, sample_rate, n_fft=2048, hop_length=512, tile_frames=1024,
+                  cache_dir=DEFAULT_CACHE_DIR, cancel=None, progress=None, max_bytes=DEFAULT_MAX_BYTES, keep=()):
+    """
+    Construit (ou relit depuis le cache) la pyramide d'un signal mono.
+    `samples` peut être une vue paresseuse d'un WAV projeté (wavio.SampleView) :
+    seules les tuiles en cours de calcul sont alors converties en mémoire.
+    `cancel` : threading.Event optionnel ; `progress(fraction)` appelé par tuile.
+    Une pyramide calculée est ajoutée au cache, puis le budget `max_bytes` appliqué
+    (les pyramides des dossiers `keep`, encore affichées, sont gardées).
+    """
+    if not isinstance(samples, SampleView):
+        samples = np.asarray(samples, dtype=np.float32)
+    directory = os.path.join(cache_dir, audio_digest(samples, sample_rate, n_fft, hop_length))
+    meta_path = os.path.join(directory, 'meta.json')
+    if os.path.exists(meta_path):
+        logger.debug("Spectrogramme trouvé dans le cache: %s", directory)
+        metrics.count('spectrogram_cache_hits')
+        try:
+            os.utime(meta_path)  # Date de dernier accès, pour l'éviction LRU
+            return SpectrogramPyramid(directory)
+        except FileNotFoundError:
+            # Évincée entre-temps par un autre processus : recalculée
+            shutil.rmtree(directory, ignore_errors=True)
+
+    with metrics.span('spectrogram'):
+        _compute_pyramid(samples, sample_rate, n_fft, hop_length, tile_frames, directory, cancel, progress)
+    metrics.count('spectrogram_seconds', len(samples) / float(sample_rate))
+    pyramid = SpectrogramPyramid(directory)
+    evict(cache_dir, max_bytes, keep=(directory,) + tuple(keep))
+    return pyramid
+
+
+def _cache_entries(cache_dir):
+    """Pyramides du cache : [(dernier accès, taille en octets, dossier)], calculs en cours exclus."""
+    entries = []
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return entries
+    for name in names:
+        directory = os.path.join(cache_dir, name)
+        if name.endswith('.partial') or not os.path.isdir(directory):
+            continue
+        try:
+            files = [os.path.join(directory, file) for file in os.listdir(directory)]
+            size = sum(os.path.getsize(path) for path in files)
+            meta_path = os.path.join(directory, 'meta.json')
+            # Sans meta.json (éviction interrompue) : supprimée en premier
+            last_access = os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0.0
+        except FileNotFoundError:
+            continue  # Supprimée pendant le parcours
+        entries.append((last_access, size, directory))
+    return entries
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, keep=()):
+    """
+    Supprime les pyramides les moins récemment utilisées jusqu'à respecter max_bytes,
+    sauf celles des dossiers `keep` (affichées). Retourne le nombre de pyramides supprimées.
+    """
+    entries = sorted(_cache_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    keep = {os.path.normcase(os.path.abspath(directory)) for directory in keep}
+    removed = 0
+    for _, size, directory in entries:
+        if total <= max_bytes:
+            break
+        if os.path.normcase(os.path.abspath(directory)) in keep:
+            continue
+        # meta.json d'abord : la pyramide n'est plus servie, même si des niveaux encore
+        # projetés ailleurs ne peuvent pas être supprimés tout de suite (Windows)
+        try:
+            os.remove(os.path.join(directory, 'meta.json'))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug("Pyramide %s non évincée: %s", directory, e)
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
+        removed += 1
+    if removed:
+        logger.debug("Cache des spectrogrammes: %s pyramides évincées", removed)
+        metrics.count('spectrogram_cache_evictions', removed)
+    return removed
+
+
+def cache_stats(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Occupation du cache des pyramides."""
+    entries = _cache_entries(cache_dir)
+    return {'entries': len(entries), 'size_bytes': sum(size for _, size, _ in entries), 'max_bytes': max_bytes}
+
+
+def _compute_pyramid(samples, sample_rate, n_fft, hop_length, tile_frames, directory, cancel, progress):
+    """Calcule les niveaux dans un dossier partiel, renommé en `directory` une fois complet."""
+    partial = f"{directory}.{os.getpid()}.{threading.get_ident()}.partial"
+    os.makedirs(partial, exist_ok=True)
+    try:
+        n_frames = max(1, 1 + len(samples) // hop_length)
+        bins = n_fft // 2 + 1
+        window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)  # Hann périodique
+
+        # Niveau 0, tuile par tuile
+        level = np.lib.format.open_memmap(os.path.join(partial, 'level0.npy'), mode='w+',
+                                          dtype=np.float16, shape=(n_frames, bins))
+        max_db = -200.0
+        for first in range(0, n_frames, tile_frames):
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            count = min(tile_frames, n_frames - first)
+            tile = _stft_db(samples, first, count, n_fft, hop_length, window)
+            max_db = max(max_db, float(tile.max()))
+            level[first:first + count] = tile
+            if progress:
+                progress((first + count) / n_frames)
+        level.flush()
+
+        # Niveaux grossiers : maximum des paires de trames, jusqu'à tenir dans une tuile
+        levels = 1
+        while len(level) > tile_frames:
+            coarse = np.lib.format.open_memmap(os.path.join(partial, f"level{levels}.npy"), mode='w+',
+                                               dtype=np.float16, shape=((len(level) + 1) // 2, bins))
+            for first in range(0, len(level), 2 * tile_frames):
+                block = np.asarray(level[first:first + 2 * tile_frames])
+                if len(block) % 2:
+                    block = np.concatenate([block, block[-1:]])
+                coarse[first // 2:first // 2 + len(block) // 2] = np.maximum(block[0::2], block[1::2])
+            coarse.flush()
+            level = coarse
+            levels += 1
+        # Libérer les memmaps avant de renommer le dossier (indispensable sous Windows)
+        del level
+        coarse = None
+
+        with open(os.path.join(partial, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'sample_rate': sample_rate, 'n_fft': n_fft, 'hop_length': hop_length,
+                       'max_db': max_db, 'duration': len(samples) / float(sample_rate),
+                       'levels': levels}, f)
+        try:
+            os.replace(partial, directory)
+        except OSError:
+            # Calculé en parallèle par un autre processus : on garde sa version
+            shutil.rmtree(partial, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Occupation et maintenance du cache des spectrogrammes")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="Budget du cache (Mo) ; les pyramides les moins récemment utilisées au-delà sont supprimées")
+    parser.add_argument('--clear', action='store_true', help="Vider le cache")
+    args = parser.parse_args()
+    max_bytes = 0 if args.clear else int(args.max_mb * 1024 ** 2)
+    evict(args.cache_dir, max_bytes)
+    print(json.dumps(cache_stats(args.cache_dir, max_bytes), indent=2))
@@ -0,0 +1,248 @@
+"""
+Débruitage en flux pour les enregistrements très longs.
+
+Le fichier est décodé et rééchantillonné par ffmpeg dans un tube, débruité par
+blocs de taille fixe qui se chevauchent, puis ré-encodé au fil de l'eau par un
+second ffmpeg. La mémoire utilisée ne dépend que de la taille des blocs, pas de
+la durée du fichier, et la sortie est écrite au fur et à mesure.
+
+Pour une vidéo (stream_video), le second ffmpeg relit la piste vidéo d'origine
+et la multiplexe avec l'audio débruité reçu par le tube : extraction, débruitage
+et reconstruction se font en une seule passe, sans fichier intermédiaire.
+"""
+import logging
+import os
+import queue
+import subprocess
+import threading
+
+import numpy as np
+from pydub import AudioSegment
+
+import metrics
+from deepfilter_interface import SAMPLE_RATE, ProgressReporter, denoise_chunks, get_backend
+from probe import probe_media
+from utils import can_stream_copy, video_codecs_for_format
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_SAMPLE = 4  # float32
+# Blocs décodés d'avance pendant le débruitage du bloc courant (mémoire bornée)
+PREFETCH_CHUNKS = 2
+
+
+class EncoderError(Exception):
+    """Échec de l'encodeur ou du multiplexeur de sortie (ffmpeg)."""
+
+
+def read_chunks(input_path, chunk_size, sample_rate=SAMPLE_RATE, align=False):
+    """
+    Décode un fichier en blocs mono float32 de `chunk_size` échantillons (le dernier peut être plus court).
+    Avec `align`, l'audio est recalé sur les horodatages du conteneur : le premier échantillon
+    correspond au temps 0 et les trous sont comblés par du silence (synchronisation avec la vidéo).
+    """
+    command = [AudioSegment.converter, "-v", "error", "-nostdin", "-i", input_path, "-vn"]
+    if align:
+        command += ["-af", "aresample=async=1:first_pts=0"]
+    command += ["-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            raw = process.stdout.read(chunk_size * BYTES_PER_SAMPLE)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) - len(raw) % BYTES_PER_SAMPLE], dtype='<f4')
+        process.stdout.close()
+        error = process.stderr.read().decode(errors='replace')
+        if process.wait() != 0:
+            raise Exception(f"Échec du décodage de {input_path}: {error.strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def prefetch(chunks, size=PREFETCH_CHUNKS):
+    """
+    Itère sur `chunks` depuis un fil dédié, avec au plus `size` blocs d'avance :
+    le décodage du bloc suivant se fait pendant le traitement du bloc courant.
+    Les exceptions du décodeur sont relancées chez le consommateur.
+    """
+    pending = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    break
+            else:
+                put((done, None))
+        except Exception as e:
+            put((done, e))
+        finally:
+            chunks.close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk, error = pending.get()
+            if chunk is done:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+class StreamWriter:
+    """
+    Encode des blocs float32 mono vers un fichier via ffmpeg (format déduit de l'extension).
+    Avec `video_path`, la piste vidéo de ce fichier est multiplexée avec l'audio reçu :
+    copiée telle quelle (`copy_video`) ou ré-encodée. Le conteneur est alors déduit de
+    l'extension et `format` ne sert qu'au choix des codecs (voir video_codecs_for_format).
+    """
+
+    def __init__(self, output_path, sample_rate=SAMPLE_RATE, format=None, video_path=None, copy_video=True):
+        command = [AudioSegment.converter, "-v", "error", "-nostdin", "-y"]
+        if video_path:
+            command += ["-i", video_path]
+        command += ["-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-i", "-"]
+        if video_path:
+            video_codec, audio_codec = video_codecs_for_format(format or os.path.splitext(output_path)[1][1:].lower())
+            command += ["-map", "0:v:0", "-map", "1:a:0",
+                        "-c:v", "copy" if copy_video else video_codec, "-c:a", audio_codec]
+        elif format:
+            command += ["-f", format]
+        command.append(output_path)
+        logger.debug("Commande d'encodage en flux: %s", ' '.join(command))
+        self.output_path = output_path
+        self.samples_written = 0
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, samples):
+        if len(samples):
+            try:
+                self._process.stdin.write(np.ascontiguousarray(samples, dtype='<f4').tobytes())
+            except BrokenPipeError:
+                # ffmpeg s'est arrêté : son message d'erreur est plus parlant que le tube rompu
+                self.close()
+                raise EncoderError(f"Échec de l'encodage de {self.output_path}: arrêt prématuré de ffmpeg")
+            self.samples_written += len(samples)
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        error = self._process.stderr.read().decode(errors='replace')
+        if self._process.wait() != 0:
+            self._discard()
+            raise EncoderError(f"Échec de l'encodage de {self.output_path}: {error.strip()}")
+
+    def abort(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._discard()
+
+    def _discard(self):
+        """Supprime une sortie incomplète (un passage en ré-encodage peut suivre)."""
+        if os.path.exists(self.output_path):
+            os.unlink(self.output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def probe_duration(input_path):
+    """Durée annoncée par le conteneur (None si inconnue)."""
+    try:
+        return probe_media(input_path)['duration']
+    except Exception:
+        return None
+
+
+def stream_denoise(input_path, output_path, options=None, chunk_seconds=10.0, overlap_seconds=0.5,
+                   backend='auto', format=None, progress=None, total_seconds=None, video=None):
+    """
+    Débruite `input_path` vers `output_path` en flux, à mémoire bornée.
+    `progress(rapport)` est appelé après chaque bloc (voir ProgressReporter) ;
+    sans `total_seconds`, la durée est lue dans les métadonnées du fichier.
+    Avec `video` ('remux' ou 'reencode'), `output_path` est une vidéo : la piste vidéo
+    de `input_path` y est copiée ou ré-encodée, avec l'audio débruité recalé sur le
+    temps 0 du conteneur (voir read_chunks et StreamWriter).
+    Retourne la durée audio traitée (s).
+    """
+    chunk_size = int(chunk_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("Le chevauchement doit être plus court que les blocs")
+
+    engine = get_backend(backend, options)
+    logger.debug("Débruitage en flux: %s -> %s (blocs %ss, chevauchement %ss, moteur %s, vidéo %s)",
+                 input_path, output_path, chunk_seconds, overlap_seconds, engine.name, video)
+
+    reporter = None
+    if progress is not None:
+        if total_seconds is None:
+            total_seconds = probe_duration(input_path)
+        reporter = ProgressReporter(total_seconds, progress)
+
+    writer_options = {'video_path': input_path, 'copy_video': video == 'remux'} if video else {}
+    with metrics.span('denoise_stream', backend=engine.name), \
+            StreamWriter(output_path, SAMPLE_RATE, format, **writer_options) as writer:
+        chunks = prefetch(read_chunks(input_path, chunk_size, align=bool(video)))
+        for cleaned in denoise_chunks(chunks, lambda block: engine.denoise(block, SAMPLE_RATE), overlap):
+            writer.write(cleaned)
+            if reporter is not None:
+                reporter.update(writer.samples_written / SAMPLE_RATE)
+
+    metrics.count('denoised_seconds', writer.samples_written / SAMPLE_RATE, backend=engine.name)
+    logger.debug("Débruitage en flux terminé: %.1fs", writer.samples_written / SAMPLE_RATE)
+    return writer.samples_written / SAMPLE_RATE
+
+
+def stream_video(input_path, output_path, options=None, chunk_seconds=10.0, overlap_seconds=0.5,
+                 backend='auto', format=None, progress=None, mode='auto'):
+    """
+    Débruite la piste audio d'une vidéo et reconstruit la vidéo en une seule passe :
+    décodage, débruitage et multiplexage communiquent par tubes, sans WAV intermédiaire.
+    `mode` comme pour utils.reconstruct_video_from_audio_and_video : 'auto' copie le flux
+    vidéo si le conteneur cible l'accepte et recommence en ré-encodant si le multiplexeur
+    échoue ; 'remux' impose la copie, 'reencode' le ré-encodage.
+    Retourne {'mode': 'remux' | 'reencode', 'audio_duration': durée traitée (s)}.
+    """
+    format = format or os.path.splitext(output_path)[1][1:].lower()
+
+    def run(video):
+        return stream_denoise(input_path, output_path, options, chunk_seconds, overlap_seconds,
+                              backend, format, progress, video=video)
+
+    if mode == 'remux' or (mode == 'auto' and can_stream_copy(input_path, format)):
+        try:
+            return {'mode': 'remux', 'audio_duration': run('remux')}
+        except EncoderError as e:
+            if mode == 'remux':
+                raise
+            logger.debug("Copie de flux impossible, nouvelle passe avec ré-encodage: %s", e)
+    return {'mode': 'reencode', 'audio_duration': run('reencode')}
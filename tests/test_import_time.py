@@ -0,0 +1,65 @@
+"""
+Budget de temps de démarrage : l'import de `main` doit rester sous IMPORT_BUDGET_MS et
+ne charger aucun module lourd prévu pour un chargement différé.
+
+L'import est mesuré dans des processus neufs (`python -X importtime`), le meilleur essai
+étant retenu. Sans PyQt6.QtMultimedia chargeable (par exemple sans libpulse), `main` ne
+peut pas être importé : le test est ignoré.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 500.0
+RUNS = 3
+
+# Modules qui ne doivent être chargés qu'à leur première utilisation (ou en arrière-plan)
+DEFERRED_MODULES = ['matplotlib', 'moviepy', 'scipy', 'torch', 'df', 'sounddevice']
+
+
+def measure(module):
+    """Un import dans un processus neuf : (durée cumulée en ms, {module: durée propre en ms}, modules différés chargés)."""
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr.strip().splitlines()[-1:]
+
+    total = None
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us) / 1e3
+        # Le module demandé apparaît sans indentation, en dernier
+        if name.rstrip() == f" {module}":
+            total = int(cumulative_us) / 1e3
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return total, self_times, loaded
+
+
+@pytest.fixture(scope='module')
+def main_import():
+    probe = subprocess.run([sys.executable, "-c", "import PyQt6.QtMultimedia"], capture_output=True, text=True)
+    if probe.returncode != 0:
+        pytest.skip(f"PyQt6.QtMultimedia non chargeable: {probe.stderr.strip().splitlines()[-1:]}")
+    return min((measure('main') for _ in range(RUNS)), key=lambda run: run[0])
+
+
+def test_main_import_within_budget(main_import):
+    total, self_times, _ = main_import
+    slowest = sorted(self_times.items(), key=lambda item: -item[1])[:10]
+    assert total <= IMPORT_BUDGET_MS, (
+        f"Import de main: {total:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms) ; les plus coûteux: "
+        + ", ".join(f"{name} {ms:.1f} ms" for name, ms in slowest))
+
+
+def test_main_import_defers_heavy_modules(main_import):
+    _, _, loaded = main_import
+    for module in DEFERRED_MODULES:
+        assert module not in loaded, f"{module} importé au démarrage"
@@ -0,0 +1,178 @@
+"""
+Tests de watch.WatchDaemon : stabilité des fichiers, contre-pression et reprise par le journal.
+
+Le pool de processus est remplacé par un exécuteur factice dont le test termine
+les tâches à la main ; `now` est passé à step() pour ne pas dépendre de l'horloge.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import watch  # noqa: E402
+
+SETTLE = 2.0
+
+
+class StubExecutor:
+    """Garde les tâches soumises (chemin, sortie, Future) sans rien exécuter."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, path, output_path, *args):
+        future = Future()
+        self.submitted.append((path, output_path, future))
+        return future
+
+    def finish(self, index=0, status='ok'):
+        path, output_path, future = self.submitted[index]
+        future.set_result({'input': path, 'output': output_path, 'status': status, 'error': None,
+                           'audio_duration': 1.0, 'processing_time': 0.1, 'rtf': 0.1, 'metrics': None})
+
+
+@pytest.fixture(autouse=True)
+def no_probe(monkeypatch):
+    # Pas de sonde ffmpeg (ni de cache de sonde) sur les fichiers factices
+    monkeypatch.setattr(watch, 'work_bytes', lambda path, stat: stat.st_size)
+
+
+@pytest.fixture
+def drop(tmp_path):
+    directory = tmp_path / 'depot'
+    directory.mkdir()
+    return directory
+
+
+def make_daemon(tmp_path, drop, executor, **kwargs):
+    kwargs.setdefault('use_inotify', False)
+    return watch.WatchDaemon([str(drop)], str(tmp_path / 'sortie'), str(tmp_path / 'journal.jsonl'),
+                             cache_dir=None, settle_seconds=SETTLE, min_free_bytes=0, executor=executor,
+                             **kwargs)
+
+
+def write(path, size=100):
+    with open(path, 'ab') as f:
+        f.write(b'\0' * size)
+
+
+def test_file_is_submitted_once_settled(tmp_path, drop):
+    executor = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, executor)
+    write(drop / 'a.wav')
+    assert daemon.step(now=0.0) == 0
+    assert daemon.step(now=1.0) == 0
+    write(drop / 'a.wav')  # Copie encore en cours : le délai repart
+    assert daemon.step(now=2.5) == 0
+    assert daemon.step(now=4.0) == 0
+    assert daemon.step(now=2.5 + SETTLE) == 1
+    assert [path for path, _, _ in executor.submitted] == [str(drop / 'a.wav')]
+    daemon.close()
+
+
+def test_unsupported_and_hidden_files_are_ignored(tmp_path, drop):
+    executor = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, executor)
+    write(drop / 'notes.txt')
+    write(drop / '.a.wav')
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 0
+    assert daemon.idle()
+    daemon.close()
+
+
+def test_jobs_limit_backpressure(tmp_path, drop):
+    executor = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, executor, jobs=1)
+    write(drop / 'a.wav')
+    write(drop / 'b.wav')
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 1
+    assert daemon.step(now=SETTLE + 1) == 0  # Le second attend une place
+    executor.finish(0)
+    assert daemon.step(now=SETTLE + 2) == 1
+    assert len(executor.submitted) == 2
+    assert daemon.results[0]['status'] == 'ok'
+    daemon.close()
+
+
+def test_disk_space_backpressure(tmp_path, drop, monkeypatch):
+    executor = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, executor)
+    write(drop / 'a.wav')
+    monkeypatch.setattr(daemon, 'free_bytes', lambda: 50)
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 0
+    assert daemon.waiting_for_disk
+    assert not executor.submitted
+    monkeypatch.setattr(daemon, 'free_bytes', lambda: 10 ** 6)
+    assert daemon.step(now=SETTLE + 1) == 1
+    assert not daemon.waiting_for_disk
+    daemon.close()
+
+
+def test_journal_resumes_interrupted_and_skips_done(tmp_path, drop):
+    write(drop / 'a.wav')
+    first = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, first)
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 1
+    daemon.close()  # Arrêt pendant le traitement
+
+    second = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, second)
+    assert len(daemon.journal.interrupted()) == 1
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 1
+    key = daemon.journal.interrupted()[0]
+    second.finish(0)
+    daemon.step(now=SETTLE + 1)
+    assert daemon.journal.get(key)['state'] == 'done'
+    assert daemon.journal.get(key)['attempts'] == 2
+    daemon.close()
+
+    third = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, third)
+    assert daemon.journal.interrupted() == []
+    daemon.step(now=0.0)
+    assert daemon.step(now=SETTLE) == 0
+    assert not third.submitted
+    daemon.close()
+
+
+def test_failed_file_is_not_retried_in_session(tmp_path, drop):
+    executor = StubExecutor()
+    daemon = make_daemon(tmp_path, drop, executor)
+    write(drop / 'a.wav')
+    daemon.step(now=0.0)
+    daemon.step(now=SETTLE)
+    executor.finish(0, status='error')
+    daemon.step(now=SETTLE + 1)
+    assert daemon.step(now=2 * SETTLE + 2) == 0
+    assert len(executor.submitted) == 1
+    daemon.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify (Linux) seulement")
+def test_wake_interrupts_idle_wait(tmp_path, drop):
+    daemon = make_daemon(tmp_path, drop, StubExecutor(), use_inotify=True)
+    if daemon.watcher.inotify is None:
+        pytest.skip("inotify indisponible")
+    stop = threading.Event()
+    thread = threading.Thread(target=daemon.run, args=(stop,))
+    thread.start()
+    try:
+        thread.join(0.5)  # Dossier vide : la boucle attend jusqu'à IDLE_INTERVAL
+        assert thread.is_alive()
+        stop.set()
+        daemon.wake()
+        thread.join(2.0)
+        assert not thread.is_alive()
+    finally:
+        stop.set()
+        daemon.wake()  # Sans effet une fois la surveillance fermée
+        thread.join()
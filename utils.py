@@ -1,84 +1,189 @@
+import logging
 import os
+import subprocess
+import time
 from pydub import AudioSegment
-from moviepy.editor import VideoFileClip, AudioFileClip
-import numpy as np
+import metrics
+from audio_buffer import DecodedAudio, decode_file
+from probe import probe_media
 
-def get_audio_metadata(file_path):
-    audio = AudioSegment.from_file(file_path)
-    channels = audio.channels
-    sample_width = audio.sample_width
-    frame_rate = audio.frame_rate
-    duration = len(audio) / 1000.0  # en secondes
-    return(channels,sample_width, frame_rate,duration)
+logger = logging.getLogger(__name__)
+
+def get_audio_metadata(file_path, audio=None):
+    """
+    Retourne (canaux, largeur d'échantillon, fréquence, durée).
+    Si `audio` (DecodedAudio) est fourni, il fait foi ; sinon seuls les en-têtes
+    sont lus (sonde en cache, voir probe.py), sans décoder le fichier.
+    """
+    if audio is not None:
+        return audio.metadata()
+    info = probe_media(file_path)
+    if info['audio'] is None:
+        raise Exception(f"Aucune piste audio dans {file_path}")
+    stream = info['audio']
+    return stream['channels'], stream['sample_width'], stream['sample_rate'], info['duration']
     
-def convert_to_wav(file_path, temp_dir='temp', output_format='wav'):
+def convert_to_wav(file_path, temp_dir='temp', output_format='wav', audio=None, keep_channels=False):
+    """
+    Prépare le fichier d'entrée de DeepFilterNet (48 kHz), mixé en mono sauf si
+    `keep_channels` : les canaux d'origine sont alors conservés.
+    """
     output_wav = os.path.join(temp_dir, os.path.basename(file_path).replace(os.path.splitext(file_path)[1], f".{output_format}"))
     
     if not os.path.exists(temp_dir):
         os.makedirs(temp_dir)
 
-    audio = AudioSegment.from_file(file_path)
-    audio = audio.set_frame_rate(48000).set_channels(1)
-    audio.export(output_wav, format=output_format)
+    if audio is None:
+        audio = decode_file(file_path)
+    with metrics.span('convert_to_wav', format=output_format, channels=audio.channels if keep_channels else 1):
+        if output_format == 'wav':
+            # Écriture directe depuis le tampon partagé (rééchantillonné en 48 kHz)
+            audio.to_wav(output_wav, sample_rate=48000, mono=not keep_channels)
+        else:
+            DecodedAudio(audio.view(48000, mono=not keep_channels), 48000).to_audio_segment().export(output_wav, format=output_format)
     
     return output_wav
 
-def convert_audio_format(input_file, output_file, format='wav'):
+# Codecs imposés par pydub à l'export, reproduits pour l'encodage direct des WAV
+EXPORT_CODECS = {'ogg': 'libvorbis', 'm4a': 'aac'}
+# Extension -> nom du format (muxer) ffmpeg, quand ils diffèrent
+EXPORT_MUXERS = {'m4a': 'ipod'}
+
+def encode_wav_file(wav_file, output_file, format):
     """
-    Convertit un fichier audio dans le format désiré
+    Encode un WAV intermédiaire : ffmpeg lit le fichier lui-même, les échantillons
+    ne transitent jamais par Python (pas de copie AudioSegment).
+    """
+    command = [AudioSegment.converter, "-v", "error", "-nostdin", "-y", "-i", wav_file]
+    if format in EXPORT_CODECS:
+        command += ["-acodec", EXPORT_CODECS[format]]
+    command += ["-f", EXPORT_MUXERS.get(format, format), output_file]
+    logger.debug("Commande d'export: %s", ' '.join(command))
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(output_file):
+            os.unlink(output_file)
+        raise Exception(f"Échec de l'export: {result.stderr.strip()}")
+
+def convert_audio_format(input_file, output_file, format='wav', audio=None):
+    """
+    Convertit un fichier audio dans le format désiré.
+    Un WAV est encodé directement depuis le disque (voir encode_wav_file) ; sinon,
+    si `audio` (DecodedAudio) est fourni, il est encodé sans relire input_file.
     """
     try:
-        print(f"[DEBUG] Conversion audio: {input_file} -> {output_file} ({format})")
-        audio = AudioSegment.from_file(input_file)
-        audio.export(output_file, format=format)
-        print("[DEBUG] Conversion audio terminée")
+        logger.debug("Conversion audio: %s -> %s (%s)", input_file, output_file, format)
+        with metrics.span('export', format=format):
+            if input_file.lower().endswith('.wav'):
+                encode_wav_file(input_file, output_file, format)
+            else:
+                if audio is None:
+                    audio = decode_file(input_file)
+                audio.to_audio_segment().export(output_file, format=format)
+        logger.debug("Conversion audio terminée")
     except Exception as e:
-        print(f"[ERROR] Erreur lors de la conversion audio: {str(e)}")
+        logger.error("Erreur lors de la conversion audio: %s", e)
         raise
 
-def reconstruct_video_from_audio_and_video(video_file_path, audio_file_path, output_file_path, format='mp4'):
-    """
-    Reconstruit une vidéo en combinant la piste vidéo originale avec le nouvel audio
-    """
+# Codecs vidéo que chaque conteneur peut recevoir tels quels (copie de flux)
+CONTAINER_VIDEO_CODECS = {
+    'mp4': {'h264', 'hevc', 'mpeg4', 'av1', 'vp9', 'mpeg2video', 'mjpeg'},
+    'mov': {'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg', 'av1', 'dnxhd', 'mpeg2video'},
+    'mkv': None,  # Matroska accepte pratiquement tous les codecs
+    'avi': {'mpeg4', 'h264', 'mjpeg', 'msmpeg4v2', 'msmpeg4v3', 'mpeg2video', 'rawvideo', 'dvvideo'},
+}
+
+def video_codecs_for_format(format):
+    """Codecs (vidéo, audio) de ré-encodage selon le format de sortie."""
+    if format == 'mp4':
+        return 'libx264', 'aac'
+    elif format == 'mkv':
+        return 'libx264', 'libvorbis'
+    elif format == 'avi':
+        return 'mpeg4', 'mp3'
+    else:  # mov ou autres
+        return 'libx264', 'aac'
+
+def can_stream_copy(video_file_path, format):
+    """Le codec vidéo de la source peut-il être copié tel quel dans le conteneur cible ?"""
+    allowed = CONTAINER_VIDEO_CODECS.get(format, set())
+    if allowed is None:
+        return True
     try:
-        print(f"[DEBUG] Reconstruction vidéo: début")
-        print(f"[DEBUG] Format de sortie: {format}")
-        
-        video = VideoFileClip(video_file_path)
-        cleaned_audio = AudioFileClip(audio_file_path)
-        
-        # Combiner la vidéo et le nouvel audio
-        final_clip = video.set_audio(cleaned_audio)
-        
-        # Paramètres selon le format
-        if format == 'mp4':
-            codec = 'libx264'
-            audio_codec = 'aac'
-        elif format == 'mkv':
-            codec = 'libx264'
-            audio_codec = 'libvorbis'
-        elif format == 'avi':
-            codec = 'mpeg4'
-            audio_codec = 'mp3'
-        else:  # mov ou autres
-            codec = 'libx264'
-            audio_codec = 'aac'
-        
-        # Enregistrer la vidéo
-        final_clip.write_videofile(
-            output_file_path,
-            codec=codec,
-            audio_codec=audio_codec,
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True
-        )
-        
-        # Nettoyage
-        video.close()
-        cleaned_audio.close()
-        
-        print(f"[DEBUG] Reconstruction vidéo: terminée")
-        
+        codec = probe_media(video_file_path)['video']['codec']
     except Exception as e:
-        print(f"[ERROR] Erreur lors de la reconstruction vidéo: {str(e)}")
-        raise
\ No newline at end of file
+        # Sonde impossible : on tentera la copie, le ré-encodage reste en secours
+        logger.debug("Codec vidéo inconnu (%s), tentative de copie de flux", e)
+        return True
+    logger.debug("Codec vidéo source: %s", codec)
+    return codec in allowed
+
+def remux_video_with_audio(video_file_path, audio_file_path, output_file_path, format='mp4'):
+    """
+    Copie la piste vidéo d'origine bit à bit et n'encode que la nouvelle piste audio.
+    Lève une exception si ffmpeg échoue (conteneur incompatible, etc.).
+    """
+    _, audio_codec = video_codecs_for_format(format)
+    command = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-y",
+        "-i", video_file_path, "-i", audio_file_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", audio_codec,
+        output_file_path
+    ]
+    logger.debug("Commande remux: %s", ' '.join(command))
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(output_file_path):
+            os.unlink(output_file_path)
+        raise Exception(f"Échec du remux: {result.stderr.strip()}")
+
+def reconstruct_video_from_audio_and_video(video_file_path, audio_file_path, output_file_path, format='mp4', mode='auto'):
+    """
+    Reconstruit une vidéo en combinant la piste vidéo originale avec le nouvel audio.
+    mode='auto' copie le flux vidéo si le conteneur cible l'accepte et ré-encode sinon,
+    'remux' impose la copie, 'reencode' impose le ré-encodage.
+    Retourne {'mode': 'remux' | 'reencode', 'elapsed': durée en secondes}.
+    """
+    start_time = time.time()
+    logger.debug("Reconstruction vidéo: début (mode %s)", mode)
+    
+    if mode == 'remux' or (mode == 'auto' and can_stream_copy(video_file_path, format)):
+        try:
+            with metrics.span('remux', format=format):
+                remux_video_with_audio(video_file_path, audio_file_path, output_file_path, format)
+            elapsed = time.time() - start_time
+            logger.debug("Reconstruction vidéo: terminée par copie de flux en %.2fs", elapsed)
+            return {'mode': 'remux', 'elapsed': elapsed}
+        except Exception as e:
+            if mode == 'remux':
+                raise
+            logger.debug("Copie de flux impossible, ré-encodage: %s", e)
+    
+    with metrics.span('reencode', format=format):
+        reencode_video_with_audio(video_file_path, audio_file_path, output_file_path, format)
+    elapsed = time.time() - start_time
+    logger.debug("Reconstruction vidéo: terminée par ré-encodage en %.2fs", elapsed)
+    return {'mode': 'reencode', 'elapsed': elapsed}
+
+def reencode_video_with_audio(video_file_path, audio_file_path, output_file_path, format='mp4'):
+    """
+    Reconstruit une vidéo en ré-encodant la piste vidéo originale avec le nouvel audio.
+    Un seul appel ffmpeg, sans fichier temporaire : plusieurs enregistrements peuvent
+    tourner en même temps dans le même dossier.
+    """
+    codec, audio_codec = video_codecs_for_format(format)
+    command = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-y",
+        "-i", video_file_path, "-i", audio_file_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", codec, "-c:a", audio_codec,
+        output_file_path
+    ]
+    logger.debug("Commande de ré-encodage: %s", ' '.join(command))
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(output_file_path):
+            os.unlink(output_file_path)
+        logger.error("Erreur lors de la reconstruction vidéo: %s", result.stderr.strip())
+        raise Exception(f"Échec du ré-encodage: {result.stderr.strip()}")
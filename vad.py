@@ -0,0 +1,90 @@
+"""
+Détection d'activité par l'énergie, pour ne débruiter que les passages utiles.
+
+Les longs silences numériques et le bruit de fond entre les prises de parole
+n'ont pas besoin de DeepFilterNet. Le niveau de trames de 20 ms est calculé en
+une passe vectorisée et comparé au bruit de fond estimé. Seules les régions
+actives, élargies d'une marge, sont envoyées au moteur (voir
+deepfilter_interface.process_active).
+"""
+import logging
+
+import numpy as np
+
+import metrics
+from wavio import BLOCK_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Durée d'une trame d'analyse
+FRAME_SECONDS = 0.02
+# Centile des niveaux de trame pris comme bruit de fond
+NOISE_PERCENTILE = 10
+# Une trame est active si elle dépasse le bruit de fond de MARGIN_DB...
+MARGIN_DB = 10.0
+# ... et toujours au-dessus de ACTIVE_DB (dBFS), quel que soit le bruit de fond
+ACTIVE_DB = -40.0
+# Plancher du bruit de fond estimé : en dessous, silence numérique
+SILENCE_DB = -80.0
+# Marge gardée avant et après chaque région active (attaques, fins de mots)
+PAD_SECONDS = 0.3
+# Un silence plus court reste dans la région qui l'entoure
+MIN_GAP_SECONDS = 1.0
+# En dessous de cette part ignorable, le fichier est débruité en entier
+MIN_SKIP_FRACTION = 0.05
+
+
+def frame_levels(wav, frame):
+    """
+    Niveau (dBFS) de chaque trame de `frame` échantillons d'un wavio.MappedWav,
+    pour le canal le plus fort. Le fichier est lu par blocs.
+    """
+    count = -(-wav.frames // frame)
+    levels = np.empty(count, dtype=np.float32)
+    step = frame * max(1, BLOCK_FRAMES // frame)
+    for start in range(0, wav.frames, step):
+        block = wav.read(start, start + step).reshape(-1, wav.channels)
+        power = np.square(block, dtype=np.float32)
+        full = len(block) // frame
+        row = start // frame
+        if full:
+            levels[row:row + full] = power[:full * frame].reshape(full, frame, -1).mean(axis=1).max(axis=1)
+        if len(block) % frame:  # Dernière trame incomplète
+            levels[row + full] = power[full * frame:].mean(axis=0).max()
+    return 10.0 * np.log10(levels + 1e-12)
+
+
+def detect_regions(levels, frame, frames, sample_rate):
+    """
+    Régions actives [(début, fin), ...] en échantillons, triées et disjointes,
+    à partir des niveaux de trame : seuil relatif au bruit de fond, marge de
+    PAD_SECONDS de part et d'autre, silences de moins de MIN_GAP_SECONDS comblés.
+    """
+    if not len(levels):
+        return []
+    floor = max(float(np.percentile(levels, NOISE_PERCENTILE)), SILENCE_DB)
+    threshold = min(floor + MARGIN_DB, ACTIVE_DB)
+    active = levels > threshold
+
+    pad = int(round(PAD_SECONDS * sample_rate / frame))
+    if pad:
+        active = np.convolve(active, np.ones(2 * pad + 1), mode='same') > 0.5
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return []
+    keep = starts[1:] - stops[:-1] >= MIN_GAP_SECONDS * sample_rate / frame
+    starts = np.concatenate([starts[:1], starts[1:][keep]])
+    stops = np.concatenate([stops[:-1][keep], stops[-1:]])
+    return [(int(start) * frame, min(int(stop) * frame, frames)) for start, stop in zip(starts, stops)]
+
+
+def find_active_regions(wav):
+    """Régions actives d'un wavio.MappedWav (voir detect_regions)."""
+    frame = max(1, int(FRAME_SECONDS * wav.sample_rate))
+    with metrics.span('vad'):
+        levels = frame_levels(wav, frame)
+        regions = detect_regions(levels, frame, wav.frames, wav.sample_rate)
+    logger.debug("Détection d'activité: %s régions actives", len(regions))
+    return regions
@@ -0,0 +1,475 @@
+"""
+Surveillance de dossiers de dépôt : chaque fichier audio/vidéo déposé est nettoyé automatiquement.
+
+Les dossiers sont balayés périodiquement. Sous Linux, inotify réveille le balayage
+dès qu'un fichier change, sinon un balayage toutes les `poll_interval` secondes sert
+de secours. Un fichier n'est pris en charge qu'une fois sa taille et sa date stables
+pendant `settle_seconds` (copie terminée). Il passe ensuite par la chaîne de
+batch.process_file (convert_to_wav -> process_audio -> export).
+
+Le nombre de traitements simultanés est borné par les cœurs disponibles, et aucun
+fichier n'est lancé si l'espace disque libre ne couvre pas ses fichiers intermédiaires.
+
+Un journal en ajout seul (une ligne JSON par évènement, synchronisée sur disque)
+retient chaque version de fichier (chemin, taille, date). Après un redémarrage,
+les fichiers terminés sont ignorés et ceux interrompus sont repris. Les sorties sont
+écrites sous un nom temporaire puis renommées, et le cache de résultats restitue un
+débruitage déjà fait : rien n'est produit en double.
+
+Exemple :
+    python watch.py depot/ -o nettoyes --formats wav,mp3 --journal nettoyes/journal.jsonl
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import metrics
+from batch import (AUDIO_EXTENSIONS, VIDEO_EXTENSIONS, _init_worker, build_output_path, format_status,
+                   process_file)
+from cache import DEFAULT_CACHE_DIR
+from deepfilter_interface import DEFAULT_OPTIONS
+from export import parse_targets
+from probe import probe_media
+
+logger = logging.getLogger(__name__)
+
+# Un fichier doit rester inchangé ce temps (s) avant d'être traité
+SETTLE_SECONDS = 2.0
+POLL_INTERVAL = 2.0
+# Sans fichier en attente, inotify laisse dormir le balayage jusqu'à ce délai
+IDLE_INTERVAL = 30.0
+# Tentatives par version de fichier (un fichier qui fait planter le traitement n'est pas relancé sans fin)
+MAX_ATTEMPTS = 3
+# Espace disque laissé libre en plus des fichiers intermédiaires estimés
+MIN_FREE_BYTES = 1024 ** 3
+# Octets par seconde d'audio et par canal : WAV 48 kHz 16 bits d'entrée, de sortie et export
+WORK_BYTES_PER_SECOND = 48000 * 2 * 3
+
+
+class Journal:
+    """
+    Journal en ajout seul des tâches : {'time', 'event', 'key', 'path', ...} par ligne.
+    Évènements : 'started', 'done', 'failed'. L'état de chaque clé est rejoué au chargement ;
+    une dernière ligne tronquée (arrêt brutal pendant l'écriture) est ignorée.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        logger.warning("Ligne de journal illisible ignorée: %r", line[:200])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _apply(self, event):
+        entry = self.entries.setdefault(event['key'], {'state': None, 'attempts': 0, 'outputs': None})
+        entry['state'] = event['event']
+        if event['event'] == 'started':
+            entry['attempts'] += 1
+        elif event['event'] == 'done':
+            entry['outputs'] = event.get('outputs')
+
+    def record(self, event, key, **fields):
+        """Ajoute un évènement, écrit sur disque avant de rendre la main."""
+        line = dict(fields, time=time.time(), event=event, key=key)
+        with self._lock:
+            self._apply(line)
+            self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def interrupted(self):
+        """Clés commencées mais ni terminées ni en échec (arrêt pendant le traitement)."""
+        return [key for key, entry in self.entries.items() if entry['state'] == 'started']
+
+    def close(self):
+        self._file.close()
+
+
+def file_key(path, stat):
+    """Identité d'une version de fichier : un fichier remplacé est une nouvelle tâche."""
+    return f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+class _Inotify:
+    """
+    Notifications inotify (Linux) via la libc, sans dépendance : servent seulement à réveiller
+    le balayage. Un tube interne permet aussi de réveiller l'attente depuis un gestionnaire de
+    signal ou un autre fil (voir wake).
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.watched = set()
+        self.closed = False
+        self._wake_read, self._wake_write = os.pipe()
+        for fd in (self._wake_read, self._wake_write):
+            os.set_blocking(fd, False)
+
+    def add(self, directory):
+        if directory in self.watched:
+            return
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if self._add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory}")
+        self.watched.add(directory)
+
+    def wait(self, timeout):
+        """Attend un évènement ou un réveil (au plus `timeout` s) ; vrai si au moins un est arrivé."""
+        ready, _, _ = select.select([self.fd, self._wake_read], [], [], timeout)
+        for fd in ready:
+            try:
+                while os.read(fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+        return bool(ready)
+
+    def wake(self):
+        """Interrompt l'attente en cours (ou la prochaine) ; sûr depuis un gestionnaire de signal."""
+        if self.closed:
+            return
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            pass  # Tube plein : un réveil est déjà en attente
+
+    def close(self):
+        self.closed = True
+        for fd in (self.fd, self._wake_read, self._wake_write):
+            os.close(fd)
+
+
+class DirectoryWatcher:
+    """Balayage récursif des dossiers surveillés, réveillé par inotify quand il est disponible."""
+
+    def __init__(self, directories, exclude=(), use_inotify=True):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.exclude = [os.path.join(os.path.abspath(path), '') for path in exclude]
+        self.inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.info("inotify indisponible (%s), balayage périodique", e)
+
+    def _watch(self, directory):
+        if self.inotify is not None:
+            try:
+                self.inotify.add(directory)
+            except OSError as e:  # Limite de surveillances atteinte... : le balayage périodique reste
+                logger.debug("Dossier non surveillé par inotify: %s", e)
+
+    def scan(self):
+        """Fichiers pris en charge : génère (chemin, chemin relatif au dossier surveillé, stat)."""
+        supported = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
+        for root in self.directories:
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                if any(os.path.join(directory, '').startswith(excluded) for excluded in self.exclude):
+                    continue
+                self._watch(directory)
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError as e:
+                    logger.debug("Dossier illisible %s: %s", directory, e)
+                    continue
+                for entry in entries:
+                    if entry.name.startswith('.'):  # Fichiers cachés et partiels
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in supported:
+                        try:
+                            yield entry.path, os.path.relpath(entry.path, root), entry.stat()
+                        except FileNotFoundError:
+                            pass
+
+    def wait(self, timeout, poll_interval):
+        """
+        Attend avant le prochain balayage : un évènement inotify ou un réveil (wake), sinon
+        au plus `timeout` s. Sans inotify, l'attente ne dépasse jamais `poll_interval`.
+        """
+        if self.inotify is None:
+            time.sleep(min(timeout, poll_interval))
+        else:
+            self.inotify.wait(timeout)
+
+    def wake(self):
+        """Écourte l'attente du balayage (arrêt demandé) ; sûr depuis un gestionnaire de signal."""
+        if self.inotify is not None:
+            self.inotify.wake()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+def _init_watch_worker():
+    """Processus du pool : Ctrl+C n'interrompt que la boucle principale, qui laisse finir les traitements."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(False, None)
+
+
+def work_bytes(path, stat):
+    """Espace disque estimé pour traiter un fichier (WAV intermédiaires et sorties)."""
+    try:
+        info = probe_media(path)
+        channels = info['audio']['channels'] if info['audio'] else 1
+        return int((info['duration'] or 0) * WORK_BYTES_PER_SECOND * channels) + stat.st_size
+    except Exception:
+        return 10 * stat.st_size  # Sonde impossible : le traitement dira ce qu'il en est
+
+
+class WatchDaemon:
+    """
+    Boucle de surveillance : balaie, attend la stabilité des fichiers, lance au plus
+    `jobs` traitements à la fois (pool de processus, voir batch.process_file) si le
+    disque le permet, et tient le journal. `executor` (optionnel) remplace le pool.
+    """
+
+    def __init__(self, directories, output_dir, journal_path=None, options=None, jobs=None,
+                 output_format=None, audio_only=False, suffix='_clean', formats=None, keep_channels=False,
+                 cache_dir=DEFAULT_CACHE_DIR, settle_seconds=SETTLE_SECONDS, poll_interval=POLL_INTERVAL,
+                 min_free_bytes=MIN_FREE_BYTES, use_inotify=True, executor=None):
+        self.output_dir = os.path.abspath(output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.journal = Journal(journal_path or os.path.join(self.output_dir, '.watch-journal.jsonl'))
+        self.watcher = DirectoryWatcher(directories, exclude=[self.output_dir], use_inotify=use_inotify)
+        self.options = dict(DEFAULT_OPTIONS if options is None else options)
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.output_format = output_format
+        self.audio_only = audio_only
+        self.suffix = suffix
+        self.formats = formats
+        self.keep_channels = keep_channels
+        self.cache_dir = cache_dir
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.min_free_bytes = min_free_bytes
+        self.executor = executor or ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_watch_worker)
+        self._owns_executor = executor is None
+        self.pending = {}    # chemin -> (taille, date, stable depuis)
+        self.in_flight = {}  # future -> (clé, chemin, octets réservés)
+        self.reserved_bytes = 0
+        self.waiting_for_disk = False
+        self.results = []
+        # Échecs de cette session : retentés au prochain démarrage seulement (MAX_ATTEMPTS au total)
+        self.failed_keys = set()
+        interrupted = self.journal.interrupted()
+        if interrupted:
+            logger.info("%s tâches interrompues lors du dernier arrêt seront reprises", len(interrupted))
+
+    def output_path(self, relative):
+        if self.formats:
+            return build_output_path(relative, self.output_dir, self.formats[0]['format'], True, self.suffix)
+        return build_output_path(relative, self.output_dir, self.output_format, self.audio_only, self.suffix)
+
+    def free_bytes(self):
+        return min(shutil.disk_usage(self.output_dir).free, shutil.disk_usage(tempfile.gettempdir()).free)
+
+    def _ready_files(self, now):
+        """Fichiers stables depuis settle_seconds, ni terminés, ni en cours, ni abandonnés."""
+        seen = set()
+        ready = []
+        busy = {path for _, path, _ in self.in_flight.values()}
+        for path, relative, stat in self.watcher.scan():
+            seen.add(path)
+            if path in busy:
+                continue
+            key = file_key(path, stat)
+            entry = self.journal.get(key)
+            if key in self.failed_keys or (
+                    entry is not None and (entry['state'] == 'done' or entry['attempts'] >= MAX_ATTEMPTS)):
+                self.pending.pop(path, None)
+                continue
+            previous = self.pending.get(path)
+            if previous is None or previous[:2] != (stat.st_size, stat.st_mtime_ns):
+                self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)  # Encore en cours d'écriture
+            elif now - previous[2] >= self.settle_seconds:
+                ready.append((path, relative, stat))
+        for path in set(self.pending) - seen:  # Supprimé ou déplacé avant d'être traité
+            del self.pending[path]
+        return ready
+
+    def _submit(self, path, relative, stat):
+        key = file_key(path, stat)
+        needed = work_bytes(path, stat)
+        if self.free_bytes() - self.reserved_bytes < needed + self.min_free_bytes:
+            if not self.waiting_for_disk:
+                logger.warning("Espace disque insuffisant pour %s (%.1f Go nécessaires) : en attente",
+                               path, needed / 1024 ** 3)
+            self.waiting_for_disk = True
+            return False
+        self.waiting_for_disk = False
+        output_path = self.output_path(relative)
+        resumed = (self.journal.get(key) or {}).get('state') == 'started'
+        self.journal.record('started', key, path=path, output=output_path, resumed=resumed)
+        logger.info("%s %s -> %s", "Reprise" if resumed else "Traitement", path, output_path)
+        channel_workers = max(1, (os.cpu_count() or 1) // self.jobs)
+        future = self.executor.submit(process_file, path, output_path, self.options, False, False, 10.0,
+                                      self.cache_dir, self.keep_channels, channel_workers, self.formats)
+        self.in_flight[future] = (key, path, needed)
+        self.reserved_bytes += needed
+        self.pending.pop(path, None)
+        return True
+
+    def _collect(self):
+        """Enregistre les traitements terminés (sans attendre les autres)."""
+        for future in [future for future in self.in_flight if future.done()]:
+            key, path, needed = self.in_flight.pop(future)
+            self.reserved_bytes -= needed
+            try:
+                result = future.result()
+            except Exception as e:  # Processus du pool tué...
+                result = {'input': path, 'output': None, 'status': 'error', 'error': str(e), 'metrics': None}
+            if result.get('metrics'):
+                metrics.merge(result['metrics'])
+            metrics.count('watch_jobs', status=result['status'])
+            if result['status'] == 'ok':
+                outputs = result.get('outputs') or [result['output']]
+                self.journal.record('done', key, path=path, outputs=outputs)
+                logger.info("%s", format_status(result))
+            else:
+                self.journal.record('failed', key, path=path, error=result['error'])
+                self.failed_keys.add(key)
+                logger.error("%s", format_status(result))
+            self.results.append(result)
+
+    def step(self, now=None):
+        """Un tour de boucle : résultats terminés, balayage, nouveaux lancements. Retourne le nombre lancé."""
+        self._collect()
+        started = 0
+        for path, relative, stat in self._ready_files(time.monotonic() if now is None else now):
+            if len(self.in_flight) >= self.jobs or not self._submit(path, relative, stat):
+                break  # Contre-pression : le reste attend le prochain tour
+            started += 1
+        return started
+
+    def idle(self):
+        return not self.pending and not self.in_flight
+
+    def wake(self):
+        """Réveille la boucle de run() pour qu'elle voie aussitôt `stop` (voir main)."""
+        self.watcher.wake()
+
+    def run(self, stop=None, once=False):
+        """
+        Surveille jusqu'à `stop` (threading.Event). Avec `once`, s'arrête dès que les
+        fichiers présents sont traités. Les traitements en cours sont menés à terme.
+        """
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                self.step()
+                if once and self.idle():
+                    break
+                busy = self.pending or self.in_flight
+                self.watcher.wait(self.poll_interval if busy else IDLE_INTERVAL, self.poll_interval)
+            wait(list(self.in_flight))
+            self._collect()
+        finally:
+            self.close()
+        return self.results
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+        self.watcher.close()
+        self.journal.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nettoyage automatique des fichiers déposés dans des dossiers")
+    parser.add_argument('directories', nargs='+', help="Dossiers surveillés (récursivement)")
+    parser.add_argument('-o', '--output-dir', required=True, help="Dossier de sortie")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="Traitements simultanés au plus (défaut: nombre de cœurs)")
+    parser.add_argument('-f', '--format', dest='output_format', help="Format de sortie (défaut: format d'origine)")
+    parser.add_argument('--formats', help="Livrer en audio dans plusieurs formats (ex: 'wav,flac,mp3:320k')")
+    parser.add_argument('--audio-only', action='store_true', help="Pour les vidéos, n'exporter que l'audio nettoyé")
+    parser.add_argument('--suffix', default='_clean', help="Suffixe ajouté au nom des fichiers de sortie")
+    parser.add_argument('--journal', help="Journal des tâches (défaut: <sortie>/.watch-journal.jsonl)")
+    parser.add_argument('--settle-seconds', type=float, default=SETTLE_SECONDS,
+                        help="Durée sans modification avant de traiter un fichier (s)")
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, help="Intervalle de balayage (s)")
+    parser.add_argument('--no-inotify', action='store_true', help="Balayage périodique seul")
+    parser.add_argument('--min-free-gb', type=float, default=MIN_FREE_BYTES / 1024 ** 3,
+                        help="Espace disque gardé libre en plus des besoins estimés (Go)")
+    parser.add_argument('--once', action='store_true', help="Traiter les fichiers présents puis s'arrêter")
+    parser.add_argument('--keep-channels', action='store_true', help="Conserver les canaux d'origine")
+    parser.add_argument('--skip-silence', action='store_true', help="Ne débruiter que les passages actifs")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Dossier du cache de résultats")
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache de résultats")
+    args = parser.parse_args(argv)
+    if args.formats:
+        if args.output_format:
+            parser.error("--formats n'est pas compatible avec -f")
+        try:
+            args.formats = parse_targets(args.formats)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.setup_logging()
+    metrics.configure()
+    options = dict(DEFAULT_OPTIONS)
+    if args.skip_silence:
+        options['skip_silence'] = True
+    daemon = WatchDaemon(args.directories, args.output_dir, args.journal, options, jobs=args.jobs,
+                         output_format=args.output_format, audio_only=args.audio_only, suffix=args.suffix,
+                         formats=args.formats, keep_channels=args.keep_channels,
+                         cache_dir=None if args.no_cache else args.cache_dir,
+                         settle_seconds=args.settle_seconds, poll_interval=args.poll_interval,
+                         min_free_bytes=int(args.min_free_gb * 1024 ** 3), use_inotify=not args.no_inotify)
+    stop = threading.Event()
+
+    def request_stop(*_):
+        stop.set()
+        daemon.wake()  # Sans quoi l'attente inotify peut durer jusqu'à IDLE_INTERVAL
+
+    # Arrêt propre : les traitements en cours se terminent, le journal reprendra le reste
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, request_stop)
+    logger.info("Surveillance de %s (sortie: %s, %s traitements simultanés)",
+                ', '.join(args.directories), args.output_dir, daemon.jobs)
+    results = daemon.run(stop, once=args.once)
+    return 1 if any(result['status'] == 'error' for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Pyramide de pics (minimum/maximum) pour l'aperçu de forme d'onde des lecteurs.
+
+Le signal est parcouru une seule fois, par blocs vectorisés : le niveau 0 garde
+le minimum et le maximum de chaque groupe de `block` échantillons, chaque niveau
+suivant fusionne les paires du précédent. La pyramide est enregistrée à côté du
+WAV dont elle provient (`<wav>.peaks.npz`, invalidée si le WAV change) ; l'affichage
+l'échantillonne à la largeur courante en pixels sans jamais relire l'audio.
+"""
+import logging
+import os
+
+import numpy as np
+
+import metrics
+from wavio import open_wav
+
+logger = logging.getLogger(__name__)
+
+# Échantillons par pic au niveau 0 (5,3 ms à 48 kHz)
+BLOCK = 256
+# Le niveau le plus grossier tient dans cette largeur
+MIN_COLUMNS = 512
+# Échantillons lus par passe (multiple de BLOCK) : borne la mémoire des temporaires
+CHUNK = BLOCK * 4096
+
+
+def peaks_path(wav_path):
+    return f"{wav_path}.peaks.npz"
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+class PeakPyramid:
+    """Niveaux de pics : levels[k] a la forme (n, 2) (minimum, maximum), un pic pour BLOCK·2^k échantillons."""
+
+    def __init__(self, levels, sample_rate, frames, block=BLOCK):
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.block = block
+
+    @property
+    def duration(self):
+        return self.frames / float(self.sample_rate)
+
+    def peak_duration(self, level):
+        return self.block * (1 << level) / float(self.sample_rate)
+
+    def sample(self, width, start=0.0, end=None):
+        """
+        (minimums, maximums) de `width` colonnes couvrant [start, end] secondes,
+        calculés depuis le niveau le plus grossier qui offre encore un pic par colonne.
+        Les colonnes hors du signal valent 0.
+        """
+        end = self.duration if end is None else end
+        width = max(1, int(width))
+        span = max(end - start, 1e-9)
+        level = 0
+        while (level + 1 < len(self.levels)
+               and span / self.peak_duration(level + 1) >= width):
+            level += 1
+        peaks = self.levels[level]
+        step = self.peak_duration(level)
+        # Colonne c : pics [lo[c], hi[c]) du niveau choisi (au moins un)
+        edges = np.floor((start + span * np.arange(width + 1) / width) / step).astype(np.int64)
+        lo = edges[:-1]
+        hi = np.minimum(np.maximum(edges[1:], lo + 1), len(peaks))
+        valid = (lo >= 0) & (lo < len(peaks))
+        mins = np.zeros(width, dtype=np.float32)
+        maxs = np.zeros(width, dtype=np.float32)
+        if valid.any():
+            mins[valid] = np.minimum.reduceat(peaks[:, 0], lo[valid])
+            maxs[valid] = np.maximum.reduceat(peaks[:, 1], lo[valid])
+            # reduceat prolonge le dernier intervalle jusqu'à la fin du niveau
+            last = np.flatnonzero(valid)[-1]
+            mins[last] = peaks[lo[last]:hi[last], 0].min()
+            maxs[last] = peaks[lo[last]:hi[last], 1].max()
+        return mins, maxs
+
+    def save(self, path, source=None):
+        """Enregistre la pyramide ; `source` (le WAV d'origine) sert à l'invalider s'il change."""
+        arrays = {f"level{k}": level for k, level in enumerate(self.levels)}
+        meta = np.array([self.sample_rate, self.frames, self.block], dtype=np.int64)
+        signature = _source_signature(source) if source else np.zeros(2, dtype=np.int64)
+        partial = f"{path}.{os.getpid()}.partial.npz"
+        np.savez(partial, meta=meta, signature=signature, **arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path, source=None):
+        """Relit une pyramide enregistrée ; None si absente, illisible ou périmée par rapport à `source`."""
+        try:
+            with np.load(path) as data:
+                if source is not None and not np.array_equal(data['signature'], _source_signature(source)):
+                    return None
+                sample_rate, frames, block = (int(value) for value in data['meta'])
+                count = sum(1 for name in data.files if name.startswith('level'))
+                levels = [data[f"level{k}"] for k in range(count)]
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(levels, sample_rate, frames, block)
+
+
+def compute_peaks(samples, sample_rate, block=BLOCK):
+    """
+    Pyramide d'un signal mono (tableau, memmap ou wavio.SampleView), en une passe
+    vectorisée par morceaux de CHUNK échantillons.
+    """
+    frames = len(samples)
+    count = -(-frames // block)
+    base = np.empty((count, 2), dtype=np.float16)
+    for start in range(0, frames, CHUNK):
+        chunk = np.asarray(samples[start:start + CHUNK], dtype=np.float32)
+        full = len(chunk) // block
+        row = start // block
+        if full:
+            groups = chunk[:full * block].reshape(full, block)
+            base[row:row + full, 0] = groups.min(axis=1)
+            base[row:row + full, 1] = groups.max(axis=1)
+        if len(chunk) % block:  # Dernier groupe incomplet
+            base[row + full] = (chunk[full * block:].min(), chunk[full * block:].max())
+
+    levels = [base]
+    while len(levels[-1]) > MIN_COLUMNS:
+        previous = levels[-1]
+        even = len(previous) - len(previous) % 2
+        coarse = np.empty(((len(previous) + 1) // 2, 2), dtype=np.float16)
+        coarse[:even // 2, 0] = np.minimum(previous[0:even:2, 0], previous[1:even:2, 0])
+        coarse[:even // 2, 1] = np.maximum(previous[0:even:2, 1], previous[1:even:2, 1])
+        if even < len(previous):
+            coarse[-1] = previous[-1]
+        levels.append(coarse)
+    return PeakPyramid(levels, sample_rate, frames, block)
+
+
+def build_peaks(samples, sample_rate, wav_path=None):
+    """
+    Pyramide du signal, relue depuis `<wav_path>.peaks.npz` si elle est à jour,
+    sinon calculée puis enregistrée à côté du WAV.
+    """
+    path = peaks_path(wav_path) if wav_path else None
+    if path and os.path.exists(path):
+        peaks = PeakPyramid.load(path, wav_path)
+        if peaks is not None:
+            return peaks
+    with metrics.span('waveform_peaks'):
+        peaks = compute_peaks(samples, sample_rate)
+    if path:
+        try:
+            peaks.save(path, wav_path)
+        except OSError as e:
+            logger.debug("Pics non enregistrés (%s): %s", path, e)
+    return peaks
+
+
+def peaks_for_wav(wav_path):
+    """Pyramide d'un WAV (relue si à jour, sinon calculée par tranches depuis le fichier projeté)."""
+    peaks = PeakPyramid.load(peaks_path(wav_path), wav_path)
+    if peaks is not None:
+        return peaks
+    with open_wav(wav_path) as wav:
+        return build_peaks(wav.view(mono=True), wav.sample_rate, wav_path)
@@ -0,0 +1,312 @@
+"""
+Lecture/écriture WAV vers/depuis des tableaux numpy, sans passer par pydub.
+
+Les échantillons sont renvoyés en float32 dans [-1, 1], de forme (n,) en mono
+ou (n, canaux) en multicanal.
+
+Les fichiers intermédiaires (temp_dir, output_dir) peuvent être projetés en
+mémoire (open_wav, create_wav) : chaque étape lit ou écrit des tranches sans
+charger le fichier entier, la mémoire reste bornée par la fenêtre de travail.
+"""
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Au-delà, les tailles ne tiennent plus sur 32 bits : create_wav écrit un en-tête RF64
+# (tailles 64 bits dans le chunk 'ds64', champs 32 bits à 0xFFFFFFFF)
+MAX_RIFF_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+def _read_header(f):
+    """Parcourt les chunks RIFF. Retourne (format, canaux, fréquence, bits, offset data, taille data)."""
+    riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+    if riff not in (b'RIFF', b'RF64') or wave_id != b'WAVE':
+        raise ValueError("Fichier WAV invalide")
+
+    fmt = None
+    data_size64 = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("Chunk 'data' introuvable dans le fichier WAV")
+        chunk_id, chunk_size = struct.unpack('<4sI', header)
+        if chunk_id == b'fmt ':
+            data = f.read(chunk_size)
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', data[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(data) >= 26:
+                format_tag = struct.unpack('<H', data[24:26])[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b'ds64':
+            data = f.read(chunk_size)
+            data_size64 = struct.unpack('<Q', data[8:16])[0]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("Chunk 'fmt ' manquant avant 'data'")
+            if chunk_size == 0xFFFFFFFF and data_size64 is not None:
+                chunk_size = data_size64
+            offset = f.tell()
+            # Les écrivains en flux laissent parfois une taille nulle ou maximale
+            f.seek(0, 2)
+            available = f.tell() - offset
+            if chunk_size == 0 or chunk_size == 0xFFFFFFFF or chunk_size > available:
+                chunk_size = available
+            return fmt + (offset, chunk_size)
+        else:
+            f.seek(chunk_size + (chunk_size & 1), 1)
+        if chunk_id in (b'fmt ', b'ds64') and chunk_size & 1:
+            f.seek(1, 1)
+
+
+# Type de stockage numpy par (format, bits) ; le 24 bits n'a pas d'équivalent et se lit octet par octet
+_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): 'u1',
+    (WAVE_FORMAT_PCM, 16): '<i2',
+    (WAVE_FORMAT_PCM, 32): '<i4',
+    (WAVE_FORMAT_IEEE_FLOAT, 32): '<f4',
+    (WAVE_FORMAT_IEEE_FLOAT, 64): '<f8',
+}
+# Taille des blocs (en trames) des conversions et copies par morceaux
+BLOCK_FRAMES = 1 << 16
+
+
+def _to_float(values, format_tag, bits):
+    """Convertit des échantillons au format stocké en float32 (sans copie s'ils le sont déjà)."""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return values if values.dtype == np.float32 else values.astype(np.float32)
+    if bits == 8:
+        return (values.astype(np.float32) - 128.0) / 128.0
+    if bits == 16:
+        return values.astype(np.float32) / 32768.0
+    return (values / 2147483648.0).astype(np.float32)
+
+
+def _from_float(samples, dtype):
+    """Convertit des échantillons float dans [-1, 1] vers le type stocké."""
+    if dtype.kind == 'f':
+        return samples.astype(dtype)
+    scale = {1: 127.0, 2: 32767.0, 4: 2147483647.0}[dtype.itemsize]
+    values = (np.clip(samples, -1.0, 1.0) * scale).round()
+    return (values + 128.0 if dtype.itemsize == 1 else values).astype(dtype)
+
+
+def _decode(raw, format_tag, bits):
+    """Convertit des octets bruts en float32."""
+    if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+        raise ValueError(f"Format WAV non supporté: {format_tag:#x}")
+    if format_tag == WAVE_FORMAT_PCM and bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        return values.astype(np.float32) / 8388608.0
+    dtype = _DTYPES.get((format_tag, bits))
+    if dtype is None:
+        raise ValueError(f"Profondeur WAV non supportée: {bits} bits")
+    return _to_float(np.frombuffer(raw, dtype=dtype), format_tag, bits)
+
+
+class MappedWav:
+    """
+    Fichier WAV projeté en mémoire (np.memmap) : seules les pages effectivement
+    lues sont chargées, et seules les tranches demandées sont converties en float32.
+    `raw` est la vue (trames, canaux) au format stocké, sans copie ; pour un WAV
+    float 32 bits, `read` renvoie directement des vues de cette projection.
+
+    La projection garde le fichier ouvert (et, sous Windows, empêche sa suppression)
+    jusqu'à `close` ou la disparition du dernier tableau qui en dépend.
+    """
+
+    def __init__(self, path, mode='r'):
+        with open(path, 'rb') as f:
+            format_tag, channels, sample_rate, bits, offset, size = _read_header(f)
+        if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Format WAV non supporté: {format_tag:#x}")
+        packed = format_tag == WAVE_FORMAT_PCM and bits == 24
+        if not packed and (format_tag, bits) not in _DTYPES:
+            raise ValueError(f"Profondeur WAV non supportée: {bits} bits")
+        self.path = path
+        self.mode = mode
+        self.format_tag = format_tag
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits = bits
+        self.sample_width = bits // 8
+        self.frames = size // (channels * self.sample_width)
+        # 24 bits : octets bruts, 3 par échantillon
+        dtype = np.dtype('u1' if packed else _DTYPES[(format_tag, bits)])
+        shape = (self.frames, channels * 3 if packed else channels)
+        if self.frames:
+            self.raw = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape)
+        else:
+            self.raw = np.zeros(shape, dtype=dtype)  # Une projection vide est impossible
+
+    @property
+    def duration(self):
+        return self.frames / float(self.sample_rate)
+
+    def __len__(self):
+        return self.frames
+
+    def read(self, start=0, stop=None, channel=None, mono=False):
+        """
+        Échantillons float32 des trames [start, stop) : forme (n,) en mono (ou pour
+        `channel`, ou mixés si `mono`), (n, canaux) sinon.
+        """
+        block = self.raw[start:stop]
+        if self.bits == 24 and self.format_tag == WAVE_FORMAT_PCM:
+            samples = _decode(np.ascontiguousarray(block).tobytes(), self.format_tag, 24).reshape(-1, self.channels)
+        elif channel is not None:
+            return _to_float(block[:, channel], self.format_tag, self.bits)
+        else:
+            samples = _to_float(block, self.format_tag, self.bits)
+        if channel is not None:
+            return samples[:, channel]
+        if self.channels == 1:
+            return samples[:, 0]
+        return samples.mean(axis=1) if mono else samples
+
+    def blocks(self, block_frames=BLOCK_FRAMES, channel=None, mono=False):
+        """Parcourt le fichier par blocs : génère (trame de début, échantillons float32)."""
+        for start in range(0, self.frames, block_frames):
+            yield start, self.read(start, start + block_frames, channel, mono)
+
+    def view(self, mono=False):
+        """Vue paresseuse découpable comme un tableau numpy (voir SampleView)."""
+        return SampleView(self, mono)
+
+    def write(self, start, samples, channel=None):
+        """Écrit des échantillons float à partir de la trame `start` (fichier ouvert en 'r+')."""
+        if self.bits == 24:
+            raise ValueError("Écriture 24 bits non supportée")
+        samples = np.asarray(samples)
+        target = self.raw[start:start + len(samples)]
+        if channel is not None:
+            target[:, channel] = _from_float(samples, self.raw.dtype)
+        else:
+            target[:] = _from_float(samples.reshape(len(samples), -1), self.raw.dtype)
+
+    def flush(self):
+        if self.mode != 'r' and isinstance(self.raw, np.memmap):
+            self.raw.flush()
+
+    def close(self):
+        """Libère la projection (les vues encore référencées la maintiennent ouverte)."""
+        self.flush()
+        self.raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class SampleView:
+    """
+    Échantillons float32 d'un MappedWav, découpables comme un tableau (vue[a:b]) :
+    chaque tranche est lue et convertie à la demande. `np.asarray(vue)` charge tout.
+    """
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, wav, mono=False):
+        self.wav = wav
+        self.mono = mono
+
+    @property
+    def shape(self):
+        if self.mono or self.wav.channels == 1:
+            return (self.wav.frames,)
+        return (self.wav.frames, self.wav.channels)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.wav.frames
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("SampleView ne gère que les tranches contiguës")
+        start, stop, _ = key.indices(self.wav.frames)
+        return self.wav.read(start, max(start, stop), mono=self.mono)
+
+    def __array__(self, dtype=None, copy=None):
+        samples = self.wav.read(mono=self.mono)
+        return samples if dtype is None else samples.astype(dtype)
+
+
+def open_wav(path, mode='r'):
+    """Projette un WAV existant en mémoire ('r' : lecture seule, 'r+' : modifiable sur place)."""
+    return MappedWav(path, mode)
+
+
+def create_wav(path, frames, channels, sample_rate, sample_width=2):
+    """
+    Crée un WAV de `frames` trames (PCM 16 bits, ou float 32 bits si sample_width=4)
+    et le renvoie projeté en écriture : il se remplit par blocs avec `write`,
+    sans jamais tenir l'ensemble du signal en mémoire. Au-delà de 4 Gio
+    d'échantillons, l'en-tête est au format RF64.
+    """
+    if sample_width == 2:
+        format_tag = WAVE_FORMAT_PCM
+    elif sample_width == 4:
+        format_tag = WAVE_FORMAT_IEEE_FLOAT
+    else:
+        raise ValueError(f"Largeur d'échantillon non supportée: {sample_width}")
+    block_align = channels * sample_width
+    size = frames * block_align
+    with open(path, 'wb') as f:
+        if size > MAX_RIFF_DATA_SIZE:
+            f.write(struct.pack('<4sI4s', b'RF64', 0xFFFFFFFF, b'WAVE'))
+            f.write(struct.pack('<4sIQQQI', b'ds64', 28, 36 + 36 + size, size, frames, 0))
+            data_size = 0xFFFFFFFF
+        else:
+            f.write(struct.pack('<4sI4s', b'RIFF', 36 + size, b'WAVE'))
+            data_size = size
+        f.write(struct.pack('<4sIHHIIHH', b'fmt ', 16, format_tag, channels, sample_rate,
+                            sample_rate * block_align, block_align, sample_width * 8))
+        f.write(struct.pack('<4sI', b'data', data_size))
+        f.truncate(f.tell() + size)  # Fichier creux : les blocs sont alloués à l'écriture
+    return MappedWav(path, 'r+')
+
+
+def read_wav_info(path):
+    """Retourne (canaux, fréquence, nombre de trames) en lisant uniquement l'en-tête."""
+    with open(path, 'rb') as f:
+        _, channels, sample_rate, bits, _, size = _read_header(f)
+    return channels, sample_rate, size // (channels * bits // 8)
+
+
+def read_wav_data_range(path):
+    """Retourne (offset, taille) en octets des échantillons dans le fichier."""
+    with open(path, 'rb') as f:
+        _, _, _, _, offset, size = _read_header(f)
+    return offset, size
+
+
+def read_wav(path):
+    """
+    Lit un fichier WAV entier. Retourne (échantillons float32, fréquence).
+    Le tableau est indépendant du fichier ; pour lire par tranches, voir open_wav.
+    """
+    with open_wav(path) as wav:
+        samples = np.array(wav.read(), dtype=np.float32)
+        return samples, wav.sample_rate
+
+
+def write_wav(path, samples, sample_rate, sample_width=2):
+    """
+    Écrit des échantillons float dans [-1, 1] en WAV PCM (sample_width=2)
+    ou en float 32 bits (sample_width=4), par blocs : la conversion ne
+    duplique jamais le signal entier. `samples` peut être un memmap ou une SampleView.
+    """
+    channels = 1 if len(getattr(samples, 'shape', ())) < 2 else samples.shape[1]
+    if not hasattr(samples, 'shape'):
+        samples = np.asarray(samples)
+    with create_wav(path, len(samples), channels, sample_rate, sample_width) as wav:
+        for start in range(0, len(samples), BLOCK_FRAMES):
+            wav.write(start, samples[start:start + BLOCK_FRAMES])